@@ -3,12 +3,16 @@
 import streamlit as st
 import pandas as pd
 import textwrap
-import io, requests
+import io
+from profiler import NULL_PROFILER, NullProfiler, Profiler, SessionToken
+from notice_pipeline import COLUMNAR_FORMATS, columnar_bytes, config_hash, csv_bytes, csv_zip_bytes
+from http_fetch import default_cache
+from table_view import PAGE_ROWS, TablePager
 
 st.set_page_config(page_title="Assignments Demo", layout="centered")
 
 
-def show_assignment_1():
+def show_assignment_1(prof: Profiler | NullProfiler = NULL_PROFILER):
     """Assignment 1: Json to csv flattening, summarization, visualization."""
     st.subheader("Assignment 1 - Json to csv flattening, Data Summarization & Visualization")
     st.write("---")
@@ -24,236 +28,120 @@ def show_assignment_1():
 # ---------------------------------------------------------------
 # •  Flatten each infringing URL to its own row
 # •  Add 'domain' and 'ip_address' columns
-# •  Parallelise IP-look-ups with ≥ 4 CPUs
+# •  Resolve IPs concurrently on an asyncio event loop, cached on disk
 # •  Produce three summary tables
 
 # Author: Siva Mani Subrahmanya Hari Vamsi
 # Date  : 15-07-2025
 '''
 
-import json
-import csv
-import socket
 from pathlib import Path
-from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import Counter
 import pandas as pd
-import re, requests
+
+from notice_pipeline import (CSV_COMPRESSION_SUFFIX, EXPORT_COLUMNS, flatten_frame, iter_notices,
+                             root_domains, tidy_principals, write_csv_stream)
+from dns_resolver import DnsCache, ResolveStats, RetryPolicy, resolve_domains
+from summaries import SummaryState
 
 # -------- CONFIG -------------------------------------------------------------
 # Google Drive share-link → file-ID → direct-download URL
 DRIVE_FILE_ID = "134U6xLIZUZ9sA1BW-X9TLZtUlEYCvQwz"
-INPUT_JSON = (                       # we now pass a URL, not a Path
+INPUT_JSON = (                       # a URL or a local file
     f"https://drive.google.com/uc?export=download&id={DRIVE_FILE_ID}"
 )
 OUTPUT_CSV = Path("flattened_infringing_urls.csv")
-N_WORKERS  = 8
-TIMEOUT_S  = 3
+CSV_COMPRESSION = None               # "gzip" / "zstd" → OUTPUT_CSV gets .gz / .zst appended
+N_WORKERS  = 1000                    # ceiling for DNS look-ups in flight (AIMD adapts below it)
+TIMEOUT_S  = 3                       # cap per attempt
+DNS_RETRY  = RetryPolicy(attempts=3, budget_s=10)   # only timeouts are retried
+DNS_BACKEND = None                   # None → nameservers from /etc/resolv.conf
+DNS_CACHE  = DnsCache(Path("dns_cache.sqlite3"))   # survives reruns
+PSL_ROOT_DOMAINS = True              # registrable domain via the Public Suffix List, not last two labels
 # -----------------------------------------------------------------------------
 
-def load_json(src: str | Path) -> dict:
-    '''
-    Load a JSON document from either
-      • a local file (Path / str)  - existing behaviour, or
-      • an http/https URL          - used for the public Google Drive link.
-    '''
-    src_str = str(src)
-
-    #1️⃣ Remote file ----------------------------------------------------------
-    if src_str.startswith(("http://", "https://")):
-        # Google Drive ‘share’ links need converting to the *download* endpoint
-        m = re.search(r"/d/([^/]+)/", src_str)
-        if m:
-            file_id = m.group(1)
-            src_str = f"https://drive.google.com/uc?export=download&id={file_id}"
-
-        # small files (<100 MB) download in one go; large files may need a second
-        with requests.Session() as sess:
-            r = sess.get(src_str, timeout=30, stream=True)
-            # If we hit Drive’s virus-scan / confirm page, grab the token & resend
-            if "content-disposition" not in r.headers:
-                for k, v in r.cookies.items():
-                    if k.startswith("download_warning"):
-                        r = sess.get(src_str, params={"confirm": v}, timeout=30)
-                        break
-            r.raise_for_status()
-            return r.json()
-
-    #2️⃣ Local file -----------------------------------------------------------
-    with Path(src_str).open("r", encoding="utf-8") as f:
-        return json.load(f)
-
-def flatten_notices(raw: dict) -> list[dict]:
-    '''
-    Flatten the nested JSON structure so each infringing URL gets its own
-    dictionary (future CSV row). Extracts relevant fields from each notice.
-    '''
-    rows = []
-    for notice in raw.get("notices", []):
-        base = {
-            "notice_id":  notice.get("id"),
-            "title":      notice.get("title"),
-            "sender":     notice.get("sender_name"),
-            "principal":  notice.get("principal_name"),
-            "recipient":  notice.get("recipient_name"),
-            "date_sent":  notice.get("date_sent"),
-        }
-
-        for work in notice.get("works", []):
-            description = work.get("description")
-            for item in work.get("infringing_urls", []):
-                url = item.get("url")
-                rows.append(
-                    {
-                        **base,
-                        "description":    description,
-                        "infringing_url": url,
-                        "domain":         urlparse(url).netloc.lower(),  # Extract domain from URL
-                    }
-                )
-    return rows
-
-
-def resolve_ip(domain: str) -> str:
+def flatten_notices(src: str | Path) -> pd.DataFrame:
     '''
-    Return the IPv4 address for a domain.
-    Returns 'N/A' if the lookup fails (e.g., DNS error or timeout).
+    Stream the notices from a URL or local file and flatten them so each
+    infringing URL gets its own row (future CSV row), with its 'domain'.
+    The repeated notice fields come back as categoricals.
     '''
-    try:
-        socket.setdefaulttimeout(TIMEOUT_S)
-        return socket.gethostbyname(domain)
-    except OSError:
-        return "N/A"
+    return flatten_frame(iter_notices(src))
 
 
-def enrich_with_ip(rows: list[dict]) -> None:
+def clean_names(df: pd.DataFrame) -> None:
     '''
-    Perform parallel DNS look-ups using a thread pool.
-    Adds an 'ip_address' key to each row in-place.
-    Caches results so each domain is only looked up once.
+    Standardize principal names (lowercase, no punctuation / 'inc', title-case)
+    and extract root domains. Each distinct value is cleaned once.
     '''
-    unique_domains = {row["domain"] for row in rows}
-    ip_cache: dict[str, str] = {}
-
-    # Submit DNS lookups in parallel
-    with ThreadPoolExecutor(max_workers=N_WORKERS) as pool:
-        future_to_domain = {pool.submit(resolve_ip, d): d for d in unique_domains}
-        for future in as_completed(future_to_domain):
-            dom = future_to_domain[future]
-            ip_cache[dom] = future.result()
+    df["principal_clean"] = tidy_principals(df["principal"])
+    df["root_domain"] = root_domains(df["domain"], psl=PSL_ROOT_DOMAINS)
 
-    # Assign resolved IPs back to each row
-    for row in rows:
-        row["ip_address"] = ip_cache[row["domain"]]
 
-
-def write_csv(rows: list[dict], out_path: Path) -> None:
+def enrich_with_ip(df: pd.DataFrame) -> None:
     '''
-    Write the list of dictionaries to a CSV file.
-    Raises an error if there is no data.
+    Perform concurrent DNS look-ups, each domain once and only if DNS_CACHE
+    has no fresh answer. Adds an 'ip_address' column in-place ('N/A' if the
+    look-up fails).
     '''
-    if not rows:
-        raise ValueError("No data extracted - check input file.")
-    fields = list(rows[0].keys())
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fields)
-        w.writeheader()
-        w.writerows(rows)
+    stats = ResolveStats()
+    ip_cache = resolve_domains(df["domain"].unique(), backend=DNS_BACKEND,
+                               concurrency=N_WORKERS, timeout=TIMEOUT_S, cache=DNS_CACHE,
+                               retry=DNS_RETRY, stats=stats)
+    print(f"DNS look-ups: {stats.resolved} resolved, {stats.nxdomain} NXDOMAIN, "
+          f"{stats.timeouts} timed out ({stats.retries} retries)")
+    df["ip_address"] = df["domain"].map(ip_cache)
 
 
-def summarise(rows: list[dict]) -> None:
+def write_csv(df: pd.DataFrame, out_path: Path) -> Path:
     '''
-    Print three summary tables:
-    - Top 5 Principals
-    - Top 5 Infringing Domains
-    - Top 5 Recipients
+    Stream the EXPORT_COLUMNS of the frame to a CSV file in fixed-size chunks,
+    compressed per CSV_COMPRESSION. Raises an error if there is no data.
     '''
-    principals = Counter(r["principal"] for r in rows).most_common(5)
-    domains    = Counter(r["domain"]   for r in rows).most_common(5)
-    recipients = Counter(r["recipient"] for r in rows).most_common(5)
+    if df.empty:
+        raise ValueError("No data extracted - check input file.")
+    out_path = out_path.with_name(out_path.name + CSV_COMPRESSION_SUFFIX[CSV_COMPRESSION])
+    write_csv_stream([df], out_path, EXPORT_COLUMNS, compression=CSV_COMPRESSION)
+    return out_path
 
-    print("\nTop 5 Principals:")
-    for p, n in principals:
-        print(f"  {p:<30}  {n:>6}")
 
-    print("\nTop 5 Infringing Domains:")
-    for d, n in domains:
-        print(f"  {d:<30}  {n:>6}")
+def print_table(title: str, counts: pd.Series) -> None:
+    print()
+    print(title)
+    for key, n in counts.items():
+        print(f"  {str(key):<30}  {n:>6}")
 
-    print("\nTop 5 Recipients:")
-    for r, n in recipients:
-        print(f"  {r:<30}  {n:>6}")
 
 def main() -> None:
     '''
     Main pipeline:
-    - Load JSON data
-    - Flatten notices to rows
-    - Enrich with IP addresses (parallel DNS)
+    - Load and flatten notices to rows
     - Clean/standardize principal and domain names
-    - Print summary insights
+    - Enrich with IP addresses (concurrent DNS)
+    - Print summary insights (one pass over the rows)
     - Write output CSV
     '''
-    raw   = load_json(INPUT_JSON)
-    rows  = flatten_notices(raw)
-    enrich_with_ip(rows)
+    df = flatten_notices(INPUT_JSON)
+    clean_names(df)
+    enrich_with_ip(df)
 
-    df = pd.DataFrame(rows)
-    def tidy_principal(name: str) -> str:
-        '''
-        Standardize principal names: lowercase, remove punctuation,
-        remove 'inc', collapse whitespace, and title-case.
-        '''
-        if pd.isna(name):
-            return "Unknown"
-        n = name.lower()
-        n = re.sub(r'[,.\']', '', n)          # remove punctuation
-        n = n.replace(' inc', '').strip()
-        n = re.sub(r'\s+', ' ', n)
-        return n.title()
+    summary = SummaryState.from_frame(df)
+    print_table("Top 5 Principals:", summary.top("principals_raw", 5))
+    print_table("Top 5 Infringing Domains:", summary.top("domains", 5))
+    print_table("Top 5 Recipients:", summary.top("recipients", 5))
 
-    df["principal_clean"] = df["principal"].apply(tidy_principal)
-
-    def root_domain(d: str) -> str:
-        '''
-        Extract the root domain (last two labels) and remove 'www.' prefix.
-        '''
-        if pd.isna(d):
-            return "unknown"
-        d = d.lower()
-        d = re.sub(r'^www\d*\.', '', d)       # drop www., www2. etc.
-        return '.'.join(d.split('.')[-2:])    # keep last two labels
-
-    df["root_domain"] = df["domain"].apply(root_domain)
-
-    print("\n🔸 Top Principals (cleaned):")
-    print(df["principal_clean"].value_counts().head(10))
-
-    print("\n🔸 Top Root Domains:")
-    print(df["root_domain"].value_counts().head(10))
+    print_table("🔸 Top Principals (cleaned):", summary.top_principals(10))
+    print_table("🔸 Top Root Domains:", summary.top_root_domains(10))
 
     # 2a. Notice volume over time (monthly trend)
-    df["month"] = pd.to_datetime(df["date_sent"], utc=True).dt.tz_localize(None).dt.to_period("M")
-
-    trend = df.groupby("month").size()
-    print("\n🔸 Monthly notice volume (last 12):")
-    print(trend.tail(12))
+    print_table("🔸 Monthly notice volume (last 12):", summary.monthly_trend().tail(12))
 
     # 2b. IP addresses hosting many distinct domains
-    ip_hosting = (df.groupby("ip_address")["root_domain"]
-                    .nunique()
-                    .sort_values(ascending=False)
-                    .head(10))
-    ip_hosting = ip_hosting[ip_hosting.index != "N/A"]
-
-    print("\n🔸 IPs hosting the most *unique* infringing domains:")
-    print(ip_hosting)
+    print_table("🔸 IPs hosting the most *unique* infringing domains:", summary.ip_hosting(10))
 
     # Write the enriched and flattened data to CSV
-    write_csv(rows, OUTPUT_CSV)
-
-print(f"\n✅  CSV written to: {OUTPUT_CSV.resolve()}")
+    out_path = write_csv(df, OUTPUT_CSV)
+    print()
+    print(f"✅  CSV written to: {out_path.resolve()}")
 
 if __name__ == "__main__":
     main()
@@ -263,24 +151,50 @@ if __name__ == "__main__":
 
     # ---------- execute the code ----------
     import json
-    import csv
-    import socket
     from pathlib import Path
-    from urllib.parse import urlparse
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    from collections import Counter
+    from typing import Iterable, Iterator
     import pandas as pd
-    import re, requests
+    import copy
+    from notice_pipeline import (CSV_COMPRESSION_SUFFIX, EXPORT_COLUMNS, FLAT_COLUMNS,
+                                 FLAT_SCHEMA, cleaning_fingerprint,
+                                 flatten_clean_parallel, flatten_frame, format_report,
+                                 IngestStats, expand_sources, iter_json_array, iter_notices, iter_sources,
+                                 iter_text_chunks, root_domains, sources_fingerprint,
+                                 tidy_principals, write_columnar, write_csv_stream)
+    from dns_resolver import DnsCache, ResolveStats, RetryPolicy, resolve_domains
+    from http_fetch import fetch_bytes
+    from notice_store import NoticeStore
+    from pipeline_job import PipelineJob, StageCache
+    from summaries import NOT_FOUND, SUMMARY_VERSION, SummaryState
+    from bitmap_index import BitmapIndex
+    from sql_store import STORED_COLUMNS, SqlStore
 
     # -------- CONFIG -------------------------------------------------------------
     # Google Drive share-link → file-ID → direct-download URL
     DRIVE_FILE_ID = "134U6xLIZUZ9sA1BW-X9TLZtUlEYCvQwz"
-    INPUT_JSON = (                       # we now pass a URL, not a Path
+    INPUT_JSON = (                       # a URL, file, directory or glob - or a list of them
         f"https://drive.google.com/uc?export=download&id={DRIVE_FILE_ID}"
     )
     OUTPUT_CSV = Path("flattened_infringing_urls.csv")
-    N_WORKERS  = 8
-    TIMEOUT_S  = 3
+    CSV_COMPRESSION = None               # "gzip" / "zstd" → OUTPUT_CSV gets .gz / .zst appended
+    OUTPUT_COLUMNAR = Path("flattened_infringing_urls.parquet")   # .arrow → Arrow IPC, None to skip
+    N_WORKERS  = 1000                    # ceiling for DNS look-ups in flight (AIMD adapts below it)
+    TIMEOUT_S  = 3                       # cap per attempt
+    DNS_RETRY  = RetryPolicy(attempts=3, budget_s=10)   # only timeouts are retried
+    DNS_BACKEND = None                   # None → nameservers from /etc/resolv.conf
+    DNS_CACHE  = DnsCache(Path("dns_cache.sqlite3"))   # survives reruns; TTLs in dns_resolver.py
+    STREAM_JSON = True                   # parse notices one by one while downloading
+    SOURCE_WORKERS = 8                   # input sources downloaded / parsed at once
+    PSL_ROOT_DOMAINS = True              # registrable domain via the Public Suffix List, not last two labels
+    N_PROCESSES = 1                      # >1 → flatten + clean shards of notices on that many processes
+    INCREMENTAL = False                  # only process notices newer than the stored watermark (append-only input)
+    STORE_DIR  = Path("notice_store")    # flattened rows + watermark + summary state for INCREMENTAL
+    SUMMARY_SKETCH = None                # e.g. {"capacity": 1000, "precision": 8} → approximate
+                                         # summaries in bounded memory (Misra-Gries / HyperLogLog)
+    SQL_STORE  = None                    # e.g. Path("notices.sqlite3") → serve the summaries from an
+                                         # indexed SQLite copy of the enriched rows
+    JOB_POLL_S = 1.0                     # how often the page refreshes while the pipeline job runs
+    CROSSFILTER_OPTIONS = 50             # most frequent values offered per cross-filter
     # -----------------------------------------------------------------------------
 
     def load_json(src: str | Path) -> dict:
@@ -293,202 +207,470 @@ if __name__ == "__main__":
 
         # 1️⃣ Remote file ----------------------------------------------------------
         if src_str.startswith(("http://", "https://")):
-            # Google Drive ‘share’ links need converting to the *download* endpoint
-            m = re.search(r"/d/([^/]+)/", src_str)
-            if m:
-                file_id = m.group(1)
-                src_str = f"https://drive.google.com/uc?export=download&id={file_id}"
-
-            # small files (<100 MB) download in one go; large files may need a second
-            with requests.Session() as sess:
-                r = sess.get(src_str, timeout=30, stream=True)
-                # If we hit Drive’s virus-scan / confirm page, grab the token & resend
-                if "content-disposition" not in r.headers:
-                    for k, v in r.cookies.items():
-                        if k.startswith("download_warning"):
-                            r = sess.get(src_str, params={"confirm": v}, timeout=30)
-                            break
-                r.raise_for_status()
-                return r.json()
+            # share-link conversion, Drive’s confirm page and the disk cache: http_fetch.py
+            return json.loads(fetch_bytes(src_str))
 
         # 2️⃣ Local file -----------------------------------------------------------
         with Path(src_str).open("r", encoding="utf-8") as f:
             return json.load(f)
 
-    def flatten_notices(raw: dict) -> list[dict]:
+    def flatten_notices(raw: dict | Iterable[dict]) -> pd.DataFrame:
         '''
         Flatten the nested JSON structure so each infringing URL gets its own
-        dictionary (future CSV row). Extracts relevant fields from each notice.
-        '''
-        rows = []
-        for notice in raw.get("notices", []):
-            base = {
-                "notice_id":  notice.get("id"),
-                "title":      notice.get("title"),
-                "sender":     notice.get("sender_name"),
-                "principal":  notice.get("principal_name"),
-                "recipient":  notice.get("recipient_name"),
-                "date_sent":  notice.get("date_sent"),
-            }
-
-            for work in notice.get("works", []):
-                description = work.get("description")
-                for item in work.get("infringing_urls", []):
-                    url = item.get("url")
-                    rows.append(
-                        {
-                            **base,
-                            "description":    description,
-                            "infringing_url": url,
-                            "domain":         urlparse(url).netloc.lower(),  # Extract domain from URL
-                        }
-                    )
-        return rows
-
-
-    def resolve_ip(domain: str) -> str:
-        '''
-        Return the IPv4 address for a domain.
-        Returns 'N/A' if the lookup fails (e.g., DNS error or timeout).
+        row (future CSV row). Extracts relevant fields from each notice.
+        Accepts the whole document or an iterator of notices (streaming mode).
+        Rows are gathered as column batches, so no per-row dicts are built, and
+        the repeated notice fields come back as categoricals.
         '''
-        try:
-            socket.setdefaulttimeout(TIMEOUT_S)
-            return socket.gethostbyname(domain)
-        except OSError:
-            return "N/A"
+        notices = raw.get("notices", []) if isinstance(raw, dict) else raw
+        return flatten_frame(notices)
 
 
-    def enrich_with_ip(rows: list[dict]) -> None:
+    def enrich_with_ip(df: pd.DataFrame, job: PipelineJob | None = None) -> None:
         '''
-        Perform parallel DNS look-ups using a thread pool.
-        Adds an 'ip_address' key to each row in-place.
-        Caches results so each domain is only looked up once.
+        Perform concurrent DNS look-ups on an asyncio event loop. The number in
+        flight adapts to observed latency / timeouts (AIMD, at most N_WORKERS)
+        and timed-out look-ups are retried per DNS_RETRY.
+        Adds an 'ip_address' column in-place.
+        Each domain is looked up once, and only if DNS_CACHE has no fresh answer.
+        With a *job*, progress goes to its "dns" stage and the summary lines to its log.
         '''
-        unique_domains = {row["domain"] for row in rows}
-        ip_cache: dict[str, str] = {}
-
-        # Submit DNS lookups in parallel
-        with ThreadPoolExecutor(max_workers=N_WORKERS) as pool:
-            future_to_domain = {pool.submit(resolve_ip, d): d for d in unique_domains}
-            for future in as_completed(future_to_domain):
-                dom = future_to_domain[future]
-                ip_cache[dom] = future.result()
+        unique_domains = df["domain"].unique()
+        dns_stats = ResolveStats()
+        report = job.log if job is not None else st.write
+        on_result = None
+        if job is not None:
+            job.stage("dns", "Resolving domains", total=len(unique_domains), unit="domains")
+            answered = 0
+
+            def on_result(domain: str, ip: str) -> None:
+                nonlocal answered
+                answered += 1
+                if answered % 100 == 0 or answered == len(unique_domains):
+                    job.advance("dns", answered)
+
+        # Resolve every unique domain concurrently
+        ip_cache = resolve_domains(unique_domains, backend=DNS_BACKEND,
+                                   concurrency=N_WORKERS, timeout=TIMEOUT_S, cache=DNS_CACHE,
+                                   retry=DNS_RETRY, stats=dns_stats, on_result=on_result)
+        if job is not None:
+            job.finish("dns")
+        stats = DNS_CACHE.stats
+        report(f"DNS cache: {stats.hits} hits, {stats.misses} misses, {stats.evicted} evicted")
+        if stats.misses:
+            report(f"DNS look-ups: {dns_stats.resolved} resolved, {dns_stats.nxdomain} NXDOMAIN, "
+                   f"{dns_stats.timeouts} timed out ({dns_stats.retries} retries), "
+                   f"window peaked at {dns_stats.peak_window:.0f}")
 
         # Assign resolved IPs back to each row
-        for row in rows:
-            row["ip_address"] = ip_cache[row["domain"]]
+        df["ip_address"] = df["domain"].map(ip_cache)
 
 
-    def write_csv(rows: list[dict], out_path: Path) -> None:
+    def write_csv(df: pd.DataFrame, out_path: Path, append: bool = False) -> None:
         '''
-        Write the list of dictionaries to a CSV file.
+        Stream the flattened frame to a CSV file in fixed-size chunks with the
+        EXPORT_COLUMNS header, compressed per CSV_COMPRESSION.
+        With append=True the rows are added to the existing file instead.
         Raises an error if there is no data.
         '''
-        if not rows:
+        if df.empty:
             raise ValueError("No data extracted – check input file.")
-        fields = list(rows[0].keys())
-        with out_path.open("w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=fields)
-            w.writeheader()
-            w.writerows(rows)
+        out_path = out_path.with_name(out_path.name + CSV_COMPRESSION_SUFFIX[CSV_COMPRESSION])
+        write_csv_stream([df], out_path, EXPORT_COLUMNS, compression=CSV_COMPRESSION, append=append)
 
 
-    def summarise(rows: list[dict]) -> None:
+    def read_notices(job: PipelineJob, store: NoticeStore | None = None) -> Iterable[dict]:
         '''
-        st.write three summary tables:
-        - Top 5 Principals
-        - Top 5 Infringing Domains
-        - Top 5 Recipients
+        Notices from INPUT_JSON, reporting bytes read and notices parsed to *job*.
+        When streaming, job.profiler times the download and the parse apart.
+        Several sources are read SOURCE_WORKERS at a time and merged in order,
+        duplicate notice ids dropped - one flatten / enrich / summary run.
+        With a *store*, only notices beyond each source's watermark that are
+        not stored yet are returned.
         '''
-        principals = Counter(r["principal"] for r in rows).most_common(5)
-        domains    = Counter(r["domain"]   for r in rows).most_common(5)
-        recipients = Counter(r["recipient"] for r in rows).most_common(5)
-
-        st.write("\nTop 5 Principals:")
-        for p, n in principals:
-            st.write(f"  {p:<30}  {n:>6}")
-
-        st.write("\nTop 5 Infringing Domains:")
-        for d, n in domains:
-            st.write(f"  {d:<30}  {n:>6}")
-
-        st.write("\nTop 5 Recipients:")
-        for r, n in recipients:
-            st.write(f"  {r:<30}  {n:>6}")
+        on_bytes = lambda read, total: job.advance("download", read, total)
+        prof = job.profiler
+        sources = expand_sources(INPUT_JSON)
+        keep = (lambda src, notices: store.new_notices(notices, src)) if store else (lambda src, notices: notices)
+        if len(sources) > 1:
+            ingest = IngestStats()
+            if STREAM_JSON:
+                read = lambda src, progress: keep(src, iter_notices(src, on_bytes=progress))
+            else:
+                read = lambda src, _: keep(src, load_json(src).get("notices", []))
+            seen = store.stored_ids() if store else None     # a new dump may repeat stored notices
+
+            def merged() -> Iterator[dict]:
+                yield from iter_sources(sources, read, SOURCE_WORKERS, on_bytes, ingest, seen=seen)
+                job.log(f"{ingest.notices:,} notices from {ingest.sources} sources "
+                        f"({ingest.duplicates:,} duplicates skipped), slowest source {ingest.slowest_s:.1f}s")
+
+            # download + parse happen together on the reader threads
+            notices = prof.iterate("download", merged())
+        elif STREAM_JSON:
+            chunks = prof.iterate("download", iter_text_chunks(sources[0], on_bytes=on_bytes))
+            notices = keep(sources[0], prof.iterate("parse", iter_json_array(chunks, key="notices")))
+        else:
+            with prof.stage("download"):          # download + parse in one call
+                notices = keep(sources[0], load_json(sources[0]).get("notices", []))
+        return job.track("flatten", notices)
+
+    def clean_names(df: pd.DataFrame) -> None:
+        '''
+        Standardize principal names / extract root domains. Same rules as
+        notice_pipeline.tidy_principal / root_domain (or the Public Suffix
+        List), but each distinct value is cleaned once and the columns come
+        back as categoricals.
+        '''
+        df["principal_clean"] = tidy_principals(df["principal"])
+        df["root_domain"] = root_domains(df["domain"], psl=PSL_ROOT_DOMAINS)
 
-    def main() -> None:
+    def flatten_and_clean(notices: Iterable[dict], prof: Profiler | NullProfiler = NULL_PROFILER) -> pd.DataFrame:
+        '''
+        flatten_notices() + clean_names(). With N_PROCESSES > 1 the notices are
+        sharded over a process pool instead; the frame comes back identical.
+        '''
+        if N_PROCESSES > 1:
+            with prof.stage("flatten"):           # cleaning runs inside the workers
+                return flatten_clean_parallel(notices, N_PROCESSES, psl=PSL_ROOT_DOMAINS)
+        with prof.stage("flatten"):
+            df = flatten_notices(notices)
+        with prof.stage("clean"):
+            clean_names(df)
+        return df
+
+    # Cached stages. Each is keyed by the source fingerprint plus a hash of the
+    # settings it depends on, so a rerun with unchanged input renders from the
+    # cache and only the stages whose inputs changed are recomputed. They run
+    # on the job's thread, so they are memoised in a StageCache rather than
+    # with st.cache_data (which needs the script thread). The frames they
+    # return are shared - add columns to a shallow copy.
+    @st.cache_resource(show_spinner=False)
+    def stage_cache() -> StageCache:
+        '''Stage results shared by every job, rerun and session.'''
+        return StageCache(max_entries=2)
+
+    stages = stage_cache()
+
+    def flatten_stage(src_key: str, job: PipelineJob) -> pd.DataFrame:
+        return stages.get("flatten", (src_key,), lambda: flatten_notices(read_notices(job)))
+
+    def flatten_clean_stage(src_key: str, clean_cfg: str, job: PipelineJob) -> pd.DataFrame:
+        return stages.get("flatten_clean", (src_key, clean_cfg), lambda: flatten_and_clean(read_notices(job)))
+
+    def ip_stage(src_key: str, dns_cfg: str, df: pd.DataFrame, job: PipelineJob) -> pd.Series:
+        def resolve() -> pd.Series:
+            out = df[["domain"]].copy()
+            enrich_with_ip(out, job)
+            return out["ip_address"]
+        return stages.get("ip", (src_key, dns_cfg), resolve)
+
+    def clean_stage(src_key: str, clean_cfg: str, job: PipelineJob) -> pd.DataFrame:
+        def clean() -> pd.DataFrame:
+            df = flatten_stage(src_key, job)[["principal", "domain"]].copy(deep=False)
+            clean_names(df)
+            return df[["principal_clean", "root_domain"]]
+        return stages.get("clean", (src_key, clean_cfg), clean)
+
+    def summary_stage(src_key: str, dns_cfg: str, clean_cfg: str, sum_cfg: str, df: pd.DataFrame) -> SummaryState:
+        return stages.get("summary", (src_key, dns_cfg, clean_cfg, sum_cfg),
+                          lambda: SummaryState.from_frame(df, SUMMARY_SKETCH))
+
+    def output_stage(src_key: str, dns_cfg: str, clean_cfg: str, df: pd.DataFrame) -> None:
+        def write() -> None:
+            df_final = df[list(EXPORT_COLUMNS)]
+            write_csv(df_final, OUTPUT_CSV)
+            if OUTPUT_COLUMNAR is not None:
+                write_columnar(df_final, OUTPUT_COLUMNAR,
+                               "arrow" if OUTPUT_COLUMNAR.suffix == ".arrow" else "parquet")
+        stages.get("output", (src_key, dns_cfg, clean_cfg), write)
+
+    def stored_frame(root: str, config: str, parts: tuple[str, ...]) -> pd.DataFrame:
+        return stages.get("stored", (root, config, parts),
+                          lambda: NoticeStore(root, config).load_frame(list(EXPORT_COLUMNS)))
+
+    def sql_stage(job: PipelineJob, sql: SqlStore, src_key: str, df: pd.DataFrame,
+                  new: pd.DataFrame | None = None) -> None:
+        '''
+        Bulk-load the enriched rows *df* into the SQL store, unless it already
+        holds this source - only the *new* ones when it holds all the others -
+        and publish it for the page to query.
         '''
-        Main pipeline:
-        - Load JSON data
+        if sql.source != src_key:
+            with job.profiler.stage("export"):
+                if new is not None and sql.rows == len(df) - len(new):
+                    sql.load(new[list(STORED_COLUMNS)], source=src_key, replace=False)
+                else:
+                    sql.load(df, source=src_key)
+        job.publish("sql", sql)
+
+    def run_pipeline(job: PipelineJob, src_key: str, dns_cfg: str, clean_cfg: str, sum_cfg: str) -> None:
+        '''
+        Main pipeline, run by the background job:
+        - Load JSON data (streamed notice by notice when STREAM_JSON is set)
         - Flatten notices to rows
-        - Enrich with IP addresses (parallel DNS)
         - Clean/standardize principal and domain names
-        - st.ite summary insights
-        - Write output CSV
+          (both on a process pool when N_PROCESSES > 1)
+        - Enrich with IP addresses (parallel DNS)
+        - Summaries, then write output CSV
+        Results are published as soon as they exist: "frame" and "summary"
+        without IPs once notices are flattened and cleaned, then again with
+        IPs (and "ips", and the bitmap "index" for cross-filtering) once DNS
+        finishes. Stages are timed by job.profiler, looked up per stage so a
+        profiler attached mid-run times the stages that follow. With SQL_STORE
+        set, the enriched rows are also loaded into SQLite and published as
+        "sql" - right away when it already holds this source - and the page's
+        summaries are served from it.
+        With INCREMENTAL set, only notices beyond the stored watermark go
+        through the pipeline; they are appended to the store in STORE_DIR and
+        their aggregates merged into the saved summary state. This assumes
+        the input only grows - a different INPUT_JSON starts a new store.
         '''
-        raw   = load_json(INPUT_JSON)
-        rows  = flatten_notices(raw)
-        enrich_with_ip(rows)
-
-        df = pd.DataFrame(rows)
-        def tidy_principal(name: str) -> str:
-            '''
-            Standardize principal names: lowercase, remove punctuation,
-            remove 'inc', collapse whitespace, and title-case.
-            '''
-            if pd.isna(name):
-                return "Unknown"
-            n = name.lower()
-            n = re.sub(r'[,.\']', '', n)          # remove punctuation
-            n = n.replace(' inc', '').strip()
-            n = re.sub(r'\s+', ' ', n)
-            return n.title()
-
-        df["principal_clean"] = df["principal"].apply(tidy_principal)
-
-        def root_domain(d: str) -> str:
-            '''
-            Extract the root domain (last two labels) and remove 'www.' prefix.
-            '''
-            if pd.isna(d):
-                return "unknown"
-            d = d.lower()
-            d = re.sub(r'^www\d*\.', '', d)       # drop www., www2. etc.
-            return '.'.join(d.split('.')[-2:])    # keep last two labels
-
-        df["root_domain"] = df["domain"].apply(root_domain)
-        df_final = pd.DataFrame(rows)          # turn list-of-dicts into a DataFrame
-        st.subheader("Csv File Preview")     
-        st.dataframe(df_final.head(), use_container_width=True)
-
-        csv_bytes = df_final.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            label="⬇️ Download CSV",
-            data=csv_bytes,
-            file_name="flattened_infringing_urls.csv",
-            mime="text/csv",
-        )
-
-        st.write("\n🔸 Top Root Domains:")
-        st.write(df["root_domain"].value_counts().head(10))
-        st.bar_chart(df["root_domain"].value_counts().head(10), x_label="Domain Name", y_label="Count")
+        job.stage("download", "Downloading", unit="bytes")
+        job.stage("flatten", "Flattening", unit="notices")
+        sql = None
+        if SQL_STORE is not None:
+            sql = SqlStore(SQL_STORE, config=config_hash(dns=dns_cfg, clean=clean_cfg, schema=FLAT_SCHEMA))
+            if sql.source == src_key:
+                job.publish("sql", sql)           # unchanged input → charts render from the indexed store
+
+        if INCREMENTAL:
+            # keyed by the input as configured, not its fingerprint: the same
+            # source growing stays incremental, pointing at another one resets
+            store = NoticeStore(STORE_DIR, config=config_hash(input=str(INPUT_JSON), dns=dns_cfg, clean=clean_cfg,
+                                                              summary=sum_cfg, schema=FLAT_SCHEMA),
+                                sketch=SUMMARY_SKETCH)
+            fresh = not store.parts               # empty / reset store → rewrite the CSV, don't append
+            # same fingerprint → nothing new to read
+            new = flatten_and_clean(read_notices(job, store) if store.source != src_key else [],
+                                    job.profiler)
+            job.finish("download")
+            job.finish("flatten")
+            with job.profiler.stage("aggregate"):
+                partial = copy.deepcopy(store.summary)
+                partial.update(new)
+            job.publish("frame", new[list(FLAT_COLUMNS)] if fresh else
+                        stored_frame(str(STORE_DIR), store.config, tuple(store.parts)))
+            job.publish("summary", partial)
+
+            with job.profiler.stage("dns"):
+                enrich_with_ip(new, job)
+            with job.profiler.stage("aggregate"):  # merges the summary and writes the new part
+                store.append(new, source=src_key)
+            job.log(f"{len(new)} new rows since the last run, {store.summary.rows} stored in total")
+            df_final = stored_frame(str(STORE_DIR), store.config, tuple(store.parts))
+            job.publish("frame", df_final)
+            job.publish("summary", store.summary)
+            full = store.load_frame()             # with the cleaned columns
+            with job.profiler.stage("aggregate"):
+                job.publish("index", BitmapIndex(full))
+            if sql is not None:
+                sql_stage(job, sql, src_key, full, new)
+            job.publish("ips", True)
+
+            # Incremental runs append just the new rows to the CSV
+            if not new.empty:
+                job.stage("write", "Writing output files")
+                with job.profiler.stage("export"):
+                    write_csv(new[list(EXPORT_COLUMNS)], OUTPUT_CSV, append=not fresh)
+                    if OUTPUT_COLUMNAR is not None:
+                        write_columnar(df_final, OUTPUT_COLUMNAR,
+                                       "arrow" if OUTPUT_COLUMNAR.suffix == ".arrow" else "parquet")
+                job.finish("write")
+            return
 
-        # IP addresses hosting many distinct domains
-        ip_hosting = (df.groupby("ip_address")["root_domain"]
-                        .nunique()
-                        .sort_values(ascending=False)
-                        .head(10))
-        ip_hosting = ip_hosting[ip_hosting.index != "N/A"]
+        # stages served from the StageCache show up in the profiler with cache-lookup times
+        if N_PROCESSES > 1:                  # flattening and cleaning happen together in the workers
+            with job.profiler.stage("flatten"):
+                df = flatten_clean_stage(src_key, clean_cfg, job).copy(deep=False)
+            job.finish("download")
+            job.finish("flatten")
+        else:
+            with job.profiler.stage("flatten"):
+                df = flatten_stage(src_key, job).copy(deep=False)
+            job.finish("download")
+            job.finish("flatten")
+            with job.profiler.stage("clean"):
+                cleaned = clean_stage(src_key, clean_cfg, job)
+            df["principal_clean"] = cleaned["principal_clean"]
+            df["root_domain"] = cleaned["root_domain"]
+        job.publish("frame", df[list(FLAT_COLUMNS)])
+        with job.profiler.stage("aggregate"):
+            job.publish("summary", SummaryState.from_frame(df, SUMMARY_SKETCH))
+
+        with job.profiler.stage("dns"):
+            df["ip_address"] = ip_stage(src_key, dns_cfg, df, job)
+        job.publish("frame", df[list(EXPORT_COLUMNS)])    # exported columns
+        with job.profiler.stage("aggregate"):
+            job.publish("summary", summary_stage(src_key, dns_cfg, clean_cfg, sum_cfg, df))
+            job.publish("index", BitmapIndex(df))
+        if sql is not None:
+            sql_stage(job, sql, src_key, df)
+        job.publish("ips", True)
+
+        # Write the enriched and flattened data to CSV (and Parquet / Arrow IPC)
+        job.stage("write", "Writing output files")
+        with job.profiler.stage("export"):
+            output_stage(src_key, dns_cfg, clean_cfg, df)
+        job.finish("write")
+
+    @st.cache_resource(show_spinner=False, max_entries=2)
+    def pipeline_job(src_key: str, dns_cfg: str, clean_cfg: str, sum_cfg: str,
+                     incremental: bool, _profile: bool = False) -> PipelineJob:
+        '''
+        One background job per source / config, shared by every rerun and session.
+        A job started with *_profile* runs under its own Profiler (cProfile
+        included). The flag is not part of the key: toggling the profiler
+        attaches to the running job (see main) instead of starting another.
+        '''
+        return PipelineJob(lambda job: run_pipeline(job, src_key, dns_cfg, clean_cfg, sum_cfg),
+                           profiler=Profiler() if _profile else NULL_PROFILER)
 
-        st.write("\n🔸 IPs hosting the most *unique* infringing domains:")
-        st.write(ip_hosting)
-        st.bar_chart(ip_hosting, x_label="Unique Domains Hosted", y_label="IP Address",horizontal=True)
+    def show_job(job: PipelineJob, version: str) -> None:
+        '''
+        Render the job's progress and whatever results it has published so far.
+        *version* identifies the dataset (source and configs), for cached downloads.
+        '''
+        running = job.running                     # read before the snapshot, so both agree
+        stages, results, log = job.snapshot()
+        for s in stages:
+            if s.fraction is None:
+                st.caption(str(s))
+            else:
+                st.progress(s.fraction, text=str(s))
+        for line in log:
+            st.write(line)
+        if job.error is not None:
+            st.exception(job.error)
+            if st.button("Run again"):
+                pipeline_job.clear()
+                st.rerun()
+            return
+        if "summary" not in results and "sql" not in results:
+            return                                # "frame" is published just before "summary"
+
+        # with SQL_STORE the summaries are indexed queries on SQLite, which may
+        # be published (unchanged input) before this run has rebuilt its frame
+        df_final, ips = results.get("frame"), results.get("ips", False) or "sql" in results
+        summary = results["sql"] if "sql" in results else results["summary"]
+        if df_final is not None:
+            st.subheader("Csv File Preview")     
+            paged_table(df_final, config_hash(version=version, rows=len(df_final), ips=ips), "notices", prof=prof)
+
+        if not running:
+            lazy_download(df_final, "flattened_infringing_urls", config_hash(version=version, rows=len(df_final)),
+                          ("CSV", "CSV (gzip)", "CSV (zip)", "Parquet", "Arrow IPC"), prof=prof)
+            if st.button("Compare output formats"):
+                st.write("File size (MB) and write / read time (s) per format:")
+                st.write(format_report(df_final))
+
+        approx = " (≈)" if summary.approximate else ""      # sketch mode - see error_note()
+        if summary.approximate:
+            st.caption(summary.error_note())
+
+        # Date-range filter: every chart below except the IP one is answered from
+        # the per-day rollups in the summary, so moving the slider never rescans rows
+        start = end = None
+        span = summary.date_span()
+        if span and span[0] < span[1]:
+            picked = st.slider("Date range", min_value=span[0], max_value=span[1], value=span)
+            if picked != span:
+                start, end = picked
+
+        # Cross-filters: answered by intersecting the bitmaps of the selected
+        # values, and each chart ignores its own filter so it still shows the
+        # alternatives. The index is built once the enriched frame exists.
+        index, filters = results.get("index"), {}
+        if index is not None:
+            choices = {"principal_clean": "Principal", "recipient": "Recipient",
+                       "root_domain": "Root domain", "ip_address": "IP address", "month": "Month"}
+            choices = {col: name for col, name in choices.items() if col in index.values}
+            for box, (col, name) in zip(st.columns(len(choices)), choices.items()):
+                picked = box.multiselect(name, index.options(col, CROSSFILTER_OPTIONS))
+                if picked:
+                    filters[col] = picked
+            if filters:
+                st.caption(f"{index.count(filters, start, end):,} rows match the filters")
+
+        def view(column: str) -> dict:
+            '''The filters a chart of *column* is answered under - every one but its own.'''
+            return {c: v for c, v in filters.items() if c != column}
+
+        def label(column: str, exact: bool = False) -> str:
+            '''Chart title suffix; cross-filtered (index) views are exact, even in sketch mode.'''
+            parts = ([f"{start} – {end}"] if start else []) + (["filtered"] if view(column) else [])
+            return (f" ({', '.join(parts)})" if parts else "") + ("" if exact or view(column) else approx)
+
+        if view("root_domain"):
+            top_domains = index.top("root_domain", 10, view("root_domain"), start, end)
+        else:
+            top_domains = summary.top_root_domains(10, start, end)
+        st.write(f"\n🔸 Top Root Domains{label('root_domain')}:")
+        st.write(top_domains)
+        st.bar_chart(top_domains, x_label="Domain Name", y_label="Count")
+
+        freq = st.radio("Notice volume per", ("Month", "Week"), horizontal=True)
+        if view("month"):
+            trend = index.trend(freq[0], view("month"), start, end)
+        else:
+            trend = summary.trend(freq[0], start, end)
+        st.write(f"\n🔸 {freq}ly notice volume (last 12){label('month', exact=True)}:")
+        st.write(trend.tail(12))
+        st.line_chart(trend.set_axis(trend.index.start_time), x_label=freq, y_label="Notices")
 
-        st.write("\n🔸 Top Principals (cleaned):")
-        st.write(df["principal_clean"].value_counts().head(10))
+        # IP addresses hosting many distinct domains
+        if ips:
+            if view("ip_address"):
+                ip_hosting = index.distinct("ip_address", "root_domain", 10, view("ip_address"), start, end)
+                ip_hosting = ip_hosting[ip_hosting.index != NOT_FOUND]
+                scope = label("ip_address")
+            else:                                 # the summary's per-IP counts cover all dates
+                ip_hosting = summary.ip_hosting(10)
+                scope = approx + (" (all dates)" if start else "")
+
+            st.write(f"\n🔸 IPs hosting the most *unique* infringing domains{scope}:")
+            st.write(ip_hosting)
+            st.bar_chart(ip_hosting, x_label="Unique Domains Hosted", y_label="IP Address",horizontal=True)
+        else:
+            st.caption("IP charts appear once DNS resolution finishes.")
+
+        if view("principal_clean"):
+            top_principals = index.top("principal_clean", 10, view("principal_clean"), start, end)
+        else:
+            top_principals = summary.top_principals(10, start, end)
+        st.write(f"\n🔸 Top Principals (cleaned){label('principal_clean')}:")
+        st.write(top_principals)
+
+        if not running:
+            st.caption(f"First results after {job.first_result_s or 0:.1f}s, "
+                       f"pipeline finished after {job.elapsed:.1f}s")
 
-        # Write the enriched and flattened data to CSV
-        write_csv(rows, OUTPUT_CSV)
+    def main() -> None:
+        '''
+        Start (or re-attach to) the background pipeline job and render it.
+        The job is keyed by the source fingerprint (ETag / Last-Modified, or
+        path + mtime) and config hashes, so reruns with unchanged input render
+        its results straight away. While it runs, only the job panel is
+        re-rendered, every JOB_POLL_S seconds.
+        '''
+        src_key   = sources_fingerprint(expand_sources(INPUT_JSON), SOURCE_WORKERS)
+        dns_cfg   = config_hash(N_WORKERS=N_WORKERS, TIMEOUT_S=TIMEOUT_S, DNS_RETRY=DNS_RETRY,
+                                DNS_BACKEND=type(DNS_BACKEND).__name__)
+        clean_cfg = config_hash(PSL_ROOT_DOMAINS=PSL_ROOT_DOMAINS,
+                                rules=cleaning_fingerprint(PSL_ROOT_DOMAINS))
+        sum_cfg   = config_hash(SUMMARY_SKETCH=SUMMARY_SKETCH, SUMMARY_VERSION=SUMMARY_VERSION)
+        job     = pipeline_job(src_key, dns_cfg, clean_cfg, sum_cfg, INCREMENTAL, prof.enabled)
+        polling = job.running
+        if prof.enabled:
+            prof.include(job.attach_profiler())   # pipeline stages run on the job's thread
+
+        @st.fragment(run_every=JOB_POLL_S if polling else None)
+        def job_panel() -> None:
+            if polling and not job.running:
+                st.rerun()                        # finished - one full rerun shows the final page
+            show_job(job, config_hash(src=src_key, dns=dns_cfg, clean=clean_cfg))
+
+        job_panel()
         
     st.write("Summarizations")
 
@@ -496,7 +678,7 @@ if __name__ == "__main__":
         main()
 
 
-def show_assignment_2():
+def show_assignment_2(prof: Profiler | NullProfiler = NULL_PROFILER):
     """Render Assignment 2 with selectable approaches."""
     st.subheader("Assignment 2 - Web Scraping & Data Extraction")
     st.write("---")
@@ -509,12 +691,12 @@ def show_assignment_2():
     approach = st.radio("Select an approach:", ("Approach 1 - Manual", "Approach 2 - Selenium"))
     st.write("The Web Page to scrape is: https://journals.sagepub.com/toc/JMX/current")
     if approach.startswith("Approach 1"):
-        _show_approach_1()
+        _show_approach_1(prof)
     else:
         _show_approach_2()
 
 
-def _show_approach_1():
+def _show_approach_1(prof: Profiler | NullProfiler = NULL_PROFILER):
     """Manual web scraping using downloaded html in Google Drive"""
     st.write("**Approach 1** - Manual web scraping using downloaded html file in Google Drive")
 
@@ -765,9 +947,9 @@ if __name__ == "__main__":
     with st.expander("⬇️ Show Python code"):
         st.code(code_rf, language="python")
 
-    import csv, re, os ,requests
-    from urllib.parse import urlparse, parse_qs
+    import csv, re, os
     from bs4 import BeautifulSoup
+    from http_fetch import drive_file_id, fetch_text
 
     def _find_first_publish_date(elem) -> str:
         #Look anywhere inside *elem* for text like First published online November 16, 2024' or 'First Published January 3 2025'
@@ -943,29 +1125,12 @@ if __name__ == "__main__":
         
         st.write(f"Saved {len(articles)} articles to {filename}")
 
-    def _google_drive_id(url: str) -> str:
-        # Extract the file-ID from any Google-Drive share link.
-        # 1) pattern “.../d/<ID>/view”
-        m = re.search(r'/d/([0-9A-Za-z_-]{10,})', url)
-        if m:
-            return m.group(1)
-
-        # 2) fallback — check ?id=<ID>
-        qs = parse_qs(urlparse(url).query)
-        return qs.get('id', [''])[0]          # returns '' if 'id' not present
-
     def fetch_html_from_gdrive(url: str) -> str:
-        # Download the *raw* file content from a public Google-Drive link. Returns HTML text.
-        file_id = _google_drive_id(url)
-        if not file_id:
+        # Download the *raw* file content from a public Google-Drive link (pooled session, disk cache,
+        # confirm page handled - see http_fetch.py). Returns HTML text.
+        if not drive_file_id(url):
             raise ValueError("❌ Couldn't find a file ID in the provided link.")
-
-        # direct-download endpoint
-        dl_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-
-        resp = requests.get(dl_url, headers={'User-Agent': 'Mozilla/5.0'})
-        resp.raise_for_status()           # 4xx / 5xx -> exception
-        return resp.text                  # HTML string
+        return fetch_text(url)            # HTML string
 
     def main():
         # Main function to orchestrate the scraping and saving process. Looks for HTML file in the Google Drive, extracts articles, and saves them to CSV.
@@ -979,10 +1144,12 @@ if __name__ == "__main__":
         )
         try:
             st.write("Downloading HTML from Google Drive …")
-            html_content = fetch_html_from_gdrive(gdrive_url)
+            with prof.stage("download"):
+                html_content = fetch_html_from_gdrive(gdrive_url)
 
-            soup = BeautifulSoup(html_content, 'html.parser')
-            articles = extract_articles_from_soup(soup)
+            with prof.stage("parse"):
+                soup = BeautifulSoup(html_content, 'html.parser')
+                articles = extract_articles_from_soup(soup)
 
             if not articles:
                 st.write("❌ No articles found — did the HTML structure change?")
@@ -1003,15 +1170,10 @@ if __name__ == "__main__":
             #save_to_csv(articles)
             df = pd.DataFrame(articles)          # turn list-of-dicts into a DataFrame
             st.subheader("Scraped Articles")     
-            st.dataframe(df, use_container_width=True)
+            version = config_hash(html=html_content)
+            paged_table(df, version, "articles", prof=prof)
 
-            csv_bytes = df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                label="⬇️ Download CSV",
-                data=csv_bytes,
-                file_name="articles.csv",
-                mime="text/csv",
-            )
+            lazy_download(df, "articles", version, key="articles_format", prof=prof)
 
         except Exception as exc:
             st.write(f"Download / parse error: {exc}")
@@ -1404,30 +1566,128 @@ Article Summary:
     FILE_ID   = "10fOujQHjw1SxhfK7vQHL44JJKE_-3-8D"   # <- from the link you pasted
     GDRIVE_TXT = f"https://drive.google.com/uc?export=download&id={FILE_ID}"
 
-    @st.cache_data(show_spinner="Fetching CSV")
-    def load_csv(url: str) -> pd.DataFrame:
-        resp = requests.get(url)
-        resp.raise_for_status()               # fail fast on bad link
-        return pd.read_csv(io.BytesIO(resp.content))
+    @st.cache_data(show_spinner=False, max_entries=4)
+    def parse_csv(url: str, digest: str, _body: io.BufferedReader) -> pd.DataFrame:
+        # keyed by URL + the body's SHA-256: the cached file is only read when this version is new
+        return pd.read_csv(_body)
+
+    def load_csv(url: str) -> tuple[pd.DataFrame, str]:
+        # through the shared HTTP cache (http_fetch.py); raises on a bad link
+        with st.spinner("Fetching CSV"):
+            entry, f = default_cache().open(url)
+            with f:
+                return parse_csv(url, entry.digest, f), entry.digest
 
-    df = load_csv(GDRIVE_TXT)
+    df, digest = load_csv(GDRIVE_TXT)
+    version = config_hash(url=GDRIVE_TXT, body=digest)
 
     # ------------------------------------------------------------
     # 2.  Display the data
     # ------------------------------------------------------------
     st.subheader("Scraped Articles")
-    st.dataframe(df, use_container_width=True)
+    paged_table(df, version, "journal_articles")
 
     # ------------------------------------------------------------
     # 3.  Let users download exactly this CSV
     # ------------------------------------------------------------
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
+    lazy_download(df, "journal_articles", version, key="journal_articles_format")
+
+
+# Download formats: label → (export kind, file suffix, MIME type)
+DOWNLOAD_FORMATS = {
+    "CSV":        ("csv",     ".csv",    "text/csv"),
+    "CSV (gzip)": ("gzip",    ".csv.gz", "application/gzip"),
+    "CSV (zip)":  ("zip",     ".zip",    "application/zip"),
+    "Parquet":    ("parquet", *COLUMNAR_FORMATS["parquet"]),
+    "Arrow IPC":  ("arrow",   *COLUMNAR_FORMATS["arrow"]),
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def export_bytes(version: str, kind: str, stem: str, _df: pd.DataFrame) -> bytes:
+    """*_df* serialized as *kind*; *version* must identify its contents, since _df is not hashed."""
+    if kind in COLUMNAR_FORMATS:
+        return columnar_bytes(_df, kind)
+    if kind == "zip":
+        return csv_zip_bytes([_df], f"{stem}.csv", list(_df.columns))
+    return csv_bytes([_df], list(_df.columns), compression=None if kind == "csv" else kind)
+
+
+def lazy_download(df: pd.DataFrame, stem: str, version: str,
+                  formats: tuple[str, ...] = ("CSV", "CSV (gzip)", "CSV (zip)"), key: str | None = None,
+                  prof: Profiler | NullProfiler = NULL_PROFILER) -> None:
+    """
+    Format picker and download button for *df*. The bytes are built only when
+    the button is clicked (Streamlit calls *data* then, off the script thread)
+    and cached per dataset *version* and format, so reruns never serialize df.
+    """
+    fmt = st.radio("Download format", formats, horizontal=True, key=key)
+    kind, suffix, mime = DOWNLOAD_FORMATS[fmt]
+
+    def build() -> bytes:
+        with prof.stage("export"):
+            return export_bytes(version, kind, stem, df)
+
+    st.download_button(label=f"⬇️ Download {fmt}", data=build, file_name=f"{stem}{suffix}", mime=mime)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def table_pager(version: str, _df: pd.DataFrame) -> TablePager:
+    """One pager per dataset *version*, so its sorts and filters are shared by every rerun and session."""
+    return TablePager(_df)
+
+
+def paged_table(df: pd.DataFrame, version: str, key: str,
+                prof: Profiler | NullProfiler = NULL_PROFILER) -> None:
+    """
+    *df* a page at a time. Sorting, filtering and paging run on the server
+    (see TablePager), so only the visible rows are sent to the browser.
+    """
+    pager = table_pager(version, df)
+    columns = list(df.columns)
+    sort_box, order_box, column_box, text_box = st.columns([3, 2, 3, 3])
+    sort = sort_box.selectbox("Sort by", [None, *columns], key=f"{key}_sort",
+                              format_func=lambda c: "(row order)" if c is None else str(c))
+    ascending = order_box.radio("Order", ("Ascending", "Descending"), key=f"{key}_order") == "Ascending"
+    column = column_box.selectbox("Filter column", columns, key=f"{key}_filter_column")
+    text = text_box.text_input("contains", key=f"{key}_filter_text")
+
+    size_box, page_box, info_box = st.columns([2, 2, 7])
+    sizes = sorted({25, PAGE_ROWS, 100, 500})
+    size = size_box.selectbox("Rows per page", sizes, index=sizes.index(PAGE_ROWS), key=f"{key}_page_rows")
+    with prof.stage("render"):
+        total = len(pager.view(sort, ascending, {column: text}))
+        pages = max(1, -(-total // size))
+        number = min(page_box.number_input(f"Page (of {pages:,})", min_value=1, step=1, key=f"{key}_page"), pages)
+        rows, _ = pager.page(number, size, sort, ascending, {column: text})
+    first = (number - 1) * size
+    shown = f"Rows {first + 1:,}–{first + len(rows):,} of {total:,}" if total else "No matching rows"
+    if total != pager.rows:
+        shown += f" (filtered from {pager.rows:,})"
+    info_box.caption(shown)
+    st.dataframe(rows, width="stretch")
+
+
+def show_profiler(prof: Profiler) -> None:
+    """Profiler panel: per-stage time / memory of the last rerun plus its cProfile dump."""
+    st.write("---")
+    st.subheader("⏱️ Profiler")
+    st.caption("Wall time excludes nested stages; peak is tracemalloc-traced memory while the "
+               "stage ran. Pipeline stages are those of the background job (cached stages show "
+               "only the cache lookup); render is this rerun's remaining script time.")
+    st.dataframe(prof.table(), width="stretch")
     st.download_button(
-        label="⬇️  Download CSV",
-        data=csv_bytes,
-        file_name="journal_articles.csv",
-        mime="text/csv",
+        label="⬇️ Download cProfile stats (.pstats)",
+        data=prof.pstats_bytes(),
+        file_name="rerun.pstats",
+        mime="application/octet-stream",
     )
+    with st.expander("Top functions by cumulative time"):
+        st.code(prof.top_functions(25), language="text")
+    if st.button("Clear caches and profile a fresh run"):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        st.rerun()
 
 
 def main():
@@ -1436,10 +1696,26 @@ def main():
     st.sidebar.markdown("**Author:** Siva Mani Subrahmanya Hari Vamsi Pullipudi")
     st.sidebar.markdown("**GMU ID:** G01505434")
     st.sidebar.markdown("**Date:** 15th July 2025")
-    if selection == "Assignment 1":
-        show_assignment_1()
+    # Opt-in profiler: sidebar toggle, or open the app with ?profile=1
+    profiling = st.sidebar.toggle("⏱️ Profiler", value=st.query_params.get("profile") == "1")
+    session = st.session_state.setdefault("profiler_session", SessionToken())
+    if profiling:
+        Profiler.start_tracing(session)
+        prof = Profiler()
     else:
-        show_assignment_2()
+        Profiler.stop_tracing(session)      # tracing goes on while another session profiles
+        prof = NULL_PROFILER
+
+    def page():
+        with prof.stage("render"):
+            if selection == "Assignment 1":
+                show_assignment_1(prof)
+            else:
+                show_assignment_2(prof)
+
+    prof.run(page)
+    if profiling:
+        show_profiler(prof)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+# notice_generator.py - seeded synthetic Lumen-style notices for the benchmarks
+#
+# Produces the same JSON shape the Assignment 1 pipeline reads from Google
+# Drive ({"notices": [{id, title, sender_name, principal_name, recipient_name,
+# date_sent, works: [{description, infringing_urls: [{url}]}]}]}), with a
+# Zipf-skewed choice of domains and principals like real takedown data: a few
+# rights holders and sites account for most URLs, with a long tail behind them.
+# The same seed and size always give byte-identical output.
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+# -------- CONFIG -------------------------------------------------------------
+URLS_PER_DOMAIN    = 20                 # domain pool = n_urls / this (at least 100)
+URLS_PER_PRINCIPAL = 2_000              # principal pool = n_urls / this (at least 20)
+DOMAIN_SKEW        = 1.1                # Zipf exponents - larger → more concentrated
+PRINCIPAL_SKEW     = 1.3
+MEAN_URLS          = 4.0                # infringing URLs per notice (1 + Poisson)
+NULL_PRINCIPALS    = 0.02               # share of notices without principal_name
+CHUNK_NOTICES      = 10_000             # notices drawn per numpy call
+# -----------------------------------------------------------------------------
+
+TLDS      = ["com", "net", "org", "co.uk", "ru", "to", "io", "com.br", "info", "xyz"]
+TLD_P     = [0.40, 0.12, 0.08, 0.08, 0.08, 0.06, 0.05, 0.05, 0.04, 0.04]
+PREFIXES  = ["", "www.", "www2.", "cdn.", "m.", "files."]
+PREFIX_P  = [0.45, 0.30, 0.05, 0.10, 0.05, 0.05]
+RECIPIENTS = ["Google LLC", "Cloudflare", "Twitter", "Reddit", "GitHub", "Dropbox", "Automattic"]
+HOLDERS   = ["Universal Music", "Warner Bros Entertainment", "Sony Music", "Paramount Pictures",
+             "Elsevier", "Microsoft", "Nintendo", "Disney Enterprises", "NBCUniversal", "BMG Rights"]
+SPELLINGS = ["{}", "{}, Inc", "{} Inc.", "{} inc", "{}.", "  {}  "]   # messy variants cleaning folds together
+
+
+def zipf_weights(n: int, s: float) -> np.ndarray:
+    '''Probabilities proportional to 1 / rank**s for ranks 1..n.'''
+    w = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+    return w / w.sum()
+
+
+def domain_pool(n: int, rng: np.random.Generator) -> list[str]:
+    '''*n* distinct host names, with www. / cdn. prefixes and multi-label TLDs to exercise cleaning.'''
+    tlds = rng.choice(TLDS, size=n, p=TLD_P)
+    prefixes = rng.choice(PREFIXES, size=n, p=PREFIX_P)
+    return [f"{p}site{i}.{t}" for i, (p, t) in enumerate(zip(prefixes, tlds))]
+
+
+def principal_pool(n: int, rng: np.random.Generator) -> list[str]:
+    '''*n* principal names - the well-known holders first, then numbered ones, in messy spellings.'''
+    names = [HOLDERS[i] if i < len(HOLDERS) else f"Rights Holder {i}" for i in range(n)]
+    spellings = rng.integers(0, len(SPELLINGS), size=n)
+    cases = rng.integers(0, 3, size=n)
+    out = []
+    for name, sp, case in zip(names, spellings, cases):
+        name = SPELLINGS[sp].format(name)
+        out.append(name.lower() if case == 1 else name.upper() if case == 2 else name)
+    return out
+
+
+def generate_notices(n_urls: int, seed: int = 0) -> Iterator[dict]:
+    '''
+    Yield notices until *n_urls* infringing URLs have been produced.
+    Domains and principals are drawn with Zipf skew from pools that grow with
+    *n_urls*, so unique-domain counts (the DNS workload) scale realistically.
+    '''
+    rng = np.random.default_rng(seed)
+    domains = domain_pool(max(100, n_urls // URLS_PER_DOMAIN), rng)
+    principals = principal_pool(max(20, n_urls // URLS_PER_PRINCIPAL), rng)
+    domain_p = zipf_weights(len(domains), DOMAIN_SKEW)
+    principal_p = zipf_weights(len(principals), PRINCIPAL_SKEW)
+    start = np.datetime64("2020-01-01T00:00:00", "s")
+
+    notice_id, produced = 1, 0
+    while produced < n_urls:
+        k = CHUNK_NOTICES
+        n_per = np.minimum(1 + rng.poisson(MEAN_URLS - 1, size=k), 50)
+        who = rng.choice(len(principals), size=k, p=principal_p)
+        unnamed = rng.random(k) < NULL_PRINCIPALS
+        to = rng.integers(0, len(RECIPIENTS), size=k)
+        sent = start + rng.integers(0, 5 * 365 * 86400, size=k).astype("timedelta64[s]")
+        hosts = rng.choice(len(domains), size=int(n_per.sum()), p=domain_p)
+        pos = 0
+        for i in range(k):
+            n = int(min(n_per[i], n_urls - produced))
+            urls = [{"url": f"https://{domains[h]}/file/{notice_id}/{j}"}
+                    for j, h in enumerate(hosts[pos:pos + n])]
+            pos += int(n_per[i])
+            half = (n + 1) // 2                  # split the URLs over two works
+            yield {
+                "id": notice_id,
+                "title": f"DMCA (Copyright) Complaint {notice_id}",
+                "sender_name": f"Agent {int(who[i]) % 97}",
+                "principal_name": None if unnamed[i] else principals[who[i]],
+                "recipient_name": RECIPIENTS[to[i]],
+                "date_sent": f"{sent[i]}.000Z",
+                "works": [
+                    {"description": f"Work {notice_id}-a", "infringing_urls": urls[:half]},
+                    {"description": f"Work {notice_id}-b", "infringing_urls": urls[half:]},
+                ],
+            }
+            notice_id += 1
+            produced += n
+            if produced >= n_urls:
+                return
+
+
+def write_notices_json(path: str | Path, n_urls: int, seed: int = 0) -> Path:
+    '''Stream generate_notices() into *path* as {"notices": [...]} without holding them in memory.'''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write('{"notices": [')
+        for i, notice in enumerate(generate_notices(n_urls, seed)):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(notice))
+        f.write("\n]}\n")
+    tmp.replace(path)
+    return path
@@ -0,0 +1,348 @@
+# run_benchmarks.py - per-stage throughput / peak memory of the Assignment 1 pipeline
+#
+# Runs the building blocks App.py wires together (streamed JSON load, cached
+# HTTP fetch, multi-source ingestion, flatten, cleaning - serial and on
+# process pools -, DNS enrichment, summaries, CSV / Parquet export) over
+# seeded synthetic notices, with DNS and HTTP answered by local stubs - no
+# network needed.
+# Results are written as JSON, one record per size and stage, tagged with the
+# git commit, so two runs can be compared with --compare.
+#
+#   python benchmarks/run_benchmarks.py --sizes 10k 1m --out before.json
+#   python benchmarks/run_benchmarks.py --sizes 10k 1m --out after.json --compare before.json
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))     # the pipeline modules live in the repo root
+
+import pandas as pd
+
+from bitmap_index import BitmapIndex
+from dns_resolver import NOT_FOUND, RetryPolicy, UdpResolver, resolve_domains
+from http_fetch import HttpCache
+from notice_generator import write_notices_json
+from notice_pipeline import (EXPORT_COLUMNS, POOLED_COLUMNS, SHARD_NOTICES, IngestStats, flatten_clean_parallel,
+                             flatten_frame, iter_notices, iter_sources, root_domains, tidy_principals,
+                             write_columnar, write_csv_stream)
+from sql_store import SqlStore
+from stub_dns import StubDnsServer
+from stub_http import StubHttpServer
+from summaries import SummaryState
+from table_view import PAGE_ROWS, TablePager
+
+# -------- CONFIG -------------------------------------------------------------
+SIZES      = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}   # URLs per dataset
+DATA_DIR   = HERE / "data"              # generated inputs, reused across runs
+SEED       = 0
+DNS_LATENCY_S    = 0.005
+DNS_FAILURE_RATE = 0.05
+DNS_DROP_RATE    = 0.0
+DNS_TIMEOUT_S    = 1
+CROSSFILTER_QUERIES = 20                # cross-filter interactions timed per size
+CROSSFILTER_CHARTS  = ("principal_clean", "recipient", "root_domain")
+TABLE_PAGES         = 200               # table-viewer pages fetched per size, spread over the view
+SOURCES             = 4                 # URLs the input is served from for the multi-source stages
+SOURCE_LATENCY_S    = 0.25              # per-request delay of those URLs (a slow remote host)
+PROCESSES           = (1, 2, 4)         # N_PROCESSES settings swept by the flatten_clean_p<n> stages
+# -----------------------------------------------------------------------------
+
+
+def _rss_mb() -> tuple[float | None, float | None]:
+    '''Current and high-water resident set size (Linux /proc), in MB.'''
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:
+        return None, None
+    fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+    kb = lambda k: int(fields[k].split()[0]) if k in fields else None
+    rss, hwm = kb("VmRSS"), kb("VmHWM")
+    return (rss / 1024 if rss else None), (hwm / 1024 if hwm else None)
+
+
+def _reset_peak() -> bool:
+    '''Reset the kernel's RSS high-water mark to the current RSS (Linux only).'''
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+class Recorder:
+    '''
+    Collects one record per (size, stage): wall seconds, items processed,
+    items per second and memory. Memory is the RSS high-water mark during the
+    stage, reset before it starts on Linux ("rss_hwm"); elsewhere only the
+    process-wide maximum is available ("ru_maxrss"), which never goes down.
+    '''
+
+    def __init__(self):
+        self.records: list[dict] = []
+
+    @contextmanager
+    def stage(self, size: str, stage: str, unit: str):
+        rec = {"size": size, "stage": stage, "unit": unit, "items": 0}
+        gc.collect()
+        exact = _reset_peak()
+        start_rss, _ = _rss_mb()
+        t0 = time.perf_counter()
+        yield rec
+        rec["seconds"] = round(time.perf_counter() - t0, 4)
+        rec["per_second"] = round(rec["items"] / rec["seconds"], 1) if rec["seconds"] else None
+        _, hwm = _rss_mb()
+        if exact and hwm is not None:
+            rec["peak_rss_mb"] = round(hwm, 1)
+            rec["peak_over_start_mb"] = round(hwm - start_rss, 1)
+            rec["memory_method"] = "rss_hwm"
+        else:
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rec["peak_rss_mb"] = round(maxrss / (1 << 20 if sys.platform == "darwin" else 1024), 1)
+            rec["memory_method"] = "ru_maxrss"
+        self.records.append(rec)
+        print(f"  {stage:<16} {rec['items']:>12,} {unit:<8} {rec['seconds']:>9.3f}s "
+              f"{rec['per_second'] or 0:>14,.0f}/s  peak {rec['peak_rss_mb']:,.0f} MB", flush=True)
+
+
+def frame_memory(df: pd.DataFrame) -> tuple[float, float]:
+    '''
+    Deep memory of the flattened frame in MB, and what it would take with the
+    POOLED_COLUMNS (categoricals) held as one string per row.
+    '''
+    pooled = df.memory_usage(index=False, deep=True)
+    plain = pooled.copy()
+    for col in POOLED_COLUMNS:
+        plain[col] = df[col].astype(object).astype(pd.Series([""]).dtype).memory_usage(index=False, deep=True)
+    return round(pooled.sum() / 2**20, 1), round(plain.sum() / 2**20, 1)
+
+
+def dataset(size: str, seed: int) -> Path:
+    '''The generated input for *size*, created on first use.'''
+    path = DATA_DIR / f"notices-{size}-seed{seed}.json"
+    if not path.exists():
+        t0 = time.perf_counter()
+        write_notices_json(path, SIZES[size], seed)
+        print(f"  generated {path.name} ({path.stat().st_size / 1e6:,.0f} MB) "
+              f"in {time.perf_counter() - t0:.1f}s", flush=True)
+    return path
+
+
+def bench_size(rec: Recorder, size: str, args: argparse.Namespace, dns: StubDnsServer) -> None:
+    src = dataset(size, args.seed)
+    print(f"{size}: {src}", flush=True)
+
+    with rec.stage(size, "load", "notices") as r:                 # streamed JSON parse only
+        r["items"] = sum(1 for _ in iter_notices(src))
+        r["bytes"] = src.stat().st_size
+
+    # the input over local HTTP through the fetch layer: a download, then a
+    # restart's revalidation (304) and a fresh cache hit - both without the body
+    with tempfile.TemporaryDirectory() as tmp, StubHttpServer({"/notices.json": src}, confirm="form") as web:
+        cache = HttpCache(tmp)
+        for stage in ("fetch", "fetch_revalidate", "fetch_hit"):
+            if stage == "fetch_revalidate":
+                cache.expire(web.url("/notices.json"))
+            with rec.stage(size, stage, "bytes") as r:
+                r["items"] = sum(len(b) for b in cache.iter_bytes(web.url("/notices.json")))
+            r["bytes_sent"] = web.bytes_sent
+
+    # the same input from SOURCES slow URLs, merged into one run: read
+    # concurrently, then one at a time (every copy after the first is dropped
+    # as duplicates, so items is the same for both)
+    paths = {f"/part{i}.json": src for i in range(SOURCES)}
+    with StubHttpServer(paths, latency_s=SOURCE_LATENCY_S) as web:
+        for stage, workers in (("sources", SOURCES), ("sources_serial", 1)):
+            with tempfile.TemporaryDirectory() as tmp, rec.stage(size, stage, "notices") as r:
+                stats = IngestStats()
+                urls = [web.url(p) for p in paths]
+                r["items"] = sum(1 for _ in iter_sources(urls, workers=workers, stats=stats, cache=HttpCache(tmp)))
+            r["duplicates"] = stats.duplicates
+            r["slowest_source_s"] = round(stats.slowest_s, 3)
+
+    with rec.stage(size, "flatten", "rows") as r:                 # includes the parse
+        df = flatten_frame(iter_notices(src))
+        r["items"] = len(df)
+    r["frame_mb"], r["frame_mb_unpooled"] = frame_memory(df)
+    print(f"  {'':<16} frame {r['frame_mb']:,.1f} MB, {r['frame_mb_unpooled']:,.1f} MB "
+          f"with the pooled columns as plain strings", flush=True)
+
+    with rec.stage(size, "clean", "rows") as r:
+        df["principal_clean"] = tidy_principals(df["principal"])
+        df["root_domain"] = root_domains(df["domain"], psl=True)
+        r["items"] = len(df)
+
+    # flatten + clean as App.py runs it with N_PROCESSES = n (parse included);
+    # every pool's frame must be identical to the single-process one
+    serial = None
+    for n in sorted({1, *args.processes}):
+        with rec.stage(size, f"flatten_clean_p{n}", "rows") as r:
+            out = flatten_clean_parallel(iter_notices(src), n, psl=True, shard_notices=args.shard_notices)
+            r["items"] = len(out)
+        r["processes"] = n
+        if serial is None:
+            serial = out
+        else:
+            pd.testing.assert_frame_equal(out, serial, obj=f"flatten_clean_parallel(processes={n})")
+            r["matches_serial"] = True
+    del serial, out
+
+    with rec.stage(size, "dns", "domains") as r:
+        domains = list(df["domain"].unique())
+        backend = UdpResolver([dns.address], use_hosts_file=False)
+        ips = resolve_domains(domains, backend=backend, timeout=args.dns_timeout,
+                              retry=RetryPolicy(attempts=2, budget_s=args.dns_timeout * 3))
+        df["ip_address"] = df["domain"].map(ips)
+        r["items"] = len(domains)
+        r["not_found"] = sum(ip == NOT_FOUND for ip in ips.values())
+        r["stub_queries"] = dns.queries
+
+    with rec.stage(size, "aggregate", "rows") as r:
+        SummaryState.from_frame(df)
+        r["items"] = len(df)
+
+    with rec.stage(size, "aggregate_sketch", "rows") as r:
+        SummaryState.from_frame(df, {"capacity": 1000, "precision": 8})
+        r["items"] = len(df)
+
+    with rec.stage(size, "index", "rows") as r:
+        index = BitmapIndex(df)
+        r["items"] = len(df)
+    r["index_mb"] = round(index.nbytes / 2**20, 1)
+
+    # one interaction = the top principal and recipient selected, every chart re-answered
+    filters = {"principal_clean": index.options("principal_clean", 1),
+               "recipient": index.options("recipient", 1)}
+    with rec.stage(size, "crossfilter", "queries") as r:
+        for _ in range(CROSSFILTER_QUERIES):
+            for col in CROSSFILTER_CHARTS:
+                index.top(col, 10, filters)
+            index.distinct("ip_address", "root_domain", 10, filters)
+            r["items"] += 1
+
+    with rec.stage(size, "crossfilter_scan", "queries") as r:    # the same answers by boolean masks
+        for _ in range(CROSSFILTER_QUERIES):
+            for col in (*CROSSFILTER_CHARTS, "ip_address"):
+                mask = pd.Series(True, index=df.index)
+                for other, values in filters.items():
+                    if other != col:
+                        mask &= df[other].isin(values)
+                if col == "ip_address":
+                    df.loc[mask].groupby("ip_address", observed=True)["root_domain"].nunique().nlargest(10)
+                else:
+                    df.loc[mask, col].value_counts().head(10)
+            r["items"] += 1
+
+    # table viewer: building a sorted, filtered view once, then paging through it
+    pager = TablePager(df[list(EXPORT_COLUMNS)])
+    view = {"sort": "domain", "ascending": False, "filters": {"principal": "a"}}
+    with rec.stage(size, "table_view", "rows") as r:
+        rows = len(pager.view(**view))
+        r["items"] = len(df)
+    with rec.stage(size, "table_page", "pages") as r:
+        pages = max(1, -(-rows // PAGE_ROWS))
+        for number in range(1, pages + 1, max(1, pages // TABLE_PAGES)):
+            pager.page(number, PAGE_ROWS, **view)
+            r["items"] += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with rec.stage(size, "write_csv", "rows") as r:
+            r["bytes"] = write_csv_stream([df[list(EXPORT_COLUMNS)]], Path(tmp) / "out.csv")
+            r["items"] = len(df)
+
+        with rec.stage(size, "write_parquet", "rows") as r:
+            out = Path(tmp) / "out.parquet"
+            write_columnar(df[list(EXPORT_COLUMNS)], out, "parquet")
+            r["bytes"] = out.stat().st_size
+            r["items"] = len(df)
+
+        with rec.stage(size, "sql_load", "rows") as r:
+            sql = SqlStore(Path(tmp) / "notices.sqlite3")
+            sql.load(df)
+            r["bytes"] = sql.path.stat().st_size
+            r["items"] = len(df)
+
+        with rec.stage(size, "sql_views", "page loads") as r:   # every summary the page shows
+            for _ in range(3):
+                span = sql.date_span()
+                sql.top_root_domains(10), sql.top_principals(10), sql.monthly_trend(), sql.ip_hosting(10)
+                sql.top_root_domains(10, *span), sql.trend("W", *span)
+                r["items"] += 1
+
+
+def _git_commit() -> str | None:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(new: list[dict], old_path: Path) -> None:
+    '''Print new / old throughput per size and stage (>1 means faster now).'''
+    old = {(r["size"], r["stage"]): r for r in json.loads(old_path.read_text())["results"]}
+    print(f"\nvs {old_path}:")
+    for r in new:
+        o = old.get((r["size"], r["stage"]))
+        if o and o.get("per_second") and r.get("per_second"):
+            print(f"  {r['size']:>4} {r['stage']:<16} throughput x{r['per_second'] / o['per_second']:.2f}  "
+                  f"peak {o['peak_rss_mb']:,.0f} → {r['peak_rss_mb']:,.0f} MB")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the Assignment 1 pipeline stages.")
+    ap.add_argument("--sizes", nargs="+", default=["10k", "1m"], choices=list(SIZES))
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("--dns-latency", type=float, default=DNS_LATENCY_S, help="seconds per stub answer")
+    ap.add_argument("--dns-failure", type=float, default=DNS_FAILURE_RATE, help="share of NXDOMAIN names")
+    ap.add_argument("--dns-drop", type=float, default=DNS_DROP_RATE, help="share of names never answered")
+    ap.add_argument("--dns-timeout", type=float, default=DNS_TIMEOUT_S)
+    ap.add_argument("--processes", nargs="+", type=int, default=list(PROCESSES),
+                    help="worker counts for the flatten_clean_p<n> stages (1 is always run, as the reference)")
+    ap.add_argument("--shard-notices", type=int, default=SHARD_NOTICES, help="notices per process-pool shard")
+    ap.add_argument("--out", type=Path, help="write the JSON results here (default: stdout)")
+    ap.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = ap.parse_args()
+
+    rec = Recorder()
+    with StubDnsServer(args.dns_latency, args.dns_failure, args.dns_drop) as dns:
+        for size in args.sizes:
+            bench_size(rec, size, args, dns)
+
+    report = {
+        "commit":   _git_commit(),
+        "created":  time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python":   platform.python_version(),
+        "pandas":   pd.__version__,
+        "platform": platform.platform(),
+        "seed":     args.seed,
+        "cpus":     os.cpu_count(),
+        "dns":      {"latency_s": args.dns_latency, "failure_rate": args.dns_failure,
+                     "drop_rate": args.dns_drop, "timeout_s": args.dns_timeout},
+        "results":  rec.records,
+    }
+    text = json.dumps(report, indent=1)
+    if args.out:
+        args.out.write_text(text)
+        print(f"results written to {args.out}")
+    else:
+        print(text)
+    if args.compare:
+        compare(rec.records, args.compare)
+
+
+if __name__ == "__main__":
+    main()
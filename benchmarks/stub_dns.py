@@ -0,0 +1,124 @@
+# stub_dns.py - local UDP DNS server for benchmarks, no network needed
+#
+# Answers A queries on 127.0.0.1 after a configurable delay. Which names fail
+# is decided by a hash of the name, not by chance per query, so every run (and
+# every retry) sees the same answers and results stay comparable.
+# Point dns_resolver.UdpResolver at StubDnsServer.address.
+
+import asyncio
+import struct
+import threading
+import zlib
+
+# -------- CONFIG -------------------------------------------------------------
+LATENCY_S    = 0.005                    # delay before each answer
+FAILURE_RATE = 0.05                     # share of names answered NXDOMAIN
+DROP_RATE    = 0.0                      # share of names never answered (client timeouts)
+TTL_S        = 300
+# -----------------------------------------------------------------------------
+
+
+def _fraction(name: str, salt: bytes) -> float:
+    '''Stable value in [0, 1) per name.'''
+    return zlib.crc32(salt + name.encode()) / 2**32
+
+
+def stub_ip(name: str) -> str:
+    '''The address the stub hands out for *name* (10.x.y.z, stable).'''
+    h = zlib.crc32(name.encode())
+    return f"10.{h >> 16 & 255}.{h >> 8 & 255}.{h & 255}"
+
+
+class _StubProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, server: "StubDnsServer"):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        s = self.server
+        s.queries += 1
+        off, labels = 12, []
+        while data[off]:
+            n = data[off]
+            labels.append(data[off + 1:off + 1 + n].decode("ascii", "replace"))
+            off += n + 1
+        name = ".".join(labels).lower()
+        question = data[12:off + 5]
+        if _fraction(name, b"drop") < s.drop_rate:
+            return
+        if s.decoy:                         # same id, another question - must be ignored
+            self.transport.sendto(data[:2] + struct.pack("!HHHHH", 0x8180, 1, 0, 0, 0)
+                                  + b"\x05decoy\x00" + question[-4:], addr)
+        if _fraction(name, b"fail") < s.failure_rate:
+            reply = data[:2] + struct.pack("!HHHHH", 0x8183, 1, 0, 0, 0) + question
+        else:
+            answer = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, TTL_S, 4)
+            answer += bytes(int(x) for x in stub_ip(name).split("."))
+            reply = data[:2] + struct.pack("!HHHHH", 0x8180, 1, 1, 0, 0) + question + answer
+        if s.latency_s > 0:
+            asyncio.get_running_loop().call_later(s.latency_s, self.transport.sendto, reply, addr)
+        else:
+            self.transport.sendto(reply, addr)
+
+
+class StubDnsServer:
+    '''
+    UDP DNS stub on its own thread and event loop. Use as a context manager:
+
+        with StubDnsServer(latency_s=0.01, failure_rate=0.1) as dns:
+            backend = UdpResolver([dns.address], use_hosts_file=False)
+
+    *failure_rate* of the names get NXDOMAIN, *drop_rate* get no reply at
+    all; every answer is delayed by *latency_s*. With *decoy* each answer is
+    preceded by one with the same id for another name (a spoofed or stale
+    reply). `queries` counts requests.
+    '''
+
+    def __init__(self, latency_s: float = LATENCY_S, failure_rate: float = FAILURE_RATE,
+                 drop_rate: float = DROP_RATE, port: int = 0, decoy: bool = False):
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.decoy = decoy
+        self.port = port
+        self.queries = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return ("127.0.0.1", self.port)
+
+    def start(self) -> "StubDnsServer":
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            transport, _ = self._loop.run_until_complete(self._loop.create_datagram_endpoint(
+                lambda: _StubProtocol(self), local_addr=("127.0.0.1", self.port)))
+            self.port = transport.get_extra_info("sockname")[1]
+            ready.set()
+            self._loop.run_forever()
+            transport.close()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="stub-dns", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self) -> "StubDnsServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,167 @@
+# stub_http.py - local HTTP file server for benchmarks and tests, no network needed
+#
+# Serves files from disk on 127.0.0.1 the way the fetch layer (http_fetch.py)
+# expects of Google Drive: ETag / Last-Modified on every body, 304 for a
+# matching If-None-Match / If-Modified-Since, keep-alive connections, and
+# optionally Drive's confirm step in front of each download (the older
+# download_warning cookie or the newer HTML form).
+
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# -------- CONFIG -------------------------------------------------------------
+LATENCY_S     = 0.0                     # delay before each response
+CHUNK_SIZE    = 1 << 16
+CONFIRM_TOKEN = "t0ken"
+# -----------------------------------------------------------------------------
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"           # keep-alive
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        try:
+            super().handle()
+        except ConnectionError:             # client gave up mid-body (e.g. an abandoned download)
+            pass
+
+    def do_HEAD(self) -> None:
+        self.do_GET(body=False)
+
+    def do_GET(self, body: bool = True) -> None:
+        s: StubHttpServer = self.server.stub
+        url = urlparse(self.path)
+        path = s.files.get(url.path)
+        with s._lock:
+            s.requests += 1
+        if s.latency_s > 0:
+            time.sleep(s.latency_s)
+        if path is None:
+            self._reply(404, b"not found", "text/plain")
+            return
+        etag, modified = s.validators(url.path)
+        if self._not_modified(etag, modified):
+            with s._lock:
+                s.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if body and s.confirm and parse_qs(url.query).get("confirm") != [CONFIRM_TOKEN]:
+            self._confirm_page(url.path)
+            return
+        size = path.stat().st_size
+        self.send_response(200)
+        self.send_header("Content-Type", s.content_type)
+        self.send_header("Content-Length", str(size))
+        self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", modified)
+        self.end_headers()
+        if not body:
+            return
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                self.wfile.write(block)
+        with s._lock:
+            s.bytes_sent += size
+
+    def _not_modified(self, etag: str, modified: str) -> bool:
+        if "If-None-Match" in self.headers:
+            return self.headers["If-None-Match"] == etag
+        since = self.headers.get("If-Modified-Since")
+        try:
+            return since is not None and parsedate_to_datetime(since) >= parsedate_to_datetime(modified)
+        except (TypeError, ValueError):
+            return False
+
+    def _confirm_page(self, path: str) -> None:
+        '''Drive's "can't scan this file for viruses" step: a cookie, or a form to resubmit.'''
+        s: StubHttpServer = self.server.stub
+        with s._lock:
+            s.confirm_pages += 1
+        if s.confirm == "cookie":
+            body = b"<html><body>Google Drive can't scan this file for viruses.</body></html>"
+            self._reply(200, body, "text/html; charset=utf-8",
+                        {"Set-Cookie": f"download_warning_stub={CONFIRM_TOKEN}; Path=/"})
+        else:
+            body = (f'<html><body><form id="download-form" action="http://127.0.0.1:{s.port}{path}"'
+                    f' method="get"><input type="hidden" name="confirm" value="{CONFIRM_TOKEN}">'
+                    f'<input type="hidden" name="uuid" value="stub"></form></body></html>').encode()
+            self._reply(200, body, "text/html; charset=utf-8")
+
+    def _reply(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubHttpServer:
+    '''
+    HTTP stub on its own thread serving *files* ({"/url/path": Path}). Use as
+    a context manager:
+
+        with StubHttpServer({"/notices.json": path}, confirm="form") as web:
+            HttpCache(tmp).read_bytes(web.url("/notices.json"))
+
+    The ETag is a hash of a file's path, size and mtime, so touching a file
+    makes it "change". *confirm* ("cookie" / "form") puts Drive's confirm step
+    in front of every download. `requests`, `not_modified`, `confirm_pages`
+    and `bytes_sent` count what was served.
+    '''
+
+    def __init__(self, files: dict[str, Path], latency_s: float = LATENCY_S, confirm: str | None = None,
+                 content_type: str = "application/octet-stream", port: int = 0):
+        self.files = {p: Path(f) for p, f in files.items()}
+        self.latency_s = latency_s
+        self.confirm = confirm
+        self.content_type = content_type
+        self.port = port
+        self.requests = self.not_modified = self.confirm_pages = self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def validators(self, path: str) -> tuple[str, str]:
+        '''ETag and Last-Modified of the file served at *path*.'''
+        info = self.files[path].stat()
+        etag = hashlib.sha1(f"{path}|{info.st_size}|{info.st_mtime_ns}".encode()).hexdigest()
+        return f'"{etag}"', formatdate(info.st_mtime, usegmt=True)
+
+    def start(self) -> "StubHttpServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "StubHttpServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
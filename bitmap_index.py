@@ -0,0 +1,287 @@
+# bitmap_index.py - compressed bitmap indexes for cross-filtering the Assignment 1 page
+#
+# Bitmap      - a set of row numbers in the layout of Roaring bitmaps (Chambi,
+#               Lemire et al., "Better bitmap performance with Roaring bitmaps",
+#               2016): rows are split by their high 16 bits into containers of
+#               up to 65 536 rows, each a sorted uint16 array while sparse (at
+#               most ARRAY_MAX rows, 2 bytes a row) and a 1024-word bitset (8 KB)
+#               once dense. AND / OR work container by container.
+# BitmapIndex - one Bitmap per distinct value of each INDEX_COLUMNS column,
+#               built once per dataset. A cross-filter is the intersection of
+#               the selected values' bitmaps (a union within one column), and a
+#               chart under it counts its own column over just those rows.
+
+from datetime import date
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from summaries import period_counts, utc_days
+
+# -------- CONFIG -------------------------------------------------------------
+INDEX_COLUMNS  = ("principal_clean", "recipient", "root_domain", "ip_address", "month")
+ARRAY_MAX      = 4096                   # rows above which a container switches to a bitset
+# -----------------------------------------------------------------------------
+
+CONTAINER_ROWS = 1 << 16
+_NO_DAY = np.iinfo(np.int32).min        # day number of rows without a parseable date_sent
+_popcount = getattr(np, "bitwise_count", None)      # numpy >= 2.0
+
+Filters = Mapping[str, Iterable]        # {column: values} - any value of a column, every column
+
+
+def _is_array(container: np.ndarray) -> bool:
+    return container.dtype.itemsize == 2
+
+
+def _cardinality(container: np.ndarray) -> int:
+    if _is_array(container):
+        return len(container)
+    if _popcount is not None:
+        return int(_popcount(container).sum())
+    return int(np.unpackbits(container.view(np.uint8)).sum())
+
+
+def _to_bitset(low: np.ndarray) -> np.ndarray:
+    bits = np.zeros(CONTAINER_ROWS, dtype=bool)
+    bits[low] = True
+    return np.packbits(bits, bitorder="little").view("<u8")
+
+
+def _to_array(words: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+
+def _contains(words: np.ndarray, low: np.ndarray) -> np.ndarray:
+    '''Which of the uint16 positions *low* are set in the bitset *words*.'''
+    return (words[low >> 6] >> (low & 63).astype(np.uint64) & 1).astype(bool)
+
+
+def _shrink(words: np.ndarray) -> np.ndarray | None:
+    '''A bitset back as an array container once sparse; None once empty.'''
+    n = _cardinality(words)
+    if n == 0:
+        return None
+    return _to_array(words) if n <= ARRAY_MAX else words
+
+
+def _and(a: np.ndarray, b: np.ndarray) -> np.ndarray | None:
+    if _is_array(a) and _is_array(b):
+        c = np.intersect1d(a, b, assume_unique=True)
+    elif _is_array(a):
+        c = a[_contains(b, a)]
+    elif _is_array(b):
+        c = b[_contains(a, b)]
+    else:
+        return _shrink(a & b)
+    return c if len(c) else None
+
+
+def _or(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if _is_array(a) and _is_array(b):
+        c = np.union1d(a, b)
+        return c if len(c) <= ARRAY_MAX else _to_bitset(c)
+    return (a if not _is_array(a) else _to_bitset(a)) | (b if not _is_array(b) else _to_bitset(b))
+
+
+class Bitmap:
+    '''Compressed set of row numbers (< 2**32), keyed by container: {high 16 bits: container}.'''
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: dict[int, np.ndarray] | None = None):
+        self.containers = containers if containers is not None else {}
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "Bitmap":
+        '''Build from sorted, distinct, non-negative row numbers.'''
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return cls()
+        high = rows >> 16
+        cuts = np.flatnonzero(high[1:] != high[:-1]) + 1
+        containers = {}
+        for part in np.split(rows, cuts):
+            low = (part & 0xFFFF).astype(np.uint16)
+            containers[int(part[0] >> 16)] = low if len(low) <= ARRAY_MAX else _to_bitset(low)
+        return cls(containers)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(c) for c in self.containers.values())
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        small, large = sorted((self, other), key=lambda b: len(b.containers))
+        out = {}
+        for key, a in small.containers.items():
+            b = large.containers.get(key)
+            if b is not None and (c := _and(a, b)) is not None:
+                out[key] = c
+        return Bitmap(out)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        out = dict(self.containers)
+        for key, b in other.containers.items():
+            a = out.get(key)
+            out[key] = b if a is None else _or(a, b)
+        return Bitmap(out)
+
+    def rows(self) -> np.ndarray:
+        '''The row numbers, ascending.'''
+        parts = [(key << 16) + (c if _is_array(c) else _to_array(c)).astype(np.int64)
+                 for key, c in sorted(self.containers.items())]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.containers.values())
+
+
+class BitmapIndex:
+    '''
+    Bitmaps per distinct value of *columns* over one flattened, enriched frame,
+    plus each row's value code per column (to count a chart's column over the
+    selected rows) and UTC day (for the date-range slider). "month" is derived
+    from date_sent ("YYYY-MM"); columns the frame lacks are skipped.
+
+      index.select({"principal_clean": ["Sony Music"], "month": ["2024-03"]})
+
+    Cross-filters leave a chart's own column out, so a chart keeps showing the
+    alternatives to its selected values; see top().
+    '''
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = INDEX_COLUMNS):
+        self.rows = len(df)
+        self.codes: dict[str, np.ndarray] = {}
+        self.values: dict[str, pd.Index] = {}
+        self.totals: dict[str, np.ndarray] = {}
+        self.bitmaps: dict[str, dict[Any, Bitmap]] = {}
+        days = utc_days(df["date_sent"])
+        day_numbers = days.to_numpy(dtype="datetime64[D]").view(np.int64)
+        self.days = np.where(days.isna().to_numpy(), _NO_DAY, day_numbers).astype(np.int32)
+        for col in columns:
+            if col == "month":
+                codes, values = pd.factorize(days.dt.to_period("M"))
+                values = values.astype(str)
+            elif col in df:
+                codes, values = pd.factorize(df[col])
+            else:
+                continue
+            self._add(col, codes.astype(np.int32), pd.Index(values, name=col))
+
+    def _add(self, col: str, codes: np.ndarray, values: pd.Index) -> None:
+        '''One bitmap per value: a stable sort by code leaves each value's rows ascending.'''
+        order = np.argsort(codes, kind="stable")
+        totals = np.bincount(codes[codes >= 0], minlength=len(values))
+        bounds = np.concatenate(([0], np.cumsum(totals))) + np.count_nonzero(codes < 0)
+        self.codes[col], self.values[col], self.totals[col] = codes, values, totals
+        self.bitmaps[col] = {v: Bitmap.from_rows(order[bounds[i]:bounds[i + 1]])
+                             for i, v in enumerate(values)}
+
+    @property
+    def nbytes(self) -> int:
+        '''Memory of the bitmaps alone.'''
+        return sum(b.nbytes for bitmaps in self.bitmaps.values() for b in bitmaps.values())
+
+    def options(self, column: str, n: int | None = None) -> list:
+        '''Values to offer in a filter: months in order, otherwise the *n* most frequent.'''
+        values = self.values[column]
+        if column == "month":
+            return sorted(values)
+        return list(values[_largest(self.totals[column], len(values) if n is None else n)])
+
+    # ---- queries ----------------------------------------------------------
+
+    def select(self, filters: Filters) -> Bitmap | None:
+        '''Rows holding any selected value of every filtered column; None when nothing is filtered.'''
+        unions = []
+        for col, wanted in filters.items():
+            if wanted:
+                unions.append(_union([self.bitmaps[col][v] for v in wanted if v in self.bitmaps[col]]))
+        if not unions:
+            return None
+        unions.sort(key=len)                        # intersect smallest first
+        result = unions[0]
+        for b in unions[1:]:
+            if not result.containers:
+                break
+            result = result & b
+        return result
+
+    def row_ids(self, filters: Filters, start: date | None = None, end: date | None = None) -> np.ndarray | None:
+        '''Row numbers matching *filters* and the days *start* to *end*; None for all rows.'''
+        selected = self.select(filters)
+        if selected is None and start is None and end is None:
+            return None
+        rows = np.arange(self.rows) if selected is None else selected.rows()
+        if start is not None or end is not None:
+            d = self.days[rows]
+            keep = d != _NO_DAY
+            if start is not None:
+                keep &= d >= np.datetime64(start, "D").astype(np.int64)
+            if end is not None:
+                keep &= d <= np.datetime64(end, "D").astype(np.int64)
+            rows = rows[keep]
+        return rows
+
+    def count(self, filters: Filters, start: date | None = None, end: date | None = None) -> int:
+        rows = self.row_ids(filters, start, end)
+        return self.rows if rows is None else len(rows)
+
+    def top(self, column: str, n: int, filters: Filters,
+            start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Rows per value of *column* under every filter but its own, largest *n* first.'''
+        counts = self._counts(column, _others(filters, column), start, end)
+        top = _largest(counts, n)
+        return pd.Series(counts[top], index=self.values[column][top], name="count", dtype="int64")
+
+    def distinct(self, key: str, value: str, n: int, filters: Filters,
+                 start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Distinct *value*s per *key* (e.g. root domains per IP) under every filter but *key*'s, largest *n* first.'''
+        rows = self.row_ids(_others(filters, key), start, end)
+        k, v = self.codes[key], self.codes[value]
+        if rows is not None:
+            k, v = k[rows], v[rows]
+        both = (k >= 0) & (v >= 0)
+        width = len(self.values[value])
+        pairs = np.unique(k[both].astype(np.int64) * width + v[both])
+        counts = np.bincount(pairs // width, minlength=len(self.values[key]))
+        top = _largest(counts, n)
+        return pd.Series(counts[top], index=self.values[key][top], name=value, dtype="int64")
+
+    def trend(self, freq: str, filters: Filters, start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Rows per period ("W", "M", ...) under every filter but the month one, like SummaryState.trend().'''
+        rows = self.row_ids(_others(filters, "month"), start, end)
+        d = self.days if rows is None else self.days[rows]
+        days, counts = np.unique(d[d != _NO_DAY], return_counts=True)
+        daily = pd.Series(counts, index=pd.DatetimeIndex(days.astype("datetime64[D]").astype("datetime64[s]")),
+                          dtype="int64")
+        return period_counts(daily, freq)
+
+    def _counts(self, column: str, filters: Filters, start: date | None, end: date | None) -> np.ndarray:
+        rows = self.row_ids(filters, start, end)
+        if rows is None:
+            return self.totals[column]
+        codes = self.codes[column][rows]
+        return np.bincount(codes[codes >= 0], minlength=len(self.values[column]))
+
+
+def _largest(counts: np.ndarray, n: int) -> np.ndarray:
+    '''Positions of the *n* largest non-zero counts, largest first (ties: lower position first).'''
+    n = min(n, len(counts))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-counts, n - 1)[:n]
+    top = top[np.lexsort((top, -counts[top]))]
+    return top[counts[top] > 0]
+
+
+def _union(bitmaps: list[Bitmap]) -> Bitmap:
+    result = bitmaps[0] if bitmaps else Bitmap()
+    for b in bitmaps[1:]:
+        result = result | b
+    return result
+
+
+def _others(filters: Filters, column: str) -> dict:
+    return {c: v for c, v in filters.items() if c != column}
@@ -0,0 +1,598 @@
+# dns_resolver.py - asyncio DNS engine for the Assignment 1 IP enrichment
+#
+# Replaces the blocking socket.gethostbyname() thread pool: thousands of
+# look-ups share one event loop, every look-up has its own timeout and no
+# process-wide socket setting is touched.
+
+import asyncio
+import errno
+import ipaddress
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Protocol
+
+# -------- CONFIG -------------------------------------------------------------
+MAX_IN_FLIGHT = 1000                    # ceiling for concurrent look-ups
+START_WINDOW  = 32                      # AIMD window before the first latency samples
+MIN_WINDOW    = 4
+TARGET_LATENCY_S = 0.5                  # a slower median answer shrinks the window
+LATENCY_SAMPLES  = 32                   # recent answers the median is taken over
+MIN_RTO_S     = 2.0                     # adaptive per-attempt timeout never drops below this
+TIMEOUT_S     = 3                       # per attempt cap, not process-global
+RESOLV_CONF   = Path("/etc/resolv.conf")
+HOSTS_FILE    = Path("/etc/hosts")
+CACHE_PATH     = Path("dns_cache.sqlite3")
+POSITIVE_TTL_S = 7 * 24 * 3600          # keep resolved IPs for a week
+NEGATIVE_TTL_S = 6 * 3600               # retry 'N/A' domains after 6 hours
+CACHE_MAX_ROWS = 2_000_000              # oldest entries are evicted beyond this
+# -----------------------------------------------------------------------------
+
+NOT_FOUND = "N/A"
+
+
+class DnsError(OSError):
+    '''Raised by a backend when a name cannot be resolved.'''
+
+
+class NxDomain(DnsError):
+    '''The name does not exist or has no A record - a final answer, never retried.'''
+
+
+class ResolverBackend(Protocol):
+    '''Anything with an async resolve(domain) -> IPv4 string can be plugged in.'''
+
+    async def resolve(self, domain: str) -> str: ...
+
+
+class SystemResolver:
+    '''
+    Backend built on loop.getaddrinfo - honours /etc/hosts and NSS exactly like
+    gethostbyname, but the work runs on asyncio's default executor threads,
+    so real concurrency is limited by that pool.
+    '''
+
+    _MISSING = {getattr(socket, n) for n in ("EAI_NONAME", "EAI_NODATA") if hasattr(socket, n)}
+
+    async def resolve(self, domain: str) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(domain, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except socket.gaierror as exc:
+            if exc.errno in self._MISSING:
+                raise NxDomain(str(exc)) from exc
+            if exc.errno == socket.EAI_AGAIN:
+                raise TimeoutError(errno.ETIMEDOUT, str(exc)) from exc
+            raise
+        return infos[0][4][0]
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    '''
+    Routes DNS replies to the pending query with the same id *and* question
+    (name, type, class). Anything else - a late answer to a reused id, or a
+    spoofed one - is dropped, and the query keeps waiting for its own.
+    '''
+
+    def __init__(self):
+        self.pending: dict[int, tuple[asyncio.Future, bytes]] = {}   # id -> (future, lowercased question)
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if len(data) < 12:
+            return
+        qid, flags, qd = struct.unpack_from("!HHH", data)
+        entry = self.pending.get(qid)
+        if entry is None:
+            return
+        fut, question = entry
+        if not flags & 0x8000 or qd != 1 or data[12:12 + len(question)].lower() != question:
+            return
+        del self.pending[qid]
+        if not fut.done():
+            fut.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        for fut, _ in self.pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self.pending.clear()
+
+
+class UdpResolver:
+    '''
+    Non-blocking DNS client: sends A-record queries over one UDP socket per
+    nameserver and matches answers by query id and question, so thousands of
+    look-ups can be in flight. *nameservers* is a list of (host, port) pairs -
+    point it at a local stub server in tests. Queries go to the current one;
+    a query that times out (is cancelled) moves the ones after it, retries
+    included, to the next server in the list. Defaults to /etc/resolv.conf,
+    and names in /etc/hosts are answered locally like gethostbyname would.
+    '''
+
+    def __init__(self, nameservers: list[tuple[str, int]] | None = None, use_hosts_file: bool = True):
+        self.nameservers = nameservers or _system_nameservers()
+        self.hosts = _read_hosts() if use_hosts_file else {}
+        self.server = 0                     # index of the nameserver queries go to
+        self._endpoints: dict[tuple[asyncio.AbstractEventLoop, int], tuple] = {}
+
+    async def _endpoint(self, index: int) -> tuple:
+        key = (asyncio.get_running_loop(), index)
+        if key not in self._endpoints:
+            host, port = self.nameservers[index]
+            self._endpoints[key] = await key[0].create_datagram_endpoint(
+                _UdpProtocol, remote_addr=(host, port))
+        return self._endpoints[key]
+
+    async def resolve(self, domain: str) -> str:
+        name = domain.rstrip(".").lower()
+        if name in self.hosts:
+            return self.hosts[name]
+        index = self.server
+        transport, proto = await self._endpoint(index)
+
+        qid = random.randrange(1 << 16)
+        while qid in proto.pending:
+            qid = random.randrange(1 << 16)
+        query = _build_query(qid, name)
+        fut = asyncio.get_running_loop().create_future()
+        proto.pending[qid] = (fut, query[12:].lower())
+        try:
+            transport.sendto(query)
+            reply = await fut
+        except asyncio.CancelledError:      # timed out - fail over, once per server
+            self._fail_over(index)
+            raise
+        except OSError as exc:              # e.g. ICMP port unreachable - retried like a timeout
+            self._fail_over(index)
+            raise TimeoutError(errno.ETIMEDOUT, f"{name}: nameserver {self.nameservers[index][0]}: {exc}") from exc
+        finally:
+            proto.pending.pop(qid, None)
+        return _parse_reply(reply, name)
+
+    def _fail_over(self, index: int) -> None:
+        '''Send later queries to the server after *index*, unless another failure already moved on.'''
+        if self.server == index:
+            self.server = (index + 1) % len(self.nameservers)
+
+    def close(self) -> None:
+        for transport, _ in self._endpoints.values():
+            transport.close()
+        self._endpoints.clear()
+
+
+def _system_nameservers() -> list[tuple[str, int]]:
+    '''Read IPv4 `nameserver` lines from /etc/resolv.conf.'''
+    servers = []
+    try:
+        for line in RESOLV_CONF.read_text().splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == "nameserver" and "." in parts[1]:
+                servers.append((parts[1], 53))
+    except OSError:
+        pass
+    return servers
+
+
+def _read_hosts() -> dict[str, str]:
+    '''IPv4 entries of /etc/hosts, name -> address (first entry wins).'''
+    hosts: dict[str, str] = {}
+    try:
+        for line in HOSTS_FILE.read_text().splitlines():
+            parts = line.split("#", 1)[0].split()
+            if len(parts) >= 2 and "." in parts[0] and ":" not in parts[0]:
+                for name in parts[1:]:
+                    hosts.setdefault(name.lower(), parts[0])
+    except OSError:
+        pass
+    return hosts
+
+
+def _build_query(qid: int, name: str) -> bytes:
+    '''Encode a recursive A/IN query for *name*.'''
+    qname = b""
+    for label in name.split("."):
+        try:
+            raw = label.encode("idna")
+        except UnicodeError as exc:
+            raise DnsError(f"invalid label in {name!r}") from exc
+        if not 0 < len(raw) < 64:
+            raise DnsError(f"invalid label in {name!r}")
+        qname += bytes([len(raw)]) + raw
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)   # RD=1, one question
+    return header + qname + b"\x00" + struct.pack("!HH", 1, 1)
+
+
+def _skip_name(buf: bytes, off: int) -> int:
+    '''Return the offset just past a (possibly compressed) domain name.'''
+    while True:
+        n = buf[off]
+        if n == 0:
+            return off + 1
+        if n & 0xC0 == 0xC0:                # compression pointer ends the name
+            return off + 2
+        off += n + 1
+
+
+def _parse_reply(buf: bytes, name: str) -> str:
+    '''Return the first A record of a reply, raising DnsError otherwise.'''
+    _, flags, qd, an, _, _ = struct.unpack_from("!HHHHHH", buf)
+    rcode = flags & 0x000F
+    if rcode == 3:
+        raise NxDomain(f"{name}: NXDOMAIN")
+    if rcode:
+        raise DnsError(f"{name}: DNS rcode {rcode}")
+    off = 12
+    for _ in range(qd):
+        off = _skip_name(buf, off) + 4
+    for _ in range(an):
+        off = _skip_name(buf, off)
+        rtype, rclass, _, rdlen = struct.unpack_from("!HHIH", buf, off)
+        off += 10
+        if rtype == 1 and rclass == 1 and rdlen == 4:
+            return socket.inet_ntoa(buf[off:off + 4])
+        off += rdlen
+    raise NxDomain(f"{name}: no A record")
+
+
+@dataclass
+class RetryPolicy:
+    '''
+    Timeouts are retried with full-jitter exponential backoff; every other
+    failure (NXDOMAIN included) is final. All attempts of one domain, sleeps
+    included, must fit inside *budget_s*.
+    '''
+    attempts:   int   = 3
+    base_delay: float = 0.1
+    max_delay:  float = 2.0
+    budget_s:   float = 10.0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+@dataclass
+class ResolveStats:
+    '''Outcome counters for one resolve_many() run.'''
+    resolved:     int   = 0
+    nxdomain:     int   = 0
+    failed:       int   = 0             # other final errors (SERVFAIL, bad name, ...)
+    timeouts:     int   = 0             # still timing out when attempts / budget ran out
+    retries:      int   = 0
+    peak_window:  float = 0.0
+    final_window: float = 0.0
+
+
+class AimdLimiter:
+    '''
+    Congestion window for in-flight look-ups, run like TCP: slow start doubles
+    the window every round trip until the first sign of overload, then it grows
+    by one per window of answers (additive increase) and is halved
+    (multiplicative decrease) on a timeout, or when the median of the last
+    *samples* answers is slower than *target_latency* - a single slow
+    authoritative server does not throttle every other domain. At most once
+    per window: only attempts sent after the last cut can trigger the next one.
+    Also derives a per-attempt timeout from the smoothed latency (SRTT + 4·RTTVAR),
+    never below *min_rto* so slow but healthy servers are not retried early.
+    '''
+
+    def __init__(
+        self,
+        initial: int = START_WINDOW,
+        minimum: int = MIN_WINDOW,
+        maximum: int = MAX_IN_FLIGHT,
+        target_latency: float = TARGET_LATENCY_S,
+        decrease: float = 0.5,
+        samples: int = LATENCY_SAMPLES,
+        min_rto: float = MIN_RTO_S,
+    ):
+        self.minimum  = max(1, min(minimum, maximum))
+        self.maximum  = maximum
+        self.window   = float(max(self.minimum, min(initial, maximum)))
+        self.peak     = self.window
+        self.target   = target_latency
+        self.decrease = decrease
+        self.ssthresh = float(maximum)
+        self.in_flight = 0
+        self.min_rto  = min_rto
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.latencies: deque[float] = deque(maxlen=max(1, samples))
+        self._last_cut = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.window) and not self._waiters:
+            self.in_flight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():      # slot was granted - hand it on
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def release(self, latency: float | None, overloaded: bool = False, started: float = 0.0) -> None:
+        '''
+        Return a slot; *latency* is None when the attempt got no answer and
+        *started* is the attempt's time.monotonic() send time.
+        '''
+        self.in_flight -= 1
+        if latency is not None:
+            if self.srtt is None:
+                self.srtt, self.rttvar = latency, latency / 2
+            else:
+                self.rttvar += (abs(self.srtt - latency) - self.rttvar) / 4
+                self.srtt += (latency - self.srtt) / 8
+            self.latencies.append(latency)
+            overloaded = overloaded or (len(self.latencies) == self.latencies.maxlen
+                                        and statistics.median(self.latencies) > self.target)
+
+        if overloaded:
+            if started >= self._last_cut:
+                self.window = max(self.minimum, self.window * self.decrease)
+                self.ssthresh = self.window
+                self._last_cut = time.monotonic()
+                self.latencies.clear()      # judge the smaller window on its own answers
+        elif self.window < self.ssthresh:
+            self.window = min(self.maximum, self.window + 1)                 # slow start
+        else:
+            self.window = min(self.maximum, self.window + 1 / self.window)   # congestion avoidance
+        self.peak = max(self.peak, self.window)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.window):
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    def attempt_timeout(self, attempt: int, cap: float) -> float:
+        '''RTO for the given attempt: SRTT + 4·RTTVAR (at least min_rto), doubled per retry, capped.'''
+        if self.srtt is None:
+            return cap
+        rto = max(self.min_rto, self.srtt + 4 * self.rttvar) * 2 ** attempt
+        return min(cap, rto)
+
+
+@dataclass
+class CacheStats:
+    '''Counters for the most recent resolve_domains() call that used the cache.'''
+    hits:    int = 0
+    misses:  int = 0
+    evicted: int = 0
+
+
+class DnsCache:
+    '''
+    Persistent domain -> IP cache in a local SQLite file, shared by every
+    Streamlit rerun and batch run. Each row records the IP, when it was
+    resolved and whether the look-up failed; successful and failed ('N/A')
+    results expire after separate TTLs, and the table is capped at *max_rows*.
+    A connection is opened per call so the cache can be used from any thread.
+    '''
+
+    _CHUNK = 500                            # host parameters per IN (...) query
+
+    def __init__(
+        self,
+        path: str | Path = CACHE_PATH,
+        positive_ttl: float = POSITIVE_TTL_S,
+        negative_ttl: float = NEGATIVE_TTL_S,
+        max_rows: int = CACHE_MAX_ROWS,
+    ):
+        self.path = Path(path)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_rows = max_rows
+        self.stats = CacheStats()
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS dns_cache ("
+                " domain TEXT PRIMARY KEY, ip TEXT NOT NULL,"
+                " failed INTEGER NOT NULL, resolved_at REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS dns_cache_age ON dns_cache (resolved_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup_many(self, domains: list[str], now: float | None = None) -> dict[str, str]:
+        '''Return the unexpired cached IP (or 'N/A') for each domain that has one.'''
+        now = time.time() if now is None else now
+        found: dict[str, str] = {}
+        with self._connect() as con:
+            for i in range(0, len(domains), self._CHUNK):
+                chunk = domains[i:i + self._CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = con.execute(
+                    f"SELECT domain, ip FROM dns_cache WHERE domain IN ({marks})"
+                    " AND resolved_at > ? - CASE failed WHEN 1 THEN ? ELSE ? END",
+                    (*chunk, now, self.negative_ttl, self.positive_ttl),
+                )
+                found.update(rows)
+        return found
+
+    def store_many(self, results: dict[str, str], now: float | None = None) -> int:
+        '''Upsert fresh results, then evict expired rows and trim to max_rows.'''
+        now = time.time() if now is None else now
+        with self._connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO dns_cache VALUES (?, ?, ?, ?)",
+                ((d, ip, int(ip == NOT_FOUND), now) for d, ip in results.items()),
+            )
+            return self._evict(con, now)
+
+    def _evict(self, con: sqlite3.Connection, now: float) -> int:
+        expired = con.execute(
+            "DELETE FROM dns_cache WHERE resolved_at <= ? - CASE failed WHEN 1 THEN ? ELSE ? END",
+            (now, self.negative_ttl, self.positive_ttl),
+        ).rowcount
+        excess = con.execute("SELECT COUNT(*) FROM dns_cache").fetchone()[0] - self.max_rows
+        if excess > 0:
+            con.execute(
+                "DELETE FROM dns_cache WHERE domain IN"
+                " (SELECT domain FROM dns_cache ORDER BY resolved_at LIMIT ?)",
+                (excess,),
+            )
+        return expired + max(excess, 0)
+
+
+def default_backend() -> ResolverBackend:
+    '''UDP resolver against the system nameservers, or getaddrinfo if none are configured.'''
+    if os.name == "posix" and _system_nameservers():
+        return UdpResolver()
+    return SystemResolver()
+
+
+async def resolve_many(
+    domains: Iterable[str],
+    backend: ResolverBackend | None = None,
+    concurrency: int = MAX_IN_FLIGHT,
+    timeout: float = TIMEOUT_S,
+    retry: RetryPolicy | None = None,
+    adaptive: bool = True,
+    stats: ResolveStats | None = None,
+    on_result: Callable[[str, str], None] | None = None,
+) -> dict[str, str]:
+    '''
+    Resolve every domain once. With *adaptive* the number of look-ups in flight
+    follows an AIMD window capped at *concurrency*; otherwise it is fixed at
+    *concurrency*. Timeouts are retried per *retry*; failures map to 'N/A'.
+    Pass a ResolveStats to collect outcome counters, and *on_result(domain, ip)*
+    to hear about each answer as it lands.
+    '''
+    backend = backend or default_backend()
+    retry = retry or RetryPolicy()
+    stats = stats if stats is not None else ResolveStats()
+    ceiling = max(1, concurrency)
+    limiter = AimdLimiter(maximum=ceiling) if adaptive else AimdLimiter(ceiling, ceiling, ceiling)
+    todo = iter(dict.fromkeys(domains))
+    results: dict[str, str] = {}
+
+    async def worker() -> None:
+        for domain in todo:                 # workers share one iterator
+            results[domain] = ip = await _resolve_one(backend, domain, timeout, limiter, retry, stats)
+            if on_result:
+                on_result(domain, ip)
+
+    await asyncio.gather(*(worker() for _ in range(ceiling)))
+    stats.peak_window, stats.final_window = limiter.peak, limiter.window
+    return results
+
+
+async def _resolve_one(
+    backend: ResolverBackend,
+    domain: str,
+    timeout: float,
+    limiter: AimdLimiter,
+    retry: RetryPolicy,
+    stats: ResolveStats,
+) -> str:
+    '''
+    One domain: each attempt holds a window slot and has its own deadline.
+    Only timeouts are retried, after a jittered backoff, inside the retry budget.
+    IP literals are returned as-is.
+    '''
+    try:
+        ipaddress.IPv4Address(domain)
+        return domain
+    except ValueError:
+        pass
+
+    deadline = time.monotonic() + retry.budget_s
+    for attempt in range(retry.attempts):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if attempt:
+            stats.retries += 1
+        await limiter.acquire()
+        started = time.monotonic()
+        latency = None
+        try:
+            ip = await asyncio.wait_for(backend.resolve(domain),
+                                        min(limiter.attempt_timeout(attempt, timeout), remaining))
+            latency = time.monotonic() - started
+            stats.resolved += 1
+            return ip
+        except TimeoutError:                # asyncio's and socket's, before OSError
+            pass
+        except NxDomain:
+            latency = time.monotonic() - started
+            stats.nxdomain += 1
+            return NOT_FOUND
+        except (OSError, UnicodeError, IndexError, struct.error):
+            latency = time.monotonic() - started
+            stats.failed += 1
+            return NOT_FOUND
+        finally:
+            limiter.release(latency, overloaded=latency is None, started=started)
+        await asyncio.sleep(max(0.0, min(retry.backoff(attempt), deadline - time.monotonic())))
+
+    stats.timeouts += 1
+    return NOT_FOUND
+
+
+def resolve_domains(
+    domains: Iterable[str],
+    backend: ResolverBackend | None = None,
+    concurrency: int = MAX_IN_FLIGHT,
+    timeout: float = TIMEOUT_S,
+    cache: DnsCache | None = None,
+    retry: RetryPolicy | None = None,
+    adaptive: bool = True,
+    stats: ResolveStats | None = None,
+    on_result: Callable[[str, str], None] | None = None,
+) -> dict[str, str]:
+    '''
+    Blocking wrapper around resolve_many() for synchronous callers such as the
+    Streamlit script. Runs on a private thread if an event loop is already running.
+    With a *cache*, only domains without a fresh cached answer go to the network;
+    the hit / miss counts end up in cache.stats. Cached answers are passed to
+    *on_result* too, before the network look-ups start.
+    '''
+    if cache is not None:
+        domains = list(dict.fromkeys(domains))
+        hits = cache.lookup_many(domains)
+        if on_result:
+            for d, ip in hits.items():
+                on_result(d, ip)
+        misses = [d for d in domains if d not in hits]
+        fresh = resolve_domains(misses, backend, concurrency, timeout, retry=retry,
+                                adaptive=adaptive, stats=stats, on_result=on_result) if misses else {}
+        evicted = cache.store_many(fresh)
+        cache.stats = CacheStats(hits=len(hits), misses=len(misses), evicted=evicted)
+        return {**hits, **fresh}
+
+    backend = backend or default_backend()
+
+    async def run() -> dict[str, str]:
+        try:
+            return await resolve_many(domains, backend, concurrency, timeout, retry, adaptive,
+                                      stats, on_result)
+        finally:
+            if isinstance(backend, UdpResolver):
+                backend.close()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+
+    out: dict[str, dict[str, str]] = {}
+    t = threading.Thread(target=lambda: out.setdefault("r", asyncio.run(run())))
+    t.start()
+    t.join()
+    return out["r"]
@@ -0,0 +1,384 @@
+# http_fetch.py - shared HTTP layer for every download the Streamlit pages make
+#
+# One pooled keep-alive requests.Session, Google Drive's share-link and
+# confirm-page handling in one place, and HttpCache: response bodies stored on
+# disk under their SHA-256 (identical content is kept once), with each URL's
+# ETag / Last-Modified in a small SQLite index. A cached body is served as is
+# while fresh, served at once and revalidated in the background while stale,
+# and revalidated with a conditional GET before use once older than that - so
+# a server restart costs a 304, not a download. Nothing here is specific to
+# Drive's host, so a local server can stand in for it (benchmarks/stub_http.py).
+
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Mapping
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# -------- CONFIG -------------------------------------------------------------
+HTTP_TIMEOUT_S  = 30
+POOL_SIZE       = 16                    # keep-alive connections kept per host
+USER_AGENT      = "Mozilla/5.0"
+DRIVE_DOWNLOAD  = "https://drive.google.com/uc?export=download&id={}"
+DRIVE_HOSTS     = ("drive.google.com", "docs.google.com")
+CACHE_DIR       = Path("http_cache")
+FRESH_S         = 300                   # served without asking the server
+STALE_S         = 7 * 24 * 3600         # served at once and revalidated in the background
+CACHE_MAX_BYTES = 2 << 30               # least recently used bodies are evicted beyond this
+CHUNK_SIZE      = 1 << 16               # bytes per block read from the socket / cache file
+# -----------------------------------------------------------------------------
+
+_CONFIRM_FORM = re.compile(r'<form[^>]*id="download-form"[^>]*action="([^"]+)"', re.I)
+_HIDDEN_INPUT = re.compile(r'<input[^>]*type="hidden"[^>]*name="([^"]+)"[^>]*value="([^"]*)"', re.I)
+
+
+@lru_cache(maxsize=1)
+def shared_session() -> requests.Session:
+    '''One keep-alive session for the process, with up to POOL_SIZE connections per host.'''
+    sess = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    sess.headers["User-Agent"] = USER_AGENT
+    return sess
+
+
+def drive_file_id(url: str) -> str:
+    '''The file ID in a Google Drive link (".../d/<ID>/view" or "?id=<ID>"); '' for any other URL.'''
+    parts = urlparse(url)
+    if parts.hostname not in DRIVE_HOSTS:
+        return ""
+    m = re.search(r"/d/([0-9A-Za-z_-]{10,})", parts.path)
+    if m:
+        return m.group(1)
+    return parse_qs(parts.query).get("id", [""])[0]
+
+
+def drive_download_url(url: str) -> str:
+    '''
+    Google Drive ‘share’ links need converting to the *download* endpoint.
+    Any other URL is returned unchanged.
+    '''
+    file_id = drive_file_id(url)
+    return DRIVE_DOWNLOAD.format(file_id) if file_id else url
+
+
+def open_download(url: str, sess: requests.Session | None = None,
+                  headers: Mapping[str, str] | None = None) -> requests.Response:
+    '''
+    Start a streamed GET for *url*. If we hit Drive’s virus-scan / confirm page
+    - a download_warning cookie, or the newer HTML form - resend with its token.
+    The body is left unread; a 304 (for conditional *headers*) is returned as is.
+    '''
+    sess = sess or shared_session()
+    r = sess.get(url, headers=headers, timeout=HTTP_TIMEOUT_S, stream=True)
+    if r.status_code != 304 and "content-disposition" not in r.headers:
+        confirm = _confirm_request(r)
+        if confirm is not None:
+            r.close()
+            action, params = confirm
+            r = sess.get(action, params=params, headers=headers, timeout=HTTP_TIMEOUT_S, stream=True)
+    r.raise_for_status()
+    return r
+
+
+def _confirm_request(r: requests.Response) -> tuple[str, dict] | None:
+    '''Where and with which parameters to confirm a Drive download, if *r* asks for it.'''
+    for k, v in r.cookies.items():
+        if k.startswith("download_warning"):
+            return r.url, {"confirm": v}
+    if "text/html" not in r.headers.get("Content-Type", ""):
+        return None
+    page = r.text                           # small page; the body stays readable from r.content
+    form = _CONFIRM_FORM.search(page)
+    if form is None:
+        return None
+    return html.unescape(form.group(1)), {k: html.unescape(v) for k, v in _HIDDEN_INPUT.findall(page)}
+
+
+@dataclass
+class CachedResponse:
+    '''Index entry for one URL: the digest of its body and the validators it was served with.'''
+    url: str
+    digest: str
+    size: int
+    etag: str | None
+    last_modified: str | None
+    content_type: str | None
+    fetched_at: float                       # when the server last confirmed the body
+
+    @property
+    def encoding(self) -> str:
+        m = re.search(r"charset=([\w-]+)", self.content_type or "")
+        return m.group(1) if m else "utf-8"
+
+
+@dataclass
+class FetchStats:
+    '''What the cache did for the requests it served since it was created.'''
+    hits:        int = 0                    # fresh - no request made
+    stale:       int = 0                    # served stale, revalidated in the background
+    revalidated: int = 0                    # 304 - body reused
+    downloaded:  int = 0
+
+
+class HttpCache:
+    '''
+    Response bodies on disk, content-addressed: *directory*/objects/ab/abcd…
+    holds the body whose SHA-256 is abcd…, and *directory*/index.sqlite3 maps
+    each URL to its digest, validators and fetch time. A body is served
+    without a request for *fresh_s*, then served while revalidated in the
+    background until *stale_s*, after which it is revalidated first (a
+    conditional GET: a 304 reuses it, a 200 replaces it). Bodies beyond
+    *max_bytes* are evicted least recently used first.
+    A connection is opened per call so the cache can be used from any thread.
+    '''
+
+    def __init__(self, directory: str | Path = CACHE_DIR, fresh_s: float = FRESH_S, stale_s: float = STALE_S,
+                 max_bytes: int = CACHE_MAX_BYTES, session: requests.Session | None = None):
+        self.directory = Path(directory)
+        self.fresh_s = fresh_s
+        self.stale_s = stale_s
+        self.max_bytes = max_bytes
+        self.session = session
+        self.stats = FetchStats()
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        (self.directory / "objects").mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL,"
+                " etag TEXT, last_modified TEXT, content_type TEXT,"
+                " fetched_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        '''A connection that commits (or rolls back) on exit, then closes.'''
+        with closing(sqlite3.connect(self.directory / "index.sqlite3", timeout=30)) as con, con:
+            yield con
+
+    def object_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / digest
+
+    def lookup(self, url: str) -> CachedResponse | None:
+        '''The entry for *url* (after Drive link conversion), if its body is on disk.'''
+        url = drive_download_url(url)
+        with self._connect() as con:
+            row = con.execute("SELECT url, digest, size, etag, last_modified, content_type, fetched_at"
+                              " FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None or not self.object_path(row[1]).exists():
+            return None
+        return CachedResponse(*row)
+
+    def expire(self, url: str) -> None:
+        '''Make the next read of *url* revalidate before serving - e.g. once it is known to have changed.'''
+        with self._connect() as con:
+            con.execute("UPDATE responses SET fetched_at = 0 WHERE url = ?", (drive_download_url(url),))
+
+    # ---- reading ----------------------------------------------------------
+
+    def open(self, url: str) -> tuple[CachedResponse, BinaryIO]:
+        '''
+        The entry for *url* and its body opened for reading, downloading or
+        revalidating it first if it is missing or too old.
+        '''
+        url = drive_download_url(url)
+        opened = self._open(url)
+        if opened is None:
+            for _ in self._download(url):
+                pass
+            entry = self.lookup(url)        # just confirmed - served whatever fresh_s / stale_s say
+            opened = entry, self.object_path(entry.digest).open("rb")
+        return opened
+
+    def fetch(self, url: str) -> CachedResponse:
+        entry, f = self.open(url)
+        f.close()
+        return entry
+
+    def iter_bytes(self, url: str, chunk_size: int = CHUNK_SIZE,
+                   on_bytes: Callable[[int, int | None], None] | None = None) -> Iterator[bytes]:
+        '''
+        The body of *url* as blocks. A download is passed on block by block as
+        it arrives (and written to the cache as it goes), so callers can parse
+        while it is in flight. *on_bytes(read, total)* reports progress.
+        '''
+        url = drive_download_url(url)
+        opened = self._open(url)
+        if opened is None:
+            yield from self._download(url, chunk_size, on_bytes)
+        else:
+            yield from self._read(*opened, chunk_size, on_bytes)
+
+    def read_bytes(self, url: str) -> bytes:
+        entry, f = self.open(url)
+        with f:
+            return f.read()
+
+    def read_text(self, url: str) -> str:
+        '''The body decoded with the charset it was served with (UTF-8 when none is given).'''
+        entry, f = self.open(url)
+        with f:
+            return f.read().decode(entry.encoding, errors="replace")
+
+    def _open(self, url: str) -> tuple[CachedResponse, BinaryIO] | None:
+        '''
+        The cached entry and its body if they may be served now. The file is
+        opened before a stale entry's background refresh starts, so replacing
+        the body cannot pull it from under this read.
+        '''
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        age = time.time() - entry.fetched_at
+        if age >= self.stale_s:
+            return None
+        try:
+            f = self.object_path(entry.digest).open("rb")
+        except FileNotFoundError:
+            return None
+        if age < self.fresh_s:
+            self.stats.hits += 1
+        else:
+            self.stats.stale += 1
+            self.refresh(url)
+        with self._connect() as con:
+            con.execute("UPDATE responses SET used_at = ? WHERE url = ?", (time.time(), url))
+        return entry, f
+
+    def _read(self, entry: CachedResponse, f: BinaryIO, chunk_size: int = CHUNK_SIZE,
+              on_bytes: Callable[[int, int | None], None] | None = None) -> Iterator[bytes]:
+        read = 0
+        with f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                read += len(block)
+                if on_bytes:
+                    on_bytes(read, entry.size)
+                yield block
+
+    # ---- downloading ------------------------------------------------------
+
+    def refresh(self, url: str) -> None:
+        '''Revalidate *url* on a background thread, unless a refresh of it is already running.'''
+        url = drive_download_url(url)
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def run() -> None:
+            try:
+                for _ in self._download(url):
+                    pass
+            except (requests.RequestException, OSError):
+                pass                            # keep serving what is cached; retried on a later read
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=run, name="http-refresh", daemon=True).start()
+
+    def _download(self, url: str, chunk_size: int = CHUNK_SIZE,
+                  on_bytes: Callable[[int, int | None], None] | None = None) -> Iterator[bytes]:
+        '''Conditional GET of *url*: the cached body on a 304, else the new body, stored as it streams.'''
+        entry = self.lookup(url)
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        with open_download(url, self.session, headers) as r:
+            if r.status_code == 304 and entry is not None:
+                self._record(url, entry.digest, entry.size, r.headers, entry)
+                self.stats.revalidated += 1
+            else:
+                entry = None
+                length = r.headers.get("Content-Length")
+                total = int(length) if length and "Content-Encoding" not in r.headers else None
+                digest, read = hashlib.sha256(), 0
+                fd, tmp = tempfile.mkstemp(dir=self.directory / "objects", suffix=".part")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        for block in r.iter_content(chunk_size):
+                            f.write(block)
+                            digest.update(block)
+                            read += len(block)
+                            if on_bytes:
+                                on_bytes(read, total)
+                            yield block
+                    target = self.object_path(digest.hexdigest())
+                    target.parent.mkdir(exist_ok=True)
+                    os.replace(tmp, target)     # same content under the same name - idempotent
+                except BaseException:
+                    Path(tmp).unlink(missing_ok=True)
+                    raise
+                self._record(url, digest.hexdigest(), read, r.headers)
+                self.stats.downloaded += 1
+        if entry is not None:
+            yield from self._read(entry, self.object_path(entry.digest).open("rb"), chunk_size, on_bytes)
+
+    def _record(self, url: str, digest: str, size: int, headers: Mapping[str, str],
+                previous: CachedResponse | None = None) -> None:
+        '''Upsert the index entry for *url* (a 304 may omit validators - keep the previous ones), then evict.'''
+        now = time.time()
+        etag = headers.get("ETag") or (previous.etag if previous else None)
+        modified = headers.get("Last-Modified") or (previous.last_modified if previous else None)
+        ctype = headers.get("Content-Type") or (previous.content_type if previous else None)
+        with self._connect() as con:
+            old = con.execute("SELECT digest FROM responses WHERE url = ?", (url,)).fetchone()
+            con.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url, digest, size, etag, modified, ctype, now, now))
+            orphans = {old[0]} - {digest} if old else set()
+            self._evict(con, orphans)
+
+    def _evict(self, con: sqlite3.Connection, orphans: set[str] = frozenset()) -> None:
+        '''
+        Drop least recently used entries beyond max_bytes, then the bodies no
+        entry points to any more (evicted ones and the replaced *orphans*).
+        '''
+        kept, dropped, total = set(), [], 0
+        for url, digest, size in con.execute("SELECT url, digest, size FROM responses ORDER BY used_at DESC"):
+            if digest not in kept:
+                total += size
+                if total > self.max_bytes and kept:
+                    dropped.append((url, digest))
+                    continue
+                kept.add(digest)
+        con.executemany("DELETE FROM responses WHERE url = ?", [(url,) for url, _ in dropped])
+        for digest in ({d for _, d in dropped} | set(orphans)) - kept:
+            if not con.execute("SELECT 1 FROM responses WHERE digest = ?", (digest,)).fetchone():
+                self.object_path(digest).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def default_cache() -> HttpCache:
+    '''The cache in CACHE_DIR, shared for the life of the process.'''
+    return HttpCache()
+
+
+def fetch_bytes(url: str, cache: HttpCache | None = None) -> bytes:
+    return (cache or default_cache()).read_bytes(url)
+
+
+def fetch_text(url: str, cache: HttpCache | None = None) -> str:
+    return (cache or default_cache()).read_text(url)
+
+
+def iter_url_bytes(url: str, chunk_size: int = CHUNK_SIZE,
+                   on_bytes: Callable[[int, int | None], None] | None = None,
+                   cache: HttpCache | None = None) -> Iterator[bytes]:
+    yield from (cache or default_cache()).iter_bytes(url, chunk_size, on_bytes)
@@ -0,0 +1,997 @@
+# notice_pipeline.py - building blocks for the Assignment 1 notices pipeline
+#
+# App.py wires these helpers together inside show_assignment_1(); they live in
+# a plain module so they can also be imported outside a Streamlit rerun.
+
+import codecs
+import csv
+import glob
+import hashlib
+import inspect
+import io
+import json
+import multiprocessing
+import queue
+import re
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+from pandas.api.types import union_categoricals
+
+from http_fetch import HttpCache, default_cache, drive_download_url, iter_url_bytes
+from public_suffix import PSL_PATH, default_trie
+
+# -------- CONFIG -------------------------------------------------------------
+CHUNK_SIZE     = 1 << 16                # bytes pulled from the socket / file
+BATCH_ROWS     = 50_000                 # flattened URL rows per column batch
+FLAT_COLUMNS   = (
+    "notice_id", "title", "sender", "principal", "recipient",
+    "date_sent", "description", "infringing_url", "domain",
+)
+EXPORT_COLUMNS = (*FLAT_COLUMNS, "ip_address")   # schema of the exported CSV
+POOLED_COLUMNS = (                      # notice / work fields repeated on every URL row → categoricals
+    "title", "sender", "principal", "recipient", "date_sent", "description",
+)
+FLAT_SCHEMA    = 4                      # bump when the flattened frame's dtypes change (drops stores)
+CSV_CHUNK_ROWS = 50_000                 # rows encoded per CSV chunk
+CSV_COMPRESSION_SUFFIX = {None: "", "gzip": ".gz", "zstd": ".zst"}
+ROW_GROUP_ROWS = 250_000                # rows per Parquet row group / Arrow record batch
+DICT_COLUMNS   = (                      # low-cardinality strings, dictionary-encoded on export
+    "title", "sender", "principal", "recipient", "date_sent", "description",
+    "domain", "ip_address", "principal_clean", "root_domain",
+)
+COLUMNAR_FORMATS = {                    # format -> (file suffix, MIME type)
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow":   (".arrow",   "application/vnd.apache.arrow.file"),
+}
+UNVERSIONED_TTL_S = 3600                # a source without ETag / Last-Modified is re-read this often
+SHARD_NOTICES  = 5_000                  # notices per process-pool shard (flatten_clean_parallel)
+SOURCE_WORKERS = 8                      # input sources downloaded / parsed at once (iter_sources)
+SOURCE_BUFFER  = 1_000                  # notices parsed ahead per source waiting for its turn
+SOURCE_SUFFIXES = (".json",)           # files taken from an input directory
+# -----------------------------------------------------------------------------
+
+_WS = re.compile(r"[ \t\n\r]*")
+_STR_DTYPE = pd.Series([""]).dtype     # what pandas infers for text: str (pandas 3) or object
+
+
+def iter_text_chunks(
+    src: str | Path,
+    chunk_size: int = CHUNK_SIZE,
+    on_bytes: Callable[[int, int | None], None] | None = None,
+    cache: HttpCache | None = None,
+) -> Iterator[str]:
+    '''
+    Yield the document behind *src* as decoded text chunks, either from
+      • an http/https URL (through the shared HTTP cache, see http_fetch.py -
+        a download is streamed off the socket as it arrives), or
+      • a local file (Path / str).
+    *on_bytes(read, total)* is called after every block with the bytes read so
+    far and the size if known (Content-Length / file size). *cache* replaces
+    the default HTTP cache.
+    '''
+    src_str = str(src)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def decoded(blocks: Iterable[bytes]) -> Iterator[str]:
+        for block in blocks:
+            text = decoder.decode(block)
+            if text:
+                yield text
+
+    # 1️⃣ Remote file ----------------------------------------------------------
+    if src_str.startswith(("http://", "https://")):
+        yield from decoded(iter_url_bytes(src_str, chunk_size, on_bytes, cache))
+
+    # 2️⃣ Local file -----------------------------------------------------------
+    else:
+        path = Path(src_str)
+        total, read = path.stat().st_size, 0
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                read += len(block)
+                if on_bytes:
+                    on_bytes(read, total)
+                yield from decoded((block,))
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _JsonStream:
+    '''
+    Minimal pull parser over a stream of text chunks. Structural tokens are
+    consumed one character at a time; complete values are handed to
+    json.JSONDecoder.raw_decode once enough of the stream is buffered.
+    '''
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks  = iter(chunks)
+        self._buf     = ""
+        self._pos     = 0
+        self._eof     = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, min_chars: int) -> bool:
+        '''Drop the consumed prefix and append at least *min_chars* new characters.'''
+        parts = [self._buf[self._pos:]]
+        self._pos = 0
+        added = 0
+        while added < min_chars:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                break
+            parts.append(chunk)
+            added += len(chunk)
+        self._buf = "".join(parts)
+        return added > 0
+
+    def peek(self) -> str:
+        '''Return the next non-whitespace character without consuming it ('' at EOF).'''
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(1):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        '''Consume one structural character out of *chars*.'''
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Malformed JSON: expected one of {chars!r}, got {ch or 'EOF'!r}")
+        self._pos += 1
+        return ch
+
+    def value(self):
+        '''Decode and consume one complete JSON value.'''
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                # double the look-ahead so a huge value is not re-parsed per chunk
+                self._fill(max(CHUNK_SIZE, len(self._buf) - self._pos))
+                continue
+            # a bare number may carry on in the next chunk - make sure it ended
+            if end == len(self._buf) and not self._eof and self._fill(1):
+                continue
+            self._pos = end
+            return obj
+
+
+def iter_json_array(chunks: Iterable[str], key: str = "notices") -> Iterator:
+    '''
+    Yield the elements of the top-level array stored under *key*, one at a
+    time, as soon as each element has been received.
+    A document that is itself a bare array is streamed the same way.
+    Sibling keys are decoded and discarded, so only one element is held at once.
+    '''
+    stream = _JsonStream(chunks)
+    if stream.peek() == "\ufeff":               # tolerate a UTF-8 BOM
+        stream.expect("\ufeff")
+
+    if stream.expect("{[") == "{":
+        while True:
+            if stream.peek() == "}":
+                return                          # no such key - nothing to yield
+            name = stream.value()
+            stream.expect(":")
+            if name == key:
+                stream.expect("[")
+                break
+            stream.value()
+            if stream.expect(",}") == "}":
+                return
+
+    if stream.peek() == "]":
+        return
+    while True:
+        yield stream.value()
+        if stream.expect(",]") == "]":
+            return
+
+
+def iter_notices(
+    src: str | Path,
+    chunk_size: int = CHUNK_SIZE,
+    on_bytes: Callable[[int, int | None], None] | None = None,
+    cache: HttpCache | None = None,
+) -> Iterator[dict]:
+    '''
+    Stream the Lumen-style `notices` array from a URL or local file, yielding
+    one notice dict at a time. Memory stays bounded by the largest notice and
+    flattening can start while the download is still in flight.
+    *on_bytes* reports download progress, see iter_text_chunks().
+    '''
+    yield from iter_json_array(iter_text_chunks(src, chunk_size, on_bytes, cache), key="notices")
+
+
+# -------- several sources ----------------------------------------------------
+
+def expand_sources(spec: str | Path | Iterable[str | Path]) -> list[str]:
+    '''
+    The inputs named by *spec*, in a stable order: a URL or file as is, a
+    directory as the SOURCE_SUFFIXES files in it, a glob pattern as its
+    matches (sorted), and a list / tuple as each of its items in turn.
+    Repeats are dropped; a directory or pattern matching nothing raises.
+    '''
+    items = [spec] if isinstance(spec, (str, Path)) else list(spec)
+    found: dict[str, None] = {}
+    for item in items:
+        s = str(item)
+        if s.startswith(("http://", "https://")):
+            matches = [s]
+        elif Path(s).is_dir():
+            matches = sorted(str(p) for p in Path(s).iterdir() if p.is_file() and p.suffix in SOURCE_SUFFIXES)
+        elif re.search(r"[*?[]", s):
+            matches = sorted(p for p in glob.glob(s, recursive=True) if Path(p).is_file())
+        else:
+            matches = [s]
+        if not matches:
+            raise FileNotFoundError(f"No input files match {s}")
+        found.update(dict.fromkeys(matches))
+    return list(found)
+
+
+def sources_fingerprint(sources: Sequence[str | Path], workers: int = SOURCE_WORKERS,
+                        cache: HttpCache | None = None) -> str:
+    '''
+    source_fingerprint() of a single input; for several, a hash over each
+    one's fingerprint, looked up *workers* at a time (URLs that are due are
+    revalidated in parallel).
+    '''
+    if len(sources) == 1:
+        return source_fingerprint(sources[0], cache)
+    with ThreadPoolExecutor(max(1, min(workers, len(sources)))) as pool:
+        parts = list(pool.map(lambda s: source_fingerprint(s, cache), sources))
+    return f"{len(sources)} sources|" + hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IngestStats:
+    '''Counters for one iter_sources() run.'''
+    sources:    int = 0
+    notices:    int = 0                     # yielded, after de-duplication
+    duplicates: int = 0                     # skipped - notice_id already yielded, or in `seen`
+    seconds:    dict[str, float] = field(default_factory=dict)   # read time per source
+
+    @property
+    def slowest_s(self) -> float:
+        return max(self.seconds.values(), default=0.0)
+
+
+_DONE = object()                            # end-of-source marker in iter_sources' queues
+
+
+def iter_sources(
+    sources: Sequence[str | Path],
+    read: Callable[[str, Callable[[int, int | None], None] | None], Iterable[dict]] | None = None,
+    workers: int = SOURCE_WORKERS,
+    on_bytes: Callable[[int, int | None], None] | None = None,
+    stats: IngestStats | None = None,
+    cache: HttpCache | None = None,
+    seen: set | None = None,
+    buffer: int = SOURCE_BUFFER,
+) -> Iterator[dict]:
+    '''
+    Notices from all *sources*, read *workers* at a time on threads by
+    *read(src, on_bytes)* (default: iter_notices). They are yielded source
+    by source in the order given, so the merged rows do not depend on which
+    download finishes first. A source waiting for its turn is parsed at
+    most *buffer* notices ahead, so memory stays bounded - but a URL other
+    than the first is downloaded into the HTTP cache (*cache*, on disk)
+    before it is parsed, so the downloads still overlap and the wall time
+    tends to that of the slowest download plus the parsing.
+    A notice whose id was already yielded (the same notice in two dumps) or
+    is in *seen* is skipped; notices without an id are all kept.
+    *on_bytes(read, total)* reports bytes over all sources, the total once
+    every source has one. Pass an IngestStats to collect counters.
+    '''
+    read = read or (lambda src, progress: iter_notices(src, on_bytes=progress, cache=cache))
+    stats = stats if stats is not None else IngestStats()
+    stats.sources = len(sources)
+    queues = [queue.Queue(maxsize=buffer) for _ in sources]
+    progress: dict[int, tuple[int, int | None]] = {}
+    lock, stop = threading.Lock(), threading.Event()
+
+    def report(i: int, done: int, total: int | None) -> None:
+        with lock:
+            progress[i] = (done, total)
+            totals = [t for _, t in progress.values()]
+            grand = sum(totals) if len(totals) == len(sources) and None not in totals else None
+            on_bytes(sum(d for d, _ in progress.values()), grand)
+
+    def put(i: int, item: Any) -> float | None:
+        '''Queue *item* for the merge, waiting while the buffer is full; seconds waited, None once stopped.'''
+        t0 = time.perf_counter()
+        while not stop.is_set():
+            try:
+                queues[i].put(item, timeout=0.1)
+                return time.perf_counter() - t0
+            except queue.Full:
+                pass
+        return None
+
+    def load(i: int) -> None:
+        src, t0, waited = str(sources[i]), time.perf_counter(), 0.0
+        progress_i = (lambda d, t: report(i, d, t)) if on_bytes else None
+        try:
+            if i > 0 and src.startswith(("http://", "https://")):
+                for _ in iter_url_bytes(src, on_bytes=progress_i, cache=cache):
+                    pass                        # to disk now, parsed from the cache below
+                progress_i = None
+            for notice in read(src, progress_i):
+                if (w := put(i, notice)) is None:
+                    return
+                waited += w
+            put(i, _DONE)
+        except BaseException as exc:        # handed to the consumer, raised in source order
+            put(i, exc)
+        finally:                            # time spent reading, not waiting for the merge
+            stats.seconds[src] = round(time.perf_counter() - t0 - waited, 3)
+
+    seen = set(seen) if seen else set()
+    pool = ThreadPoolExecutor(max(1, min(workers, len(sources))), thread_name_prefix="source")
+    try:
+        for i in range(len(sources)):
+            pool.submit(load, i)
+        for q in queues:
+            while (item := q.get()) is not _DONE:
+                if isinstance(item, BaseException):
+                    raise item
+                nid = item.get("id")
+                if nid is not None:
+                    if nid in seen:
+                        stats.duplicates += 1
+                        continue
+                    seen.add(nid)
+                stats.notices += 1
+                yield item
+    finally:
+        stop.set()                          # readers still running stop at their next notice
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class StringPool:
+    '''
+    Append-only dictionary for one column: every distinct value gets the next
+    integer code the first time it is seen, None is -1. Column batches then
+    hold small ints instead of one string reference per row, and the values
+    are stored once - in first-appearance order, which becomes the category
+    order of the final column.
+    '''
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self):
+        self.codes: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def encode(self, value: str | None) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def string_pools() -> dict[str, StringPool]:
+    '''One empty pool per POOLED_COLUMNS entry, shared by all batches of one flatten.'''
+    return {c: StringPool() for c in POOLED_COLUMNS}
+
+
+def iter_flat_batches(
+    notices: Iterable[dict],
+    batch_rows: int = BATCH_ROWS,
+    pools: Mapping[str, StringPool] | None = None,
+) -> Iterator[dict[str, list]]:
+    '''
+    Flatten notices so each infringing URL becomes one row, but yield the rows
+    as column batches ({column: list}) of up to *batch_rows* entries instead of
+    one dict per URL. Notice-level fields are appended by reference.
+    With *pools* (see string_pools()) the pooled columns hold integer codes
+    into them instead - encoded once per notice / work, not once per row.
+    '''
+    same = lambda value: value
+    enc = {c: pools[c].encode if pools and c in pools else same for c in FLAT_COLUMNS}
+    cols = {c: [] for c in FLAT_COLUMNS}
+    (notice_id, title, sender, principal, recipient,
+     date_sent, description, infringing_url, domain) = cols.values()
+    n = 0
+
+    for notice in notices:
+        base = (
+            notice.get("id"),
+            enc["title"](notice.get("title")),
+            enc["sender"](notice.get("sender_name")),
+            enc["principal"](notice.get("principal_name")),
+            enc["recipient"](notice.get("recipient_name")),
+            enc["date_sent"](notice.get("date_sent")),
+        )
+        for work in notice.get("works", []):
+            desc = enc["description"](work.get("description"))
+            for item in work.get("infringing_urls", []):
+                url = item.get("url")
+                notice_id.append(base[0])
+                title.append(base[1])
+                sender.append(base[2])
+                principal.append(base[3])
+                recipient.append(base[4])
+                date_sent.append(base[5])
+                description.append(desc)
+                infringing_url.append(url)
+                domain.append(urlparse(url).netloc.lower())   # Extract domain from URL
+                n += 1
+
+        if n >= batch_rows:
+            yield cols
+            cols = {c: [] for c in FLAT_COLUMNS}
+            (notice_id, title, sender, principal, recipient,
+             date_sent, description, infringing_url, domain) = cols.values()
+            n = 0
+
+    if n:
+        yield cols
+
+
+def frame_from_batches(
+    batches: Iterable[dict[str, list]],
+    pools: Mapping[str, StringPool] | None = None,
+) -> pd.DataFrame:
+    '''
+    Build the flattened DataFrame straight from column batches - each batch is
+    converted once and released, no list-of-dicts is ever materialised.
+    Pass the *pools* the batches were encoded with: the code columns become
+    categoricals over the pooled values. date_sent keeps the source's text -
+    aggregations derive the UTC day from its categories (summaries.utc_days).
+    '''
+    pools = pools or {}
+    frames = [_batch_frame(b, pools) for b in batches]
+    if not frames:
+        frames = [_batch_frame({c: [] for c in FLAT_COLUMNS}, pools)]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    for col, pool in pools.items():
+        df[col] = _decode_pooled(df[col].to_numpy(), pool)
+    return df
+
+
+def flatten_frame(notices: Iterable[dict], batch_rows: int = BATCH_ROWS) -> pd.DataFrame:
+    '''The flattened, dictionary-encoded frame of *notices* - iter_flat_batches() + frame_from_batches().'''
+    pools = string_pools()
+    return frame_from_batches(iter_flat_batches(notices, batch_rows, pools), pools)
+
+
+def _batch_frame(batch: dict[str, list], pools: Mapping[str, StringPool]) -> pd.DataFrame:
+    '''
+    One column batch as a DataFrame, pooled columns as int32 codes and
+    notice_id as nullable Int64 (a notice without an id must not turn the
+    others into floats). A text column that is all null in this batch still
+    gets the string dtype, so the frame's dtypes do not depend on where
+    batch (or process-pool shard) boundaries fall.
+    '''
+    df = pd.DataFrame({c: np.asarray(batch[c], dtype=np.int32) if c in pools else batch[c]
+                       for c in FLAT_COLUMNS}, columns=FLAT_COLUMNS)
+    try:
+        df["notice_id"] = df["notice_id"].astype("Int64")
+    except (TypeError, ValueError):         # ids that are not integers stay as they are
+        pass
+    for col in FLAT_COLUMNS[1:]:
+        if col not in pools and df[col].dtype != _STR_DTYPE and df[col].isna().all():
+            df[col] = df[col].astype(_STR_DTYPE)
+    return df
+
+
+def _decode_pooled(codes: np.ndarray, pool: StringPool) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=pd.Index(pool.values, dtype=object))
+
+
+def iter_row_dicts(df: pd.DataFrame) -> Iterator[dict]:
+    '''
+    Compatibility view: yield the flattened rows as plain dicts (one per URL),
+    built lazily from the columnar frame for callers that still expect rows.
+    '''
+    cols = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(cols, values))
+
+
+# -------- cleaning -----------------------------------------------------------
+# Scalar reference rules first, then the factorized / vectorized versions used
+# by the pipeline. Both must produce identical strings.
+
+def tidy_principal(name: str) -> str:
+    '''
+    Standardize principal names: lowercase, remove punctuation,
+    remove 'inc', collapse whitespace, and title-case.
+    '''
+    if pd.isna(name):
+        return "Unknown"
+    n = name.lower()
+    n = re.sub(r'[,.\']', '', n)          # remove punctuation
+    n = n.replace(' inc', '').strip()
+    n = re.sub(r'\s+', ' ', n)
+    return n.title()
+
+
+def root_domain(d: str) -> str:
+    '''
+    Extract the root domain (last two labels) and remove 'www.' prefix.
+    '''
+    if pd.isna(d):
+        return "unknown"
+    d = d.lower()
+    d = re.sub(r'^www\d*\.', '', d)       # drop www., www2. etc.
+    return '.'.join(d.split('.')[-2:])    # keep last two labels
+
+
+def _tidy_principal_values(s: pd.Series) -> pd.Series:
+    '''tidy_principal() as pandas string operations over non-null values.'''
+    return (s.str.lower()
+             .str.replace(r"[,.']", "", regex=True)
+             .str.replace(" inc", "", regex=False)
+             .str.strip()
+             .str.replace(r"\s+", " ", regex=True)
+             .str.title())
+
+
+def _root_domain_values(s: pd.Series) -> pd.Series:
+    '''root_domain() as pandas string operations over non-null values.'''
+    return (s.str.lower()
+             .str.replace(r"^www\d*\.", "", regex=True)
+             .str.split(".")
+             .str[-2:]
+             .str.join("."))
+
+
+def _registrable_values(s: pd.Series) -> pd.Series:
+    '''Public-Suffix-List registrable domain of each (distinct) value.'''
+    return pd.Series(default_trie().registrable_many(s.tolist()), index=s.index, dtype=object)
+
+
+def clean_unique(
+    col: pd.Series,
+    clean_values: Callable[[pd.Series], pd.Series],
+    na_value: str,
+    as_category: bool = True,
+) -> pd.Series:
+    '''
+    Factorize *col*, run *clean_values* once per distinct value and map the
+    results back through the integer codes. Nulls become *na_value*.
+    Values that clean to the same string share one category.
+    '''
+    codes, uniques = pd.factorize(col, use_na_sentinel=True)
+    # object dtype keeps Python's re / str semantics, so results match the scalar rules
+    cleaned = clean_values(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+
+    has_na = bool((codes < 0).any())
+    if has_na:
+        cleaned = np.append(cleaned, na_value)
+        codes = np.where(codes < 0, len(cleaned) - 1, codes)
+    final, categories = pd.factorize(cleaned)
+    values = pd.Categorical.from_codes(final[codes], categories=pd.Index(categories, dtype=object))
+
+    out = pd.Series(values, index=col.index, name=col.name)
+    return out if as_category else out.astype(object)
+
+
+def tidy_principals(col: pd.Series, as_category: bool = True) -> pd.Series:
+    '''Vectorized tidy_principal() over a whole column, cleaning each distinct name once.'''
+    return clean_unique(col, _tidy_principal_values, "Unknown", as_category)
+
+
+def root_domains(col: pd.Series, as_category: bool = True, psl: bool = False) -> pd.Series:
+    '''
+    Vectorized root_domain() over a whole column, cleaning each distinct domain once.
+    With *psl* the registrable domain comes from the bundled Public Suffix List
+    (so foo.co.uk and bar.co.uk stay apart) instead of the last two labels.
+    '''
+    return clean_unique(col, _registrable_values if psl else _root_domain_values, "unknown", as_category)
+
+
+# -------- process pool -------------------------------------------------------
+# Flattening and cleaning are pure Python per notice / per distinct value, so
+# they scale across cores rather than threads. The parent only parses the JSON
+# and cuts the notices into shards; workers return compact column frames
+# (Arrow strings + categoricals) that are merged in submission order.
+
+CLEANED_COLUMNS = {                     # cleaned column -> (raw column, value for nulls)
+    "principal_clean": ("principal", "Unknown"),
+    "root_domain":     ("domain", "unknown"),
+}
+
+
+def flatten_clean_shard(notices: Iterable[dict], psl: bool = False) -> pd.DataFrame:
+    '''
+    Flatten notices and add principal_clean / root_domain - the serial path
+    (flatten_frame + tidy_principals / root_domains). Runs in the worker
+    processes of flatten_clean_parallel(), one shard at a time.
+    '''
+    df = flatten_frame(notices)
+    df["principal_clean"] = tidy_principals(df["principal"])
+    df["root_domain"] = root_domains(df["domain"], psl=psl)
+    return df
+
+
+def merge_shards(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    '''
+    Concatenate shard frames in order into the frame flatten_clean_shard()
+    would have built from all notices at once - same values, dtypes and
+    category order - so the CSV / Parquet output is byte-identical. Pooled
+    columns already are: each shard's pool lists values by first appearance
+    among its notices (used by a row or not), and concat_frames() unions them
+    in shard order. The cleaned columns are reordered below.
+    '''
+    if len(frames) <= 1:
+        return frames[0] if frames else flatten_clean_shard([])
+    df = concat_frames(frames)
+    for col, (raw, na_value) in CLEANED_COLUMNS.items():
+        df[col] = _serial_category_order(df[col].array, df[raw].isna().to_numpy(), na_value)
+    return df
+
+
+def concat_frames(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    '''
+    pd.concat() that keeps categorical columns categorical when the frames'
+    categories differ (plain concat falls back to object strings): the
+    categories are unioned, in order of first appearance, keeping the first
+    frame's categories dtype (union_categoricals() may infer another).
+    '''
+    if len(frames) == 1:
+        return frames[0]
+    cats = [c for c in frames[0].columns
+            if all(isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames if c in f)]
+    df = pd.concat([f.drop(columns=cats) for f in frames], ignore_index=True)
+    for col in cats:
+        values = union_categoricals([f[col].array for f in frames])
+        categories = pd.Index(values.categories, dtype=frames[0][col].cat.categories.dtype)
+        df[col] = pd.Categorical.from_codes(values.codes, categories=categories)
+    return df[list(frames[0].columns)]
+
+
+def _serial_category_order(values: pd.Categorical, null: np.ndarray, na_value: str) -> pd.Categorical:
+    '''
+    Categories as one serial pass orders them over the whole column: first
+    appearance among rows with a raw value, then *na_value* for the nulls
+    (clean_unique()).
+    '''
+    order = list(values.categories[pd.unique(values.codes[~null])])
+    if null.any() and na_value not in order:
+        order.append(na_value)
+    return values.reorder_categories(pd.Index(order, dtype=object))
+
+
+def _shards(notices: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    shard = []
+    for notice in notices:
+        shard.append(notice)
+        if len(shard) >= size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+def flatten_clean_parallel(
+    notices: Iterable[dict],
+    processes: int,
+    psl: bool = False,
+    shard_notices: int = SHARD_NOTICES,
+) -> pd.DataFrame:
+    '''
+    flatten_clean_shard() over all *notices*, sharded across *processes*
+    worker processes. At most two shards per worker are in flight, so memory
+    stays bounded while the notices are still streaming in. The result is
+    identical to the serial path; processes <= 1 runs it in this process.
+    Workers are started with forkserver / spawn, never fork, since the
+    pipeline runs on a thread next to Streamlit's own.
+    '''
+    if processes <= 1:
+        return flatten_clean_shard(notices, psl)
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    frames, pending = [], deque()
+    with ProcessPoolExecutor(processes, mp_context=ctx) as pool:
+        for shard in _shards(notices, shard_notices):
+            pending.append(pool.submit(flatten_clean_shard, shard, psl))
+            if len(pending) >= 2 * processes:
+                frames.append(pending.popleft().result())
+        frames.extend(f.result() for f in pending)
+    return merge_shards(frames)
+
+
+# -------- columnar output ----------------------------------------------------
+
+def write_columnar(
+    df: pd.DataFrame,
+    out: str | Path | io.IOBase,
+    fmt: str = "parquet",
+    compression: str = "zstd",
+    row_group_rows: int = ROW_GROUP_ROWS,
+) -> None:
+    '''
+    Write the flattened frame as Parquet or Arrow IPC (file format), streamed
+    in row groups / record batches of *row_group_rows*. DICT_COLUMNS are
+    dictionary-encoded and the output is compressed (zstd by default).
+    *out* may be a path or a binary file object.
+    '''
+    import pyarrow as pa                  # optional - only needed for columnar output
+    import pyarrow.parquet as pq
+
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format {fmt!r} - use one of {list(COLUMNAR_FORMATS)}")
+    # one categorical per column, so every batch shares the same dictionary
+    df = df.astype({c: "category" for c in DICT_COLUMNS
+                    if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype)})
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):    # object text columns (pandas < 3) infer nothing from no rows
+            schema = schema.set(i, field.with_type(pa.string()))
+    sink = str(out) if isinstance(out, Path) else out
+
+    def batches():
+        # one chunk per column, so the file layout (e.g. where Parquet falls back from
+        # dictionary to plain pages) depends on the rows only, not on how they were built
+        for start in range(0, len(df), row_group_rows):
+            yield pa.Table.from_pandas(df.iloc[start:start + row_group_rows],
+                                       schema=schema, preserve_index=False).combine_chunks()
+
+    if fmt == "parquet":
+        with pq.ParquetWriter(sink, schema, compression=compression, use_dictionary=True) as w:
+            for tbl in batches():
+                w.write_table(tbl, row_group_size=row_group_rows)
+    else:
+        opts = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(sink, schema, options=opts) as w:
+            for tbl in batches():
+                w.write_table(tbl, max_chunksize=row_group_rows)
+
+
+def read_columnar(path: str | Path, columns: Sequence[str] | None = None) -> pd.DataFrame:
+    '''Load a file written by write_columnar() - only *columns*, if given; the format follows the suffix.'''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    if path.suffix == COLUMNAR_FORMATS["arrow"][0]:
+        with pa.memory_map(str(path)) as src:
+            table = pa.ipc.open_file(src).read_all()
+            return (table.select(list(columns)) if columns else table).to_pandas()
+    return pq.read_table(path, columns=list(columns) if columns else None).to_pandas()
+
+
+def columnar_bytes(df: pd.DataFrame, fmt: str = "parquet") -> bytes:
+    '''write_columnar() into memory, e.g. for st.download_button.'''
+    buf = io.BytesIO()
+    write_columnar(df, buf, fmt)
+    return buf.getvalue()
+
+
+def format_report(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Write *df* as CSV, Parquet and Arrow IPC into a temporary directory and
+    read each back. Returns file size and write / read times per format.
+    '''
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, suffix in [("csv", ".csv")] + [(f, s) for f, (s, _) in COLUMNAR_FORMATS.items()]:
+            path = Path(tmp) / f"flat{suffix}"
+            t0 = time.perf_counter()
+            if fmt == "csv":
+                df.to_csv(path, index=False, encoding="utf-8")
+            else:
+                write_columnar(df, path, fmt)
+            t1 = time.perf_counter()
+            if fmt == "csv":
+                pd.read_csv(path)
+            else:
+                read_columnar(path)
+            t2 = time.perf_counter()
+            rows.append({"format": fmt, "size_mb": path.stat().st_size / 2**20,
+                         "write_s": t1 - t0, "read_s": t2 - t1})
+    return pd.DataFrame(rows).set_index("format")
+
+
+# -------- streaming CSV output -----------------------------------------------
+
+def batches_from_rows(
+    rows: Iterable[Mapping],
+    columns: Sequence[str],
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> Iterator[dict[str, list]]:
+    '''Group an iterator of row dicts into column batches of *chunk_rows* rows.'''
+    batch = {c: [] for c in columns}
+    n = 0
+    for row in rows:
+        for c in columns:
+            batch[c].append(row.get(c))
+        n += 1
+        if n == chunk_rows:
+            yield batch
+            batch = {c: [] for c in columns}
+            n = 0
+    if n:
+        yield batch
+
+
+def _compressor(compression: str | None):
+    '''Object with compress() / flush() for *compression*, or None for plain text.'''
+    if compression is None:
+        return None
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)       # wbits=31 → gzip container
+    if compression == "zstd":
+        try:
+            import zstandard                                 # optional dependency
+        except ImportError as exc:
+            raise ImportError("zstd compression needs the 'zstandard' package") from exc
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unknown compression {compression!r} - use None, 'gzip' or 'zstd'")
+
+
+def iter_csv_bytes(
+    batches: Iterable[pd.DataFrame | Mapping[str, list]],
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    compression: str | None = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    header: bool = True,
+) -> Iterator[bytes]:
+    '''
+    Encode column batches (DataFrames or {column: list}) as UTF-8 CSV, at most
+    *chunk_rows* rows at a time, optionally gzip / zstd compressed.
+    The schema is fixed up front: the header is *columns*, written even when
+    there are no rows (unless header=False), and a batch missing one of them
+    raises ValueError.
+    '''
+    comp = _compressor(compression)
+
+    def emit(text: str) -> bytes:
+        raw = text.encode("utf-8")
+        return comp.compress(raw) if comp else raw
+
+    if header:
+        head = io.StringIO()
+        csv.writer(head).writerow(columns)             # "\r\n" line ends, as csv.DictWriter wrote them
+        yield emit(head.getvalue())
+
+    for batch in batches:
+        missing = [c for c in columns if c not in batch]
+        if missing:
+            raise ValueError(f"Batch is missing CSV columns {missing}")
+        frame = batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(batch, columns=list(columns))
+        for start in range(0, len(frame), chunk_rows):
+            chunk = frame.iloc[start:start + chunk_rows][list(columns)]
+            piece = emit(chunk.to_csv(header=False, index=False, lineterminator="\r\n"))
+            if piece:
+                yield piece
+
+    if comp:
+        yield comp.flush()
+
+
+def write_csv_stream(
+    batches: Iterable[pd.DataFrame | Mapping[str, list]],
+    out_path: Path,
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    compression: str | None = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    append: bool = False,
+) -> int:
+    '''
+    Stream iter_csv_bytes() to *out_path*; memory stays at one chunk however
+    large the dataset. Returns the number of bytes written.
+    With append=True rows are added to an existing file and the header is only
+    written if the file is new or empty (gzip / zstd output then becomes a
+    multi-member / multi-frame stream, which both formats allow).
+    '''
+    out_path = Path(out_path)
+    header = not (append and out_path.exists() and out_path.stat().st_size > 0)
+    written = 0
+    with out_path.open("ab" if append else "wb") as f:
+        for piece in iter_csv_bytes(batches, columns, compression, chunk_rows, header):
+            f.write(piece)
+            written += len(piece)
+    return written
+
+
+def csv_bytes(
+    batches: Iterable[pd.DataFrame | Mapping[str, list]],
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    compression: str | None = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> bytes:
+    '''
+    CSV export for consumers that need one bytes object (st.download_button).
+    Chunks are spooled through a temporary file, so no full-size str or
+    intermediate copy is built - only the (compressed) result.
+    '''
+    with tempfile.TemporaryFile() as f:
+        for piece in iter_csv_bytes(batches, columns, compression, chunk_rows):
+            f.write(piece)
+        f.seek(0)
+        return f.read()
+
+
+def csv_zip_bytes(
+    batches: Iterable[pd.DataFrame | Mapping[str, list]],
+    member: str,
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> bytes:
+    '''csv_bytes() as the only file, *member*, of a deflated .zip archive (opens anywhere without tools).'''
+    with tempfile.TemporaryFile() as f:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf, zf.open(member, "w", force_zip64=True) as out:
+            for piece in iter_csv_bytes(batches, columns, None, chunk_rows):
+                out.write(piece)
+        f.seek(0)
+        return f.read()
+
+
+# -------- cache keys ---------------------------------------------------------
+
+def source_fingerprint(src: str | Path, cache: HttpCache | None = None) -> str:
+    '''
+    Identity of an input, for keying cached pipeline results:
+      • URL  - the download URL plus the ETag / Last-Modified of its entry in
+               *cache* (the shared HttpCache by default). The entry is fetched
+               the way a read would be - no request while fresh, revalidated in
+               the background while stale, a conditional GET after that - so
+               the body the key names is the one the run then reads. If the
+               server sends neither validator (or cannot be reached) the key
+               changes every UNVERSIONED_TTL_S instead
+      • file - resolved path, size and mtime
+    '''
+    src_str = str(src)
+    if src_str.startswith(("http://", "https://")):
+        url = drive_download_url(src_str)
+        try:
+            entry = (cache or default_cache()).fetch(url)
+            version = [entry.etag or "", entry.last_modified or ""]
+        except (requests.RequestException, OSError):
+            version = []
+        if not any(version):
+            version = [f"t{int(time.time() // UNVERSIONED_TTL_S)}"]
+        return "|".join([url, *version])
+
+    path = Path(src_str).resolve()
+    info = path.stat()
+    return f"{path}|{info.st_size}|{info.st_mtime_ns}"
+
+
+def cleaning_fingerprint(psl: bool = False) -> str:
+    '''
+    Hash of the principal / domain cleaning rules - the source of the cleaning
+    helpers plus, with *psl*, the bundled Public Suffix List - so cached
+    cleaned columns are dropped whenever a rule changes.
+    '''
+    h = hashlib.sha1()
+    for fn in (tidy_principal, root_domain, _tidy_principal_values, _root_domain_values,
+               _registrable_values, clean_unique):
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    if psl:
+        h.update(PSL_PATH.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def config_hash(**settings) -> str:
+    '''Short stable hash of keyword settings (anything without a JSON form goes by repr()).'''
+    blob = json.dumps(settings, sort_keys=True, default=repr)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,133 @@
+# notice_store.py - persisted flattened store for incremental Assignment 1 runs
+#
+# Keeps a high-water mark per input source of the notices already processed,
+# the flattened / enriched rows as append-only Parquet parts and the saved
+# SummaryState, so a run only has to handle notices that arrived since the
+# previous one.
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+from notice_pipeline import concat_frames, read_columnar, write_columnar
+from summaries import SummaryState
+
+# -------- CONFIG -------------------------------------------------------------
+STORE_DIR  = Path("notice_store")
+STATE_FILE = "state.json"
+# -----------------------------------------------------------------------------
+
+
+class NoticeStore:
+    '''
+    Directory holding part-NNNNN.parquet files plus state.json with
+      • a watermark per input source - max notice_id and max date_sent
+        processed so far from it, so a source added later (a new daily dump
+        with lower ids) is read in full,
+      • the list of committed parts, and
+      • the aggregate SummaryState over every stored row, and
+      • the fingerprint of the source last read and the config hash the rows
+        were built with.
+    state.json is replaced atomically after a part is written, so a crash
+    mid-run leaves the previous state intact. Opening the store with a
+    different *config* discards it, since the stored IPs / cleaned names
+    would no longer match what a fresh run produces. *sketch* sets up the
+    summary state of a new store (see SummaryState).
+    '''
+
+    def __init__(self, root: str | Path = STORE_DIR, config: str | None = None,
+                 sketch: dict | None = None):
+        self.root = Path(root)
+        self._state_path = self.root / STATE_FILE
+        state = json.loads(self._state_path.read_text()) if self._state_path.exists() else {}
+        if state and state.get("config") != config:
+            for name in state.get("parts", []):
+                (self.root / name).unlink(missing_ok=True)
+            state = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.config = config
+        self.source: str | None = state.get("source")
+        # source -> [max notice_id, max date_sent]
+        self.watermarks: dict[str, list] = state.get("watermarks", {})
+        self.parts: list[str] = state.get("parts", [])
+        self.summary = SummaryState.from_dict(state.get("summary", {}), sketch)
+        self._seen = {src: list(mark) for src, mark in self.watermarks.items()}
+
+    # ---- watermark --------------------------------------------------------
+
+    def is_new(self, notice: dict, source: str = "") -> bool:
+        '''
+        A notice is new if its id is above the max notice_id stored for
+        *source*. Notices without an id fall back to date_sent compared with
+        the stored max.
+        '''
+        max_id, max_date = self.watermarks.get(source, (None, None))
+        nid = notice.get("id")
+        if nid is not None:
+            return max_id is None or nid > max_id
+        date = notice.get("date_sent")
+        return date is not None and (max_date is None or date > max_date)
+
+    def new_notices(self, notices: Iterable[dict], source: str = "") -> Iterator[dict]:
+        '''
+        Yield only notices beyond *source*'s watermark, tracking its new
+        maxima as they pass. Sources may be read concurrently, one thread each.
+        '''
+        seen = self._seen.setdefault(source, [None, None])
+        for notice in notices:
+            if not self.is_new(notice, source):
+                continue
+            nid, date = notice.get("id"), notice.get("date_sent")
+            if nid is not None and (seen[0] is None or nid > seen[0]):
+                seen[0] = nid
+            if date is not None and (seen[1] is None or date > seen[1]):
+                seen[1] = date
+            yield notice
+
+    # ---- data -------------------------------------------------------------
+
+    def append(self, df: pd.DataFrame, source: str | None = None) -> SummaryState:
+        '''
+        Persist the new rows as one more part, merge their aggregates into the
+        saved summary and advance the watermark. *source* is the fingerprint
+        of the input they were read from. Returns the merged summary.
+        '''
+        if not df.empty:
+            name = f"part-{len(self.parts):05d}.parquet"
+            write_columnar(df, self.root / name, "parquet")
+            self.parts.append(name)
+            self.summary.merge(SummaryState.from_frame(df, self.summary.sketch))
+        self.watermarks = {src: list(mark) for src, mark in self._seen.items()}
+        self.source = source
+        self._save()
+        return self.summary
+
+    def stored_ids(self) -> set:
+        '''The notice ids of every stored row.'''
+        ids: set = set()
+        for p in self.parts:
+            ids.update(read_columnar(self.root / p, ["notice_id"])["notice_id"].dropna().tolist())
+        return ids
+
+    def load_frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        '''Every stored row, oldest part first.'''
+        frames = [read_columnar(self.root / p) for p in self.parts]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = concat_frames(frames)           # categoricals stay categorical across parts
+        return df[columns] if columns else df
+
+    def _save(self) -> None:
+        state = {
+            "config":        self.config,
+            "source":        self.source,
+            "watermarks":    self.watermarks,
+            "parts":         self.parts,
+            "summary":       self.summary.to_dict(),
+        }
+        tmp = self._state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self._state_path)
@@ -0,0 +1,176 @@
+# pipeline_job.py - run the Assignment 1 pipeline off the Streamlit script thread
+#
+# A PipelineJob owns a daemon thread that runs the pipeline. The thread reports
+# per-stage progress and hands over partial results as soon as they exist; the
+# script re-renders from job.snapshot() on every rerun, so the job survives
+# reruns and the page fills in while the pipeline is still working.
+# A StageCache memoises the job's stage results across jobs - st.cache_data
+# needs the script thread's ScriptRunContext, which the job's thread lacks.
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Iterable, Iterator
+
+from profiler import NULL_PROFILER, NullProfiler, Profiler
+
+
+@dataclass
+class StageProgress:
+    '''Progress of one pipeline stage, e.g. 12,000 / 40,000 domains.'''
+    label: str
+    done: int = 0
+    total: int | None = None
+    unit: str = ""
+    finished: bool = False
+
+    @property
+    def fraction(self) -> float | None:
+        '''Share completed, or None while the total is unknown.'''
+        if self.finished:
+            return 1.0
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    def __str__(self) -> str:
+        if not (self.done or self.total or self.unit):          # a stage without a counter
+            return self.label + (" ✓" if self.finished else "…")
+        count = f"{self.done:,}" + (f" / {self.total:,}" if self.total else "")
+        state = " ✓" if self.finished else ""
+        return f"{self.label}: {count} {self.unit}{state}"
+
+
+class PipelineJob:
+    '''
+    Runs *target(job)* on a daemon thread and collects what it reports:
+      • job.stage() / job.advance() / job.finish() - per-stage progress
+      • job.track()                                - progress while iterating
+      • job.publish(key, value)                    - a partial or final result
+      • job.log(message)                           - a status line for the page
+    The script reads everything back through snapshot(). An exception in the
+    target ends the job and is kept in job.error.
+    With a *profiler* the target runs under its cProfile and can time its
+    stages with job.profiler.stage(); by default that is a no-op until
+    attach_profiler() is called.
+    '''
+
+    def __init__(self, target: Callable[["PipelineJob"], None],
+                 profiler: Profiler | NullProfiler = NULL_PROFILER):
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._stages: dict[str, StageProgress] = {}
+        self._results: dict[str, Any] = {}
+        self._log: list[str] = []
+        self.error: BaseException | None = None
+        self.started = time.monotonic()
+        self.first_result_s: float | None = None   # time to first published result
+        self.ended: float | None = None
+        self._thread = threading.Thread(target=self._run, args=(target,),
+                                        name="pipeline-job", daemon=True)
+        self._thread.start()
+
+    def _run(self, target: Callable[["PipelineJob"], None]) -> None:
+        try:
+            self.profiler.run(target, self)
+        except BaseException as exc:        # surfaced on the page, not in the thread
+            self.error = exc
+        finally:
+            self.ended = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.ended or time.monotonic()) - self.started
+
+    # ---- called from the pipeline thread ----------------------------------
+
+    def stage(self, name: str, label: str, total: int | None = None, unit: str = "") -> None:
+        with self._lock:
+            self._stages[name] = StageProgress(label, total=total, unit=unit)
+
+    def advance(self, name: str, done: int, total: int | None = None) -> None:
+        '''Set the absolute progress of a stage (and its total, once known).'''
+        with self._lock:
+            s = self._stages[name]
+            s.done = done
+            if total is not None:
+                s.total = total
+
+    def finish(self, name: str) -> None:
+        with self._lock:
+            self._stages[name].finished = True
+
+    def track(self, name: str, items: Iterable, every: int = 1000) -> Iterator:
+        '''Pass *items* through, advancing stage *name* every *every* items.'''
+        n = 0
+        for n, item in enumerate(items, 1):
+            if n % every == 0:
+                self.advance(name, n)
+            yield item
+        self.advance(name, n)
+
+    def publish(self, key: str, value: Any) -> None:
+        '''Hand a result to the page. Published objects must not be mutated afterwards.'''
+        with self._lock:
+            self._results[key] = value
+            if self.first_result_s is None:
+                self.first_result_s = time.monotonic() - self.started
+
+    def log(self, message: str) -> None:
+        with self._lock:
+            self._log.append(message)
+
+    # ---- called from the script -------------------------------------------
+
+    def attach_profiler(self) -> Profiler:
+        '''
+        The job's Profiler, created now if the job started without one. The
+        target looks job.profiler up per stage, so stages entered from here on
+        are timed; cProfile data only exists for jobs started with a profiler.
+        '''
+        with self._lock:
+            if not self.profiler.enabled:
+                self.profiler = Profiler()
+            return self.profiler
+
+    def snapshot(self) -> tuple[list[StageProgress], dict[str, Any], list[str]]:
+        '''Consistent copies of the stages, results and log lines.'''
+        with self._lock:
+            return ([replace(s) for s in self._stages.values()],
+                    dict(self._results), list(self._log))
+
+
+class StageCache:
+    '''
+    Results of pipeline stages, memoised by a key that stands for their
+    inputs (source fingerprint, config hashes) - plain Python, so the job's
+    thread can use it. Keeps the *max_entries* most recently used results per
+    stage. Results are handed out as stored: callers must not mutate them
+    (add columns to a shallow copy instead). Two jobs computing the same key
+    at once both compute it; the later result is kept.
+    '''
+
+    def __init__(self, max_entries: int = 2):
+        self.max_entries = max_entries
+        self._stages: dict[str, OrderedDict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, stage: str, key: tuple, compute: Callable[[], Any]) -> Any:
+        '''The result of *stage* for *key*, calling *compute()* on a miss.'''
+        with self._lock:
+            entries = self._stages.setdefault(stage, OrderedDict())
+            if key in entries:
+                entries.move_to_end(key)
+                return entries[key]
+        value = compute()
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return value
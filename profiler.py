@@ -0,0 +1,230 @@
+# profiler.py - opt-in per-stage profiling for the Streamlit pages
+#
+# Off by default: pages get NULL_PROFILER, whose stage() hands back one shared
+# no-op context manager and whose iterate() returns the iterable untouched, so
+# instrumented code costs a method call per stage when profiling is off.
+# On, a Profiler records per stage the wall time (exclusive of nested stages),
+# the number of entries and the peak tracemalloc-traced memory while the stage
+# was running, plus cProfile data that can be downloaded as a pstats dump.
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator
+
+import pandas as pd
+
+STAGES = ("download", "parse", "flatten", "dns", "clean", "aggregate", "render", "export")
+
+_NULL_STAGE = nullcontext()
+_tracing_owner = False                  # True while tracemalloc runs because a Profiler started it
+_tracing_sessions = weakref.WeakSet()   # SessionTokens of the sessions profiling now
+_tracing_lock = threading.Lock()
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    calls: int = 0
+    peak_bytes: int = 0
+
+
+class NullProfiler:
+    '''Stand-in used while profiling is off - every hook is a no-op.'''
+
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def iterate(self, name: str, items: Iterable) -> Iterable:
+        return items
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return fn(*args, **kwargs)
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class SessionToken:
+    '''
+    Stands for one browser session in start_tracing() / stop_tracing(). Keep
+    it in the session's state: a session that goes away while profiling drops
+    its token with it, so it cannot keep tracemalloc running.
+    '''
+
+    __slots__ = ("__weakref__",)
+
+
+class Profiler:
+    '''
+    Collects per-stage wall time and memory, and cProfile data, for one rerun
+    (or one background pipeline job - see include()).
+
+      with prof.stage("dns"): ...          - time a block
+      prof.iterate("parse", items)         - time spent producing each item
+      prof.run(fn, *args)                  - call fn under cProfile
+
+    Stages nest: time inside an inner stage is not counted for the outer one,
+    so a streamed download → parse → flatten splits cleanly. Stage stacks are
+    per thread, but tracemalloc is process-wide, so peaks of stages running on
+    different threads at the same moment include each other's allocations.
+    '''
+
+    enabled = True
+
+    def __init__(self):
+        self.stats: dict[str, StageStats] = {}
+        self.profiles: list[cProfile.Profile] = []
+        self.included: list["Profiler"] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ---- tracemalloc ------------------------------------------------------
+
+    @staticmethod
+    def start_tracing(session: SessionToken) -> None:
+        '''Start tracemalloc (if nothing traces yet) for as long as *session* profiles.'''
+        global _tracing_owner
+        with _tracing_lock:
+            _tracing_sessions.add(session)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing_owner = True
+
+    @staticmethod
+    def stop_tracing(session: SessionToken) -> None:
+        '''
+        *session* no longer profiles. tracemalloc is process-wide, so it is
+        stopped - if a Profiler started it - only once no session profiles;
+        then turning profiling off costs nothing.
+        '''
+        global _tracing_owner
+        with _tracing_lock:
+            _tracing_sessions.discard(session)
+            if _tracing_owner and not _tracing_sessions:
+                tracemalloc.stop()
+                _tracing_owner = False
+
+    # ---- stages -----------------------------------------------------------
+
+    def _charge(self, name: str, seconds: float, entered: bool) -> None:
+        peak = 0
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        with self._lock:
+            s = self.stats.setdefault(name, StageStats())
+            s.seconds += seconds
+            s.calls += entered
+            s.peak_bytes = max(s.peak_bytes, peak)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:                           # pause the enclosing stage
+            outer = stack[-1]
+            self._charge(outer[0], now - outer[1], False)
+        elif tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            name, resumed = stack.pop()
+            now = time.perf_counter()
+            self._charge(name, now - resumed, True)
+            if stack:
+                stack[-1][1] = now          # the enclosing stage resumes
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        '''Pass *items* through, charging the time spent producing each one to stage *name*.'''
+        it = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    # ---- cProfile ---------------------------------------------------------
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        '''
+        Call *fn* under cProfile on the current thread and keep the profile.
+        If another profiler is already active (Python 3.12+ allows only one
+        per interpreter) fn runs unprofiled; stage times are still recorded.
+        '''
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            with self._lock:
+                self.profiles.append(prof)
+
+    # ---- report -----------------------------------------------------------
+
+    def include(self, other: "Profiler") -> None:
+        '''Report *other* (e.g. the background pipeline job's profiler) together with this one.'''
+        if other is not self and other not in self.included:
+            self.included.append(other)
+
+    def _all(self) -> list["Profiler"]:
+        return [self, *self.included]
+
+    def table(self) -> pd.DataFrame:
+        '''Per-stage wall time, entries and peak traced memory, pipeline order first.'''
+        merged: dict[str, StageStats] = {}
+        for p in self._all():
+            with p._lock:
+                for name, s in p.stats.items():
+                    m = merged.setdefault(name, StageStats())
+                    m.seconds += s.seconds
+                    m.calls += s.calls
+                    m.peak_bytes = max(m.peak_bytes, s.peak_bytes)
+        names = [n for n in STAGES if n in merged] + sorted(set(merged) - set(STAGES))
+        return pd.DataFrame(
+            {"wall time (s)":   [round(merged[n].seconds, 3) for n in names],
+             "entries":         [merged[n].calls for n in names],
+             "peak traced (MB)": [round(merged[n].peak_bytes / 2**20, 1) for n in names]},
+            index=pd.Index(names, name="stage"))
+
+    def _pstats(self, stream: io.StringIO | None = None) -> pstats.Stats | None:
+        profiles = [prof for p in self._all() for prof in p.profiles]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for prof in profiles[1:]:
+            stats.add(prof)
+        return stats
+
+    def pstats_bytes(self) -> bytes:
+        '''The merged cProfile data in pstats dump format (load with pstats.Stats(path) or snakeviz).'''
+        stats = self._pstats()
+        if stats is None:
+            return b""
+        return marshal.dumps(stats.stats)
+
+    def top_functions(self, n: int = 25) -> str:
+        '''The *n* functions with the highest cumulative time, as pstats prints them.'''
+        out = io.StringIO()
+        stats = self._pstats(out)
+        if stats is None:
+            return "No cProfile data recorded."
+        stats.sort_stats("cumulative").print_stats(n)
+        return out.getvalue()
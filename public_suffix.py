@@ -0,0 +1,131 @@
+# public_suffix.py - registrable-domain extraction for the Assignment 1 pipeline
+#
+# Uses the bundled, offline copy of the Public Suffix List
+# (public_suffix_list.dat, https://publicsuffix.org). The list is compiled
+# once per process into a trie keyed by labels right-to-left, so a look-up
+# walks at most as many nodes as the domain has labels.
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+# -------- CONFIG -------------------------------------------------------------
+PSL_PATH = Path(__file__).with_name("public_suffix_list.dat")
+# -----------------------------------------------------------------------------
+
+_WWW  = re.compile(r"^www\d*\.")
+_IPV4 = re.compile(r"\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+class _Node:
+    __slots__ = ("children", "rule", "exceptions")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.rule = False                   # a suffix rule ends at this node
+        self.exceptions: set[str] = set()   # "!label" rules below this node
+
+
+class SuffixTrie:
+    '''
+    Reversed-label trie over the Public Suffix List rules (ICANN and private
+    sections). Implements the PSL algorithm: the longest matching rule wins,
+    exception rules beat wildcards, and an unlisted TLD is its own suffix.
+    '''
+
+    def __init__(self, rules: Iterable[str]):
+        self.root = _Node()
+        for rule in rules:
+            for form in _rule_forms(rule):
+                self._add(form)
+
+    @classmethod
+    def from_file(cls, path: str | Path = PSL_PATH) -> "SuffixTrie":
+        '''Compile a trie from a public_suffix_list.dat file.'''
+        with Path(path).open(encoding="utf-8") as f:
+            return cls(line.split()[0] for line in f if line.strip() and not line.startswith("//"))
+
+    def _add(self, rule: str) -> None:
+        exception = rule.startswith("!")
+        labels = rule.lstrip("!").split(".")[::-1]
+        node = self.root
+        for label in labels[:-1] if exception else labels:
+            node = node.children.setdefault(label, _Node())
+        if exception:
+            node.exceptions.add(labels[-1])
+        else:
+            node.rule = True
+
+    def suffix_length(self, labels: list[str]) -> int:
+        '''Number of trailing labels (given right-to-left) that form the public suffix.'''
+        length = 1                          # implicit "*" rule
+        node = self.root
+        for i, label in enumerate(labels):
+            if label in node.exceptions:
+                return i
+            child = node.children.get(label) or node.children.get("*")
+            if child is None:
+                break
+            node = child
+            if node.rule:
+                length = i + 1
+        return length
+
+    def registrable(self, domain: str) -> str:
+        '''
+        Registrable domain (public suffix + one label) of a host or URL netloc.
+        Credentials, ports, a trailing dot and a leading www./www2. are dropped.
+        IP literals and names that are themselves public suffixes come back as-is.
+        '''
+        host = domain.lower()
+        if "@" in host:
+            host = host.rpartition("@")[2]
+        if host.startswith("["):            # [IPv6]:port
+            return host.partition("]")[0] + "]"
+        if ":" in host:
+            host = host.partition(":")[0]
+        host = host.rstrip(".")
+        if host.startswith("www"):
+            host = _WWW.sub("", host)
+        if _IPV4.match(host):
+            return host
+        labels = host.split(".")
+        labels.reverse()
+        n = self.suffix_length(labels)
+        return ".".join(labels[n::-1]) if len(labels) > n else host
+
+    def registrable_many(self, domains: Iterable[str]) -> list[str]:
+        '''
+        Batch form of registrable(): each distinct domain is looked up once,
+        repeats are answered from a per-call memo.
+        '''
+        memo: dict[str, str] = {}
+        out = []
+        for d in domains:
+            r = memo.get(d)
+            if r is None:
+                r = memo[d] = self.registrable(d)
+            out.append(r)
+        return out
+
+
+def _rule_forms(rule: str) -> set[str]:
+    '''A rule as listed (Unicode) plus its punycode form, as URLs may use either.'''
+    rule = rule.lower()
+    bang = "!" if rule.startswith("!") else ""
+    forms = {rule}
+    try:
+        forms.add(bang + ".".join(
+            lbl if lbl.isascii() else lbl.encode("idna").decode("ascii")
+            for lbl in rule[len(bang):].split(".")
+        ))
+    except UnicodeError:
+        pass
+    return forms
+
+
+@lru_cache(maxsize=1)
+def default_trie() -> SuffixTrie:
+    '''The bundled list, compiled on first use and shared for the life of the process.'''
+    return SuffixTrie.from_file(PSL_PATH)
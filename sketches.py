@@ -0,0 +1,178 @@
+# sketches.py - bounded-memory, mergeable sketches for the Assignment 1 summaries
+#
+# MisraGries  - top-N / frequent values in at most `capacity` counters
+# HyperLogLog - distinct counts in 2**precision one-byte registers
+# Two sketches of the same size merge without extra error beyond their bounds,
+# so partial runs and shards can be combined, and both save to JSON-friendly state.
+
+import base64
+import heapq
+import math
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG -------------------------------------------------------------
+TOP_CAPACITY  = 1000                    # Misra-Gries counters per top-N summary
+DAY_CAPACITY  = 100                     # Misra-Gries counters per day in the per-day key rollups
+HLL_PRECISION = 8                       # 2**8 = 256 registers per HyperLogLog → ±6.5 %
+# -----------------------------------------------------------------------------
+
+
+class MisraGries:
+    '''
+    Frequent-values summary holding at most *capacity* counters (Misra-Gries,
+    in the mergeable form of Agarwal et al., "Mergeable Summaries", 2012).
+
+    Error bound: every reported count is a lower bound, short of the true
+    count by at most `error`, and error <= total / (capacity + 1) however the
+    data was split into batches or shards. A value whose true count is above
+    `error` is always present, so the top-N is exact whenever the N-th count
+    exceeds the (N+1)-th by more than `error`.
+    '''
+
+    def __init__(self, capacity: int = TOP_CAPACITY):
+        self.capacity = capacity
+        self.counts: dict[Any, int] = {}
+        self.total = 0                      # weight seen
+        self.error = 0                      # max undercount of any reported value
+
+    def update(self, counts: Mapping[Any, int]) -> None:
+        '''Add pre-aggregated counts (e.g. one batch's value_counts()).'''
+        for key, c in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + c
+            self.total += c
+        self._prune()
+
+    def merge(self, other: "MisraGries") -> None:
+        for key, c in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + c
+        self.total += other.total
+        self.error += other.error
+        self._prune()
+
+    def _prune(self) -> None:
+        '''Subtract the (capacity+1)-th largest count from all; keep what stays positive.'''
+        n = len(self.counts)
+        if n <= self.capacity:
+            return
+        values = np.fromiter(self.counts.values(), dtype=np.int64, count=n)
+        cut = int(np.partition(values, n - self.capacity - 1)[n - self.capacity - 1])
+        self.error += cut
+        self.counts = {k: c - cut for k, c in self.counts.items() if c > cut}
+
+    def top(self, n: int) -> list[tuple[Any, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+
+    def to_state(self) -> dict:
+        return {"capacity": self.capacity, "total": self.total, "error": self.error,
+                "counts": list(self.counts.items())}
+
+    @classmethod
+    def from_state(cls, state: Mapping) -> "MisraGries":
+        mg = cls(state["capacity"])
+        mg.total, mg.error = state["total"], state["error"]
+        mg.counts = dict(state["counts"])
+        return mg
+
+
+class HyperLogLog:
+    '''
+    Distinct-count estimator with m = 2**precision registers over 64-bit hashes
+    (Flajolet et al. 2007, with linear counting for small cardinalities).
+
+    Error bound: relative standard error ≈ 1.04 / sqrt(m) - ±6.5 % at
+    precision 8, ±3.3 % at 10, ±1.6 % at 12 (about 95 % of estimates fall
+    within twice that). Counts up to a few per cent of m are close to exact.
+    Registers stay sparse ({index: rank}) until m/4 of them are set, so a key
+    with a handful of distinct values costs a few entries rather than m bytes.
+    '''
+
+    __slots__ = ("precision", "sparse", "dense")
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.sparse: dict[int, int] | None = {}
+        self.dense: bytearray | None = None
+
+    @property
+    def m(self) -> int:
+        return 1 << self.precision
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        for i, r in zip(*register_ranks(hashes, self.precision)):
+            self.set_register(int(i), int(r))
+
+    def set_register(self, index: int, rank: int) -> None:
+        '''Raise register *index* to *rank* if it is lower.'''
+        if self.dense is not None:
+            if rank > self.dense[index]:
+                self.dense[index] = rank
+            return
+        if rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            if len(self.sparse) > self.m // 4:
+                self.dense = bytearray(self.m)
+                for i, r in self.sparse.items():
+                    self.dense[i] = r
+                self.sparse = None
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        items = other.sparse.items() if other.sparse is not None else enumerate(other.dense)
+        for i, r in items:
+            if r:
+                self.set_register(i, r)
+
+    def estimate(self) -> float:
+        m = self.m
+        if self.dense is not None:
+            regs = np.frombuffer(bytes(self.dense), dtype=np.uint8)
+            z = float(np.sum(np.ldexp(1.0, -regs.astype(np.int64))))
+            zeros = int(np.count_nonzero(regs == 0))
+        else:
+            zeros = m - len(self.sparse)
+            z = zeros + sum(2.0 ** -r for r in self.sparse.values())
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        e = alpha * m * m / z
+        if e <= 2.5 * m and zeros:
+            e = m * math.log(m / zeros)     # linear counting
+        return e
+
+    def to_state(self) -> list | str:
+        '''Sparse sketches as [[index, rank], ...], dense ones as base64 registers.'''
+        if self.dense is not None:
+            return base64.b64encode(bytes(self.dense)).decode("ascii")
+        return [[i, r] for i, r in self.sparse.items()]
+
+    @classmethod
+    def from_state(cls, state: list | str, precision: int) -> "HyperLogLog":
+        hll = cls(precision)
+        if isinstance(state, str):
+            hll.dense, hll.sparse = bytearray(base64.b64decode(state)), None
+        else:
+            hll.sparse = {i: r for i, r in state}
+        return hll
+
+
+def hash64(values: Iterable) -> np.ndarray:
+    '''Stable 64-bit hashes of values - identical in every process, so sketches built apart can merge.'''
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def register_ranks(hashes: np.ndarray, precision: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    HyperLogLog register index (top *precision* bits) and rank (position of the
+    first 1-bit in the next 32 bits, 33 if none) for each hash, vectorised.
+    '''
+    h = np.asarray(hashes, dtype=np.uint64)
+    index = (h >> np.uint64(64 - precision)).astype(np.int64)
+    w = ((h >> np.uint64(32 - precision)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    rank = np.full(len(h), 33, dtype=np.int64)
+    nz = w > 0
+    rank[nz] = 32 - np.floor(np.log2(w[nz])).astype(np.int64)
+    return index, rank
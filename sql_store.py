@@ -0,0 +1,194 @@
+# sql_store.py - indexed SQLite copy of the enriched rows, serving the Assignment 1 summaries
+#
+# Optional alternative to holding the page's summaries in memory: the flattened,
+# cleaned and enriched rows are bulk-loaded once (batched inserts in a single
+# transaction, indexes rebuilt after a full load) and every view the page shows
+# - top principals / root domains, daily / weekly / monthly volume, IPs hosting
+# the most distinct root domains, optionally over a date range - is answered by
+# one indexed SQL query. SqlStore has the same view methods as SummaryState, so
+# the page renders from either.
+
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from notice_pipeline import EXPORT_COLUMNS
+from summaries import NOT_FOUND, period_counts, utc_days
+
+# -------- CONFIG -------------------------------------------------------------
+SQL_PATH     = Path("notices.sqlite3")
+INSERT_BATCH = 50_000                   # rows per executemany() call
+SQL_SCHEMA   = 2                        # bump when the table layout changes - stored rows are dropped
+# -----------------------------------------------------------------------------
+
+STORED_COLUMNS = (*EXPORT_COLUMNS, "principal_clean", "root_domain")
+TABLE_COLUMNS = (*STORED_COLUMNS, "day")   # + UTC day of date_sent, "YYYY-MM-DD" (NULL if unparseable)
+INDEXES = {                             # multi-column ones cover the queries that use them
+    "notices_domain":          ("domain",),
+    "notices_root_domain":     ("root_domain",),
+    "notices_ip_root_domain":  ("ip_address", "root_domain"),
+    "notices_principal":       ("principal",),
+    "notices_principal_clean": ("principal_clean",),
+    "notices_day":             ("day", "principal_clean", "root_domain"),   # by day, and per day in a range
+}
+
+
+class SqlStore:
+    '''
+    The enriched rows in table `notices` of a SQLite file, with INDEXES, plus
+    the fingerprint of the source they were read from and the config hash
+    they were built with (table `meta`). Opening the store with a different
+    *config* (or SQL_SCHEMA) empties it, like NoticeStore. date_sent is stored
+    as the source's text, next to its UTC day as utc_days() - and so
+    SummaryState - reads it; daily counts, date ranges and the first / last
+    day are read off the index on that `day` column.
+    A connection is opened per call so the store can be used from any thread.
+    '''
+
+    approximate = False                     # exact counts - SummaryState's sketch mode has no effect here
+
+    def __init__(self, path: str | Path = SQL_PATH, config: str | None = None):
+        self.path = Path(path)
+        self.config = config
+        columns = ", ".join(f"{c} {'INTEGER' if c == 'notice_id' else 'TEXT'}" for c in TABLE_COLUMNS)
+        stamp = f"{SQL_SCHEMA}:{config}"
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode = WAL")    # readers keep going while a load runs
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            stored = con.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+            if stored is not None and stored[0] != stamp:
+                con.execute("DROP TABLE IF EXISTS notices")     # the layout may have changed too
+                con.execute("DELETE FROM meta")
+            con.execute(f"CREATE TABLE IF NOT EXISTS notices ({columns})")
+            self._create_indexes(con)
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (stamp,))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        '''A connection that commits (or rolls back) on exit, then closes.'''
+        with closing(sqlite3.connect(self.path, timeout=30)) as con, con:
+            yield con
+
+    @staticmethod
+    def _create_indexes(con: sqlite3.Connection) -> None:
+        for name, cols in INDEXES.items():
+            con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON notices ({', '.join(cols)})")
+
+    # ---- loading ----------------------------------------------------------
+
+    @property
+    def source(self) -> str | None:
+        '''Fingerprint of the input the stored rows were read from.'''
+        row = self._query("SELECT value FROM meta WHERE key = 'source'")
+        return row[0][0] if row else None
+
+    @property
+    def rows(self) -> int:
+        return self._query("SELECT COUNT(*) FROM notices")[0][0]
+
+    def load(self, df: pd.DataFrame, source: str | None = None, replace: bool = True) -> int:
+        '''
+        Bulk-load the rows of *df* (STORED_COLUMNS, plus the `day` derived from
+        date_sent) in a single transaction, INSERT_BATCH rows per executemany().
+        With *replace* they take the place of everything stored, and the indexes
+        are dropped for the load and rebuilt after it - cheaper than maintaining
+        them row by row; otherwise they are appended. *source* is recorded with
+        them. Returns rows loaded.
+        '''
+        marks = ", ".join("?" * len(TABLE_COLUMNS))
+        with self._connect() as con:
+            con.execute("PRAGMA synchronous = NORMAL")
+            con.execute("BEGIN")                # one transaction - DDL included
+            if replace:
+                con.execute("DELETE FROM notices")
+                for name in INDEXES:
+                    con.execute(f"DROP INDEX IF EXISTS {name}")
+            for start in range(0, len(df), INSERT_BATCH):
+                con.executemany(f"INSERT INTO notices VALUES ({marks})",
+                                _records(df.iloc[start:start + INSERT_BATCH]))
+            if replace:
+                self._create_indexes(con)
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+        with self._connect() as con:
+            con.execute("ANALYZE")              # lets the planner pick the covering indexes
+        return len(df)
+
+    # ---- views used by the Streamlit page ---------------------------------
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._connect() as con:
+            return con.execute(sql, params).fetchall()
+
+    def _top(self, column: str, n: int, start: date | None, end: date | None) -> pd.Series:
+        where, params = _date_range(start, end)
+        rows = self._query(f"SELECT {column}, COUNT(*) AS n FROM notices WHERE {column} IS NOT NULL{where}"
+                           f" GROUP BY {column} ORDER BY n DESC, {column} LIMIT ?", (*params, n))
+        return pd.Series([c for _, c in rows], index=pd.Index([k for k, _ in rows], name=column),
+                         name="count", dtype="int64")
+
+    def error_note(self) -> str:
+        return ""
+
+    def top_principals(self, n: int = 10, start: date | None = None, end: date | None = None) -> pd.Series:
+        return self._top("principal_clean", n, start, end)
+
+    def top_root_domains(self, n: int = 10, start: date | None = None, end: date | None = None) -> pd.Series:
+        return self._top("root_domain", n, start, end)
+
+    def date_span(self) -> tuple[date, date] | None:
+        '''First and last day with rows - two index look-ups.'''
+        # separate queries, or SQLite scans instead of seeking
+        first = self._query("SELECT MIN(day) FROM notices WHERE day IS NOT NULL")[0][0]
+        last = self._query("SELECT MAX(day) FROM notices WHERE day IS NOT NULL")[0][0]
+        if first is None:
+            return None
+        return date.fromisoformat(first), date.fromisoformat(last)
+
+    def daily(self, start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Rows per UTC day, oldest first, on a DatetimeIndex.'''
+        where, params = _date_range(start, end)
+        rows = self._query(f"SELECT day, COUNT(*) FROM notices WHERE day IS NOT NULL{where}"
+                           " GROUP BY day ORDER BY day", params)
+        return pd.Series([c for _, c in rows], index=pd.DatetimeIndex([d for d, _ in rows], name="day"),
+                         name="count", dtype="int64")
+
+    def trend(self, freq: str = "M", start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Rows per period ("D", "W", "M", ...), as SummaryState.trend().'''
+        return period_counts(self.daily(start, end), freq)
+
+    def monthly_trend(self) -> pd.Series:
+        return self.trend("M")
+
+    def ip_hosting(self, n: int = 10) -> pd.Series:
+        '''IPs hosting the most distinct root domains ('N/A' dropped after the top-n cut).'''
+        rows = self._query("SELECT ip_address, COUNT(DISTINCT root_domain) AS n FROM notices"
+                           " WHERE ip_address IS NOT NULL GROUP BY ip_address ORDER BY n DESC, ip_address"
+                           " LIMIT ?", (n,))
+        top = pd.Series([c for _, c in rows], index=pd.Index([ip for ip, _ in rows], name="ip_address"),
+                        name="root_domain", dtype="int64")
+        return top[top.index != NOT_FOUND]
+
+
+def _records(df: pd.DataFrame) -> Iterator[tuple]:
+    '''
+    Rows of *df* as tuples of plain Python values (None for missing),
+    followed by the UTC day of date_sent.
+    '''
+    columns = [df[c].astype(object).where(df[c].notna(), None).to_numpy() for c in STORED_COLUMNS]
+    days = utc_days(df["date_sent"])
+    columns.append(days.dt.strftime("%Y-%m-%d").astype(object).where(days.notna(), None).to_numpy())
+    return zip(*columns)
+
+
+def _date_range(start: date | None, end: date | None) -> tuple[str, tuple]:
+    '''WHERE-clause tail selecting the UTC days *start* to *end* (both included) on the day index.'''
+    where, params = "", ()
+    if start is not None:
+        where, params = where + " AND day >= ?", (*params, start.isoformat())
+    if end is not None:
+        where, params = where + " AND day <= ?", (*params, end.isoformat())
+    return where, params
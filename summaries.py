@@ -0,0 +1,463 @@
+# summaries.py - single-pass, mergeable aggregation engine for the Assignment 1 summaries
+#
+# Every summary the page shows (top principals / domains / recipients, monthly
+# volume, distinct root domains per IP) is declared once in
+# default_aggregates(). SummaryState feeds each column batch to all of them
+# together, so the rows are scanned once however many summaries there are, and
+# because every aggregate can be merged and saved as JSON the same state works
+# for streaming, incremental and sharded runs.
+# With a *sketch* configuration the top-N and per-IP distinct counts use the
+# bounded-memory sketches from sketches.py instead of exact counters / sets.
+# Per-day rollups (rows per day, per day × principal and per day × root domain)
+# back the trend charts and any date-range view, so those never rescan rows;
+# in sketch mode the per-day key rollups are one small Misra-Gries per day.
+
+from collections import Counter
+from datetime import date
+from typing import Any, Iterable, Iterator, Mapping, Protocol
+
+import numpy as np
+import pandas as pd
+
+from sketches import (DAY_CAPACITY, HLL_PRECISION, TOP_CAPACITY, HyperLogLog, MisraGries, hash64,
+                      register_ranks)
+
+NOT_FOUND = "N/A"
+SUMMARY_VERSION = 3                     # bump when aggregates change, so saved states are rebuilt
+
+Batch = pd.DataFrame | Mapping[str, list]   # a DataFrame or {column: list}
+
+
+class Aggregate(Protocol):
+    columns: tuple[str, ...]                # the batch columns it reads
+
+    def update(self, batch: Batch) -> None: ...
+    def merge(self, other: "Aggregate") -> None: ...
+    def to_state(self) -> Any: ...
+    def load(self, state: Any) -> None: ...
+
+
+class TopCounts:
+    '''Exact count per distinct value of one column; top-N is read off at the end.'''
+
+    def __init__(self, column: str, dropna: bool = True):
+        self.columns = (column,)
+        self.dropna = dropna
+        self.counts: Counter = Counter()
+
+    def update(self, batch: Batch) -> None:
+        self.counts.update(_counts(_column(batch, self.columns[0]), self.dropna))
+
+    def merge(self, other: "TopCounts") -> None:
+        self.counts.update(other.counts)
+
+    def top(self, n: int) -> list[tuple[Any, int]]:
+        return self.counts.most_common(n)
+
+    def to_state(self) -> list:
+        return list(self.counts.items())    # pairs, so a None key survives JSON
+
+    def load(self, state: Any) -> None:
+        self.counts = Counter(dict(state))  # pairs, or a {value: count} dict
+
+
+class DayCounts(TopCounts):
+    '''Rows per UTC calendar day ("YYYY-MM-DD") of a timestamp column.'''
+
+    def update(self, batch: Batch) -> None:
+        days = utc_days(_column(batch, self.columns[0]))
+        self.counts.update({str(d.date()): n for d, n in _counts(days, dropna=True).items()})
+
+    def series(self) -> pd.Series:
+        '''Rows per day, oldest first, on a DatetimeIndex.'''
+        s = pd.Series(dict(self.counts), dtype="int64", name="count")
+        s.index = pd.DatetimeIndex(s.index, name="day")
+        return s.sort_index()
+
+
+class DayKeyCounts:
+    '''
+    Rollup of rows per (UTC day, *key* value), e.g. per day × principal. Any
+    date range is answered from it: the pairs are kept sorted by day, so a
+    range is a binary search plus a group-by over that slice of the rollup.
+    '''
+
+    def __init__(self, day: str, key: str):
+        self.columns = (day, key)
+        self.counts: Counter = Counter()
+        self._frame: pd.DataFrame | None = None     # sorted view, rebuilt after changes
+
+    def update(self, batch: Batch) -> None:
+        for day, key, n in _day_key_counts(batch, *self.columns):
+            self.counts[day, key] += n
+        self._frame = None
+
+    def merge(self, other: "DayKeyCounts") -> None:
+        self.counts.update(other.counts)
+        self._frame = None
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            keys = list(self.counts)
+            self._frame = pd.DataFrame({
+                "day":   pd.to_datetime([d for d, _ in keys], format="%Y-%m-%d"),
+                "key":   pd.Series([k for _, k in keys], dtype=object),
+                "count": np.fromiter(self.counts.values(), dtype=np.int64, count=len(keys)),
+            }).sort_values("day", kind="stable", ignore_index=True)
+        return self._frame
+
+    def between(self, start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Rows per key from *start* to *end* (both days included), largest first.'''
+        f = self.frame()
+        days = f["day"].to_numpy()
+        lo = 0 if start is None else days.searchsorted(np.datetime64(start, "ns"), "left")
+        hi = len(f) if end is None else days.searchsorted(np.datetime64(end, "ns"), "right")
+        part = f.iloc[lo:hi]
+        return part.groupby("key", sort=False)["count"].sum().sort_values(ascending=False, kind="stable")
+
+    def to_state(self) -> list:
+        return [[d, k, n] for (d, k), n in self.counts.items()]
+
+    def load(self, state: Any) -> None:
+        self.counts = Counter({(d, k): n for d, k, n in state})
+        self._frame = None
+
+
+class DistinctPerKey:
+    '''Set of distinct *value* entries per *key* (e.g. root domains per IP).'''
+
+    def __init__(self, key: str, value: str):
+        self.columns = (key, value)
+        self.sets: dict[Any, set] = {}
+
+    def update(self, batch: Batch) -> None:
+        key, value = self.columns
+        pairs = pd.DataFrame({key: _column(batch, key), value: _column(batch, value)})
+        for k, vals in pairs.groupby(key, observed=True)[value].unique().items():
+            self.sets.setdefault(k, set()).update(vals)
+
+    def merge(self, other: "DistinctPerKey") -> None:
+        for k, vals in other.sets.items():
+            self.sets.setdefault(k, set()).update(vals)
+
+    def distinct_counts(self) -> dict[Any, int]:
+        return {k: len(v) for k, v in self.sets.items()}
+
+    def to_state(self) -> dict:
+        return {k: sorted(v, key=str) for k, v in self.sets.items()}
+
+    def load(self, state: Any) -> None:
+        self.sets = {k: set(v) for k, v in dict(state).items()}
+
+
+class TopCountsSketch:
+    '''Approximate TopCounts in *capacity* counters (Misra-Gries, see sketches.py for the bound).'''
+
+    approximate = True
+
+    def __init__(self, column: str, dropna: bool = True, capacity: int = TOP_CAPACITY):
+        self.columns = (column,)
+        self.dropna = dropna
+        self.sketch = MisraGries(capacity)
+
+    def update(self, batch: Batch) -> None:
+        self.sketch.update(_counts(_column(batch, self.columns[0]), self.dropna))
+
+    def merge(self, other: "TopCountsSketch") -> None:
+        self.sketch.merge(other.sketch)
+
+    def top(self, n: int) -> list[tuple[Any, int]]:
+        return self.sketch.top(n)
+
+    def to_state(self) -> dict:
+        return self.sketch.to_state()
+
+    def load(self, state: Any) -> None:
+        self.sketch = MisraGries.from_state(state)
+
+
+class DistinctPerKeySketch:
+    '''Approximate DistinctPerKey - one HyperLogLog of *value* hashes per *key*.'''
+
+    approximate = True
+
+    def __init__(self, key: str, value: str, precision: int = HLL_PRECISION):
+        self.columns = (key, value)
+        self.precision = precision
+        self.sketches: dict[Any, HyperLogLog] = {}
+
+    def update(self, batch: Batch) -> None:
+        key, value = self.columns
+        pairs = (pd.DataFrame({"k": _column(batch, key), "v": _column(batch, value)})
+                   .dropna(subset=["k"]).drop_duplicates())
+        index, rank = register_ranks(hash64(pairs["v"]), self.precision)
+        best = (pd.DataFrame({"k": pairs["k"].to_numpy(), "i": index, "r": rank})
+                  .groupby(["k", "i"], observed=True)["r"].max())
+        for (k, i), r in best.items():
+            hll = self.sketches.get(k)
+            if hll is None:
+                hll = self.sketches[k] = HyperLogLog(self.precision)
+            hll.set_register(int(i), int(r))
+
+    def merge(self, other: "DistinctPerKeySketch") -> None:
+        for k, hll in other.sketches.items():
+            self.sketches.setdefault(k, HyperLogLog(self.precision)).merge(hll)
+
+    def distinct_counts(self) -> dict[Any, int]:
+        return {k: round(hll.estimate()) for k, hll in self.sketches.items()}
+
+    def to_state(self) -> dict:
+        return {k: hll.to_state() for k, hll in self.sketches.items()}
+
+    def load(self, state: Any) -> None:
+        self.sketches = {k: HyperLogLog.from_state(s, self.precision) for k, s in dict(state).items()}
+
+
+class DayKeyCountsSketch:
+    '''
+    Approximate DayKeyCounts - a Misra-Gries sketch of *capacity* counters
+    per UTC day, so memory grows with the number of days but not with the
+    number of distinct keys. A date range merges the sketches of its days;
+    counts are lower bounds, short by at most the merged sketch's error.
+    '''
+
+    approximate = True
+
+    def __init__(self, day: str, key: str, capacity: int = DAY_CAPACITY):
+        self.columns = (day, key)
+        self.capacity = capacity
+        self.days: dict[str, MisraGries] = {}
+
+    def update(self, batch: Batch) -> None:
+        per_day: dict[str, dict] = {}
+        for day, key, n in _day_key_counts(batch, *self.columns):
+            per_day.setdefault(day, {})[key] = n
+        for day, counts in per_day.items():
+            self.days.setdefault(day, MisraGries(self.capacity)).update(counts)
+
+    def merge(self, other: "DayKeyCountsSketch") -> None:
+        for day, mg in other.days.items():
+            self.days.setdefault(day, MisraGries(self.capacity)).merge(mg)
+
+    def between(self, start: date | None = None, end: date | None = None) -> pd.Series:
+        '''Approximate rows per key from *start* to *end* (both days included), largest first.'''
+        lo, hi = str(start) if start else "", str(end) if end else "9999-12-31"
+        merged = MisraGries(self.capacity)
+        for day, mg in self.days.items():
+            if lo <= day <= hi:                 # ISO days compare as text
+                merged.merge(mg)
+        top = merged.top(len(merged.counts))
+        return pd.Series([c for _, c in top], index=pd.Index([k for k, _ in top], name="key"),
+                         name="count", dtype="int64")
+
+    def to_state(self) -> dict:
+        return {day: mg.to_state() for day, mg in self.days.items()}
+
+    def load(self, state: Any) -> None:
+        self.days = {day: MisraGries.from_state(s) for day, s in dict(state).items()}
+
+
+def default_aggregates(sketch: Mapping[str, int] | None = None) -> dict[str, Aggregate]:
+    '''
+    The summaries of the Assignment 1 page, declared once and computed together.
+    *sketch* - e.g. {"capacity": 1000, "precision": 8, "day_capacity": 100} -
+    swaps the top-N and per-IP distinct counts for Misra-Gries / HyperLogLog
+    sketches of that size, and the per-day key rollups for one Misra-Gries of
+    *day_capacity* counters per day. Exact rollups grow with distinct
+    (day, key) pairs; only rows per day stay exact in sketch mode.
+    '''
+    if sketch is None:
+        top, distinct, day_keys = TopCounts, DistinctPerKey, DayKeyCounts
+    else:
+        capacity = sketch.get("capacity", TOP_CAPACITY)
+        precision = sketch.get("precision", HLL_PRECISION)
+        day_capacity = sketch.get("day_capacity", DAY_CAPACITY)
+        top = lambda column, dropna=True: TopCountsSketch(column, dropna, capacity)
+        distinct = lambda key, value: DistinctPerKeySketch(key, value, precision)
+        day_keys = lambda day, key: DayKeyCountsSketch(day, key, day_capacity)
+    return {
+        "principals":     top("principal_clean"),
+        "root_domains":   top("root_domain"),
+        "principals_raw": top("principal", dropna=False),
+        "domains":        top("domain", dropna=False),
+        "recipients":     top("recipient", dropna=False),
+        "ip_domains":     distinct("ip_address", "root_domain"),
+        "days":           DayCounts("date_sent"),
+        "days_principals":   day_keys("date_sent", "principal_clean"),
+        "days_root_domains": day_keys("date_sent", "root_domain"),
+    }
+
+
+class SummaryState:
+    '''
+    Runs every declared aggregate over flattened, enriched and cleaned rows.
+    update() folds in one column batch (all aggregates see it while it is in
+    memory), merge() combines two states, to_dict() / from_dict() persist it
+    as JSON. Aggregates whose columns a batch lacks are skipped for it - e.g.
+    ip_domains while DNS is still running.
+    *sketch* selects approximate, bounded-memory aggregates (see default_aggregates).
+    '''
+
+    def __init__(self, sketch: Mapping[str, int] | None = None):
+        self.rows = 0
+        self.sketch = dict(sketch) if sketch is not None else None
+        self.aggregates = default_aggregates(self.sketch)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, sketch: Mapping[str, int] | None = None) -> "SummaryState":
+        return cls.from_batches([df], sketch)
+
+    @classmethod
+    def from_batches(cls, batches: Iterable[Batch], sketch: Mapping[str, int] | None = None) -> "SummaryState":
+        '''Build the state in one pass over a stream of column batches.'''
+        state = cls(sketch)
+        for batch in batches:
+            state.update(batch)
+        return state
+
+    def update(self, batch: Batch) -> None:
+        '''Fold one column batch into every aggregate.'''
+        n = len(batch) if isinstance(batch, pd.DataFrame) else len(next(iter(batch.values()), ()))
+        if not n:
+            return
+        self.rows += n
+        for agg in self.aggregates.values():
+            if all(c in batch for c in agg.columns):
+                agg.update(batch)
+
+    def merge(self, other: "SummaryState") -> None:
+        '''Add another state (e.g. from a newer batch of notices) into this one.'''
+        if other.sketch != self.sketch:
+            raise ValueError("Cannot merge summaries built with different sketch settings")
+        self.rows += other.rows
+        for name, agg in self.aggregates.items():
+            agg.merge(other.aggregates[name])
+
+    # ---- views used by the Streamlit page ---------------------------------
+
+    @property
+    def approximate(self) -> bool:
+        return self.sketch is not None
+
+    def error_note(self) -> str:
+        '''How far off the approximate values may be, for display next to them.'''
+        if not self.approximate:
+            return ""
+        undercount = max(agg.sketch.error for agg in self.aggregates.values()
+                         if isinstance(agg, TopCountsSketch))
+        hll_error = 1.04 / (1 << self.aggregates["ip_domains"].precision) ** 0.5
+        return (f"≈ Approximate summaries (sketch mode): top-N counts are lower bounds, at most "
+                f"{undercount:,} below the true count (over a date range, merged per-day sketches of "
+                f"{self.aggregates['days_principals'].capacity:,} counters); distinct domains per IP "
+                f"are HyperLogLog estimates (±{hll_error:.1%} standard error). Daily / monthly "
+                f"volumes and cross-filtered views are exact.")
+
+    def top(self, name: str, n: int = 10) -> pd.Series:
+        '''Top-n of a TopCounts aggregate as a value_counts()-style Series.'''
+        top = self.aggregates[name].top(n)
+        return pd.Series([c for _, c in top], index=pd.Index([k for k, _ in top], name=name),
+                         name="count", dtype="int64")
+
+    def top_principals(self, n: int = 10, start: date | None = None, end: date | None = None) -> pd.Series:
+        return self._top_between("principals", n, start, end).rename_axis("principal_clean")
+
+    def top_root_domains(self, n: int = 10, start: date | None = None, end: date | None = None) -> pd.Series:
+        return self._top_between("root_domains", n, start, end).rename_axis("root_domain")
+
+    def _top_between(self, name: str, n: int, start: date | None, end: date | None) -> pd.Series:
+        '''top(name) over all rows, or from the per-day rollup when a date range is given.'''
+        if start is None and end is None:
+            return self.top(name, n)
+        top = self.aggregates["days_" + name].between(start, end).head(n)
+        return pd.Series(top.to_numpy(), index=pd.Index(top.index, name=name), name="count", dtype="int64")
+
+    def date_span(self) -> tuple[date, date] | None:
+        '''First and last day with rows, or None before any dated row was seen.'''
+        days = self.aggregates["days"].counts
+        if not days:
+            return None
+        return date.fromisoformat(min(days)), date.fromisoformat(max(days))
+
+    def trend(self, freq: str = "M", start: date | None = None, end: date | None = None) -> pd.Series:
+        '''
+        Rows per period ("D" day, "W" week, "M" month, ...) from the per-day
+        rollup, oldest first, indexed by pandas Period; optionally only the
+        days from *start* to *end*.
+        '''
+        daily = self.aggregates["days"].series()
+        return period_counts(daily.loc[pd.Timestamp(start) if start else None:pd.Timestamp(end) if end else None],
+                             freq)
+
+    def monthly_trend(self) -> pd.Series:
+        '''Rows per month, oldest first, indexed by pandas Period.'''
+        return self.trend("M")
+
+    def ip_hosting(self, n: int = 10) -> pd.Series:
+        '''IPs hosting the most distinct root domains ('N/A' dropped after the top-n cut).'''
+        counts = pd.Series(self.aggregates["ip_domains"].distinct_counts(), dtype="int64")
+        counts.index.name = "ip_address"
+        top = counts.sort_values(ascending=False).head(n).rename("root_domain")
+        return top[top.index != NOT_FOUND]
+
+    # ---- persistence ------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {"rows": self.rows, "sketch": self.sketch,
+                **{name: agg.to_state() for name, agg in self.aggregates.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict, sketch: Mapping[str, int] | None = None) -> "SummaryState":
+        '''Restore a saved state; *sketch* only applies when *data* is empty.'''
+        state = cls(data.get("sketch") if data else sketch)
+        state.rows = data.get("rows", 0)
+        for name, agg in state.aggregates.items():
+            if name in data:
+                agg.load(data[name])
+        return state
+
+
+def _column(batch: Batch, name: str) -> pd.Series:
+    col = batch[name]
+    return col if isinstance(col, pd.Series) else pd.Series(col, dtype=object)
+
+
+def utc_days(col: pd.Series) -> pd.Series:
+    '''
+    Timestamps (datetime64 or ISO strings) floored to their UTC day, tz-naive;
+    unparseable → NaT. A categorical is parsed once per category.
+    '''
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        days = utc_days(col.cat.categories.to_series(index=None))
+        lookup = np.append(days.to_numpy(), np.datetime64("NaT"))      # code -1 (missing) → NaT
+        return pd.Series(lookup[col.cat.codes.to_numpy()], index=col.index)
+    if not pd.api.types.is_datetime64_any_dtype(col):
+        col = pd.to_datetime(col, utc=True, errors="coerce", format="ISO8601")
+    elif col.dt.tz is None:
+        col = col.dt.tz_localize("UTC")
+    return col.dt.tz_convert("UTC").dt.tz_localize(None).dt.floor("D")
+
+
+def _day_key_counts(batch: Batch, day: str, key: str) -> Iterator[tuple[str, Any, int]]:
+    '''(UTC day "YYYY-MM-DD", *key* value or None, rows) for every pair in *batch*; undated rows skipped.'''
+    days = utc_days(_column(batch, day))
+    dated = days.notna().to_numpy()
+    day_codes, day_values = pd.factorize(days[dated])
+    key_codes, key_values = pd.factorize(_column(batch, key)[dated], use_na_sentinel=True)
+    pair = pd.Series(day_codes.astype(np.int64) * (len(key_values) + 1) + key_codes + 1)
+    labels = [str(d.date()) for d in day_values]
+    for code, n in pair.value_counts(sort=False).items():
+        d, k = divmod(code, len(key_values) + 1)
+        yield labels[d], key_values[k - 1] if k else None, int(n)
+
+
+def period_counts(daily: pd.Series, freq: str) -> pd.Series:
+    '''Rows per day (DatetimeIndex) summed per period of *freq*, indexed by pandas Period.'''
+    trend = daily.groupby(daily.index.to_period(freq)).sum().rename("count")
+    trend.index.name = {"D": "day", "W": "week", "M": "month"}.get(freq, "period")
+    return trend
+
+
+def _counts(col: pd.Series, dropna: bool) -> dict:
+    '''value_counts() as a plain dict, without the zero counts of unused categories; NaN → None.'''
+    counts = col.value_counts(dropna=dropna)
+    return {(None if pd.isna(k) else k): int(n) for k, n in counts[counts > 0].items()}
@@ -0,0 +1,156 @@
+# table_view.py - server-side paging, sorting and filtering for large tables on the Streamlit pages
+#
+# The browser is sent one page of rows at a time. TablePager keeps, per frame,
+# a sort permutation per (column, direction) and a match mask per filter,
+# each built once with a vectorised pass over the column (categorical columns
+# work on their categories, so a filter is a match over the distinct values
+# plus an isin on the codes). The row positions of a (sort, filters) view are
+# cached too, so paging through a view is a slice of that array - the same
+# cost for page 1 and page 10 000, whatever the number of rows.
+
+import threading
+from typing import Hashable, Mapping
+
+import numpy as np
+import pandas as pd
+
+# -------- CONFIG -------------------------------------------------------------
+PAGE_ROWS  = 50                         # default rows per page
+VIEW_CACHE = 8                          # sorted / filtered views kept per table
+# -----------------------------------------------------------------------------
+
+Filters = Mapping[Hashable, str]        # {column: text} - rows whose value contains every text
+
+
+class TablePager:
+    '''
+    One frame, served a page at a time in any column order and under
+    case-insensitive "contains" filters on any columns:
+
+      rows, total = TablePager(df).page(3, 50, sort="domain", filters={"principal": "sony"})
+
+    Missing values sort last in either direction and ties keep row order.
+    Sorts, masks and views are built on first use and cached (the latter two
+    up to VIEW_CACHE each), so one pager can serve every rerun and session.
+    '''
+
+    def __init__(self, df: pd.DataFrame, cache_size: int = VIEW_CACHE):
+        self.df = _contiguous(df)
+        self.cache_size = cache_size
+        self._ranks: dict[Hashable, np.ndarray] = {}
+        self._orders: dict[tuple, np.ndarray] = {}
+        self._masks: dict[tuple, np.ndarray] = {}
+        self._views: dict[tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return len(self.df)
+
+    def page(self, number: int, size: int = PAGE_ROWS, sort: Hashable | None = None, ascending: bool = True,
+             filters: Filters | None = None) -> tuple[pd.DataFrame, int]:
+        '''Rows of page *number* (from 1) of the view, and the number of rows in the view.'''
+        ids = self.view(sort, ascending, filters)
+        start = max(number - 1, 0) * size
+        return self.df.iloc[ids[start:start + size]], len(ids)
+
+    def view(self, sort: Hashable | None = None, ascending: bool = True,
+             filters: Filters | None = None) -> np.ndarray:
+        '''Row positions matching *filters*, in *sort* order (row order for None).'''
+        filters = {c: t.strip() for c, t in (filters or {}).items() if t and t.strip()}
+        key = (sort, ascending, tuple(sorted(filters.items(), key=repr)))
+        with self._lock:
+            ids = self._views.get(key)
+        if ids is not None:
+            return ids
+        if sort is None:
+            ids = np.arange(self.rows)
+        else:
+            ids = self._order(sort, ascending)
+        if filters:
+            keep = np.ones(self.rows, dtype=bool)
+            for col, text in filters.items():
+                keep &= self._match(col, text)
+            ids = ids[keep[ids]]
+        with self._lock:
+            _put(self._views, key, ids, self.cache_size)
+        return ids
+
+    def _rank(self, column: Hashable) -> np.ndarray:
+        '''Each row's position in the sorted distinct values of *column*; -1 where missing.'''
+        ranks = self._ranks.get(column)
+        if ranks is None:
+            col = self.df[column]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                lookup = np.append(_sorted_codes(col.cat.categories), -1)   # code -1 (missing) -> -1
+                ranks = lookup[col.cat.codes.to_numpy()]
+            else:
+                ranks = _sorted_codes(col)
+            self._ranks[column] = ranks = ranks.astype(np.int64)
+        return ranks
+
+    def _order(self, column: Hashable, ascending: bool) -> np.ndarray:
+        key = (column, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            ranks = self._rank(column)
+            missing = ranks < 0
+            keys = np.where(missing, np.iinfo(np.int64).max, ranks if ascending else -ranks)
+            order = np.argsort(keys, kind="stable")
+            self._orders[key] = order
+        return order
+
+    def _match(self, column: Hashable, text: str) -> np.ndarray:
+        key = (column, text.lower())
+        with self._lock:
+            mask = self._masks.get(key)
+        if mask is not None:
+            return mask
+        col = self.df[column]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            hits = _contains(col.cat.categories.to_series(), text)
+            mask = np.isin(col.cat.codes.to_numpy(), np.flatnonzero(hits))
+        else:
+            mask = _contains(col, text) & col.notna().to_numpy()
+        with self._lock:
+            _put(self._masks, key, mask, self.cache_size)
+        return mask
+
+
+def _contiguous(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    *df* with its Arrow-backed columns in one chunk each. Taking rows from a
+    chunked Arrow array costs time in proportion to its length, from a single
+    chunk in proportion to the rows taken - so this keeps page fetches flat.
+    '''
+    out = df
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.ArrowDtype) or getattr(dtype, "storage", None) == "pyarrow":
+            chunks = df[col].array.__arrow_array__()
+            if chunks.num_chunks > 1:
+                if out is df:
+                    out = df.copy(deep=False)
+                out[col] = pd.Series(chunks.combine_chunks(), index=df.index, dtype=dtype)
+    return out
+
+
+def _contains(values: pd.Series, text: str) -> np.ndarray:
+    '''Case-insensitive substring test on the values as displayed.'''
+    return values.astype(str).str.contains(text, case=False, regex=False).to_numpy(dtype=bool)
+
+
+def _sorted_codes(values: pd.Series | pd.Index) -> np.ndarray:
+    '''Codes of *values* numbered in sorted order of the distinct values; -1 where missing.'''
+    try:
+        codes, _ = pd.factorize(values, sort=True)
+    except TypeError:                           # mixed types that do not compare
+        codes, _ = pd.factorize(values.astype(str).where(pd.notna(values)), sort=True)
+    return codes
+
+
+def _put(cache: dict, key: tuple, value: np.ndarray, limit: int) -> None:
+    '''Insert into a dict used as a FIFO cache of at most *limit* entries.'''
+    cache[key] = value
+    while len(cache) > limit:
+        del cache[next(iter(cache))]
@@ -0,0 +1,13 @@
+# conftest.py - puts the repo root and benchmarks/ (stub servers, data generator) on sys.path
+#
+# The pipeline modules are flat files in the repo root, as App.py imports
+# them; the tests run against the same local stubs the benchmarks use, so
+# no network is needed.
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "benchmarks"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
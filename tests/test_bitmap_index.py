@@ -0,0 +1,86 @@
+# test_bitmap_index.py - Bitmap AND / OR across the array / bitset switch, BitmapIndex against pandas
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bitmap_index import ARRAY_MAX, CONTAINER_ROWS, Bitmap, BitmapIndex, _cardinality, _is_array
+from notice_generator import generate_notices
+from notice_pipeline import flatten_clean_shard
+
+SIZES = [0, 1, ARRAY_MAX - 1, ARRAY_MAX, ARRAY_MAX + 1, 3 * ARRAY_MAX, CONTAINER_ROWS // 2]
+
+
+def rows(n: int, seed: int, span: int = CONTAINER_ROWS) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(span, size=n, replace=False)).astype(np.int64)
+
+
+def check(bitmap: Bitmap, expected: np.ndarray) -> None:
+    assert np.array_equal(bitmap.rows(), expected)
+    assert len(bitmap) == len(expected)
+    for container in bitmap.containers.values():            # each container in its cheaper form
+        assert _is_array(container) == (_cardinality(container) <= ARRAY_MAX)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_from_rows_round_trip(n):
+    check(Bitmap.from_rows(rows(n, seed=n)), rows(n, seed=n))
+
+
+@pytest.mark.parametrize("a", SIZES)
+@pytest.mark.parametrize("b", SIZES)
+def test_and_or_match_numpy(a, b):
+    x, y = rows(a, seed=1), rows(b, seed=2)
+    bx, by = Bitmap.from_rows(x), Bitmap.from_rows(y)
+    check(bx & by, np.intersect1d(x, y))
+    check(bx | by, np.union1d(x, y))
+
+
+def test_and_of_dense_containers_shrinks_to_array():
+    evens = np.arange(0, CONTAINER_ROWS, 2)
+    odds_plus = np.sort(np.concatenate([np.arange(1, CONTAINER_ROWS, 2), np.arange(0, 2 * ARRAY_MAX, 4)]))
+    both = Bitmap.from_rows(evens) & Bitmap.from_rows(odds_plus)     # two bitsets, ARRAY_MAX rows in common
+    check(both, np.arange(0, 2 * ARRAY_MAX, 4))
+    assert all(_is_array(c) for c in both.containers.values())
+
+
+def test_across_containers():
+    x, y = rows(20_000, seed=3, span=5 * CONTAINER_ROWS), rows(300_000, seed=4, span=5 * CONTAINER_ROWS)
+    bx, by = Bitmap.from_rows(x), Bitmap.from_rows(y)
+    assert len(bx.containers) == 5
+    check(bx & by, np.intersect1d(x, y))
+    check(bx | by, np.union1d(x, y))
+    check(Bitmap.from_rows(x[x < CONTAINER_ROWS]) & Bitmap.from_rows(y[y >= 3 * CONTAINER_ROWS]), x[:0])
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = flatten_clean_shard(generate_notices(20_000, seed=7))
+    df["ip_address"] = pd.Categorical([f"192.0.2.{c % 30}" for c in df["root_domain"].cat.codes])
+    return df
+
+
+def test_index_matches_pandas(frame):
+    index = BitmapIndex(frame)
+    principal = frame["principal_clean"].value_counts().index[0]
+    recipients = list(frame["recipient"].dropna().unique()[:2])
+    filters = {"principal_clean": [principal], "recipient": recipients}
+    mask = (frame["principal_clean"] == principal) & frame["recipient"].isin(recipients)
+
+    assert index.count({}) == len(frame)
+    assert index.count(filters) == int(mask.sum())
+    expected = frame.loc[frame["recipient"].isin(recipients), "principal_clean"].value_counts()
+    top = index.top("principal_clean", 5, filters)                  # its own filter is left out
+    assert top.tolist() == expected.head(5).tolist()
+    assert top.index[0] == expected.index[0]
+    distinct = frame[mask].groupby("ip_address", observed=True)["root_domain"].nunique()
+    assert index.distinct("ip_address", "root_domain", 100, filters).sort_index().equals(
+        distinct[distinct > 0].sort_index().rename("root_domain").astype("int64").rename_axis(None))
+
+
+def test_index_date_range(frame):
+    index = BitmapIndex(frame)
+    days = pd.to_datetime(frame["date_sent"].astype(object), utc=True).dt.date
+    start, end = np.sort(days.dropna().unique())[[10, 40]]
+    assert index.count({}, start, end) == int(((days >= start) & (days <= end)).sum())
@@ -0,0 +1,115 @@
+# test_dns_resolver.py - DNS wire format, UdpResolver against StubDnsServer, AIMD window
+
+import asyncio
+import socket
+import struct
+
+import pytest
+
+from dns_resolver import (NOT_FOUND, AimdLimiter, DnsError, NxDomain, ResolveStats, RetryPolicy, UdpResolver,
+                          _build_query, _parse_reply, resolve_domains)
+from stub_dns import StubDnsServer, stub_ip
+
+NAMES = [f"site{i}.example" for i in range(200)]
+
+
+def reply(query: bytes, rcode: int = 0, answers: list[tuple[int, bytes]] = ()) -> bytes:
+    '''A response to *query* with (type, rdata) answers, names as pointers to the question.'''
+    body = query[12:]
+    for rtype, rdata in answers:
+        body += b"\xc0\x0c" + struct.pack("!HHIH", rtype, 1, 60, len(rdata)) + rdata
+    return query[:2] + struct.pack("!HHHHH", 0x8180 | rcode, 1, len(answers), 0, 0) + body
+
+
+def test_query_encoding():
+    q = _build_query(0x1234, "www.example.com")
+    qid, flags, qd, an, ns, ar = struct.unpack_from("!HHHHHH", q)
+    assert (qid, flags, qd, an, ns, ar) == (0x1234, 0x0100, 1, 0, 0, 0)
+    assert q[12:] == b"\x03www\x07example\x03com\x00" + struct.pack("!HH", 1, 1)
+
+
+@pytest.mark.parametrize("name", ["a..b", "x" * 64 + ".com", ""])
+def test_query_rejects_bad_labels(name):
+    with pytest.raises(DnsError):
+        _build_query(1, name)
+
+
+def test_reply_first_a_record_after_other_types():
+    q = _build_query(7, "a.example")
+    cname = b"\x01b\xc0\x0e"                 # compressed name in the rdata
+    r = reply(q, answers=[(5, cname), (1, socket.inet_aton("192.0.2.1")), (1, socket.inet_aton("192.0.2.2"))])
+    assert _parse_reply(r, "a.example") == "192.0.2.1"
+
+
+def test_reply_errors():
+    q = _build_query(7, "a.example")
+    with pytest.raises(NxDomain):
+        _parse_reply(reply(q, rcode=3), "a.example")
+    with pytest.raises(NxDomain):                       # no A record
+        _parse_reply(reply(q, answers=[(28, bytes(16))]), "a.example")
+    with pytest.raises(DnsError) as err:
+        _parse_reply(reply(q, rcode=2), "a.example")    # SERVFAIL is not NXDOMAIN
+    assert not isinstance(err.value, NxDomain)
+
+
+def test_resolve_against_stub():
+    stats = ResolveStats()
+    with StubDnsServer(latency_s=0.001, failure_rate=0.1) as dns:
+        ips = resolve_domains(NAMES + ["192.0.2.7"], UdpResolver([dns.address], use_hosts_file=False),
+                              timeout=2, stats=stats)
+    missing = [n for n in NAMES if ips[n] == NOT_FOUND]
+    assert all(ips[n] == stub_ip(n) for n in NAMES if n not in missing)
+    assert ips["192.0.2.7"] == "192.0.2.7"              # IP literals are not looked up
+    assert stats.resolved == len(NAMES) - len(missing) and stats.nxdomain == len(missing) > 0
+    assert stats.timeouts == stats.failed == 0
+
+
+def test_replies_with_another_question_are_ignored():
+    with StubDnsServer(latency_s=0.001, failure_rate=0, decoy=True) as dns:
+        ips = resolve_domains(NAMES, UdpResolver([dns.address], use_hosts_file=False), timeout=2)
+    assert ips == {n: stub_ip(n) for n in NAMES}
+
+
+@pytest.mark.parametrize("first", ["silent", "closed"])
+def test_fail_over_to_next_nameserver(first):
+    stats = ResolveStats()
+    with StubDnsServer(drop_rate=1.0) as silent, StubDnsServer(latency_s=0.001, failure_rate=0) as live:
+        if first == "silent":
+            dead = silent.address
+        else:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.bind(("127.0.0.1", 0))
+            dead = s.getsockname()
+            s.close()
+        backend = UdpResolver([dead, live.address], use_hosts_file=False)
+        ips = resolve_domains(NAMES, backend, timeout=0.3, retry=RetryPolicy(attempts=3, budget_s=5), stats=stats)
+    assert ips == {n: stub_ip(n) for n in NAMES}
+    assert backend.server == 1 and stats.retries > 0
+
+
+def _window_after(latencies: list[float]) -> float:
+    async def run() -> float:
+        limiter = AimdLimiter(initial=32, samples=16)
+        for latency in latencies:
+            await limiter.acquire()
+            limiter.release(latency, overloaded=latency is None, started=float("inf"))
+        return limiter.window
+    return asyncio.run(run())
+
+
+def test_one_slow_answer_does_not_cut_the_window():
+    fast = _window_after([0.01] * 40)
+    assert _window_after([0.01] * 20 + [5.0] + [0.01] * 19) >= fast - 1
+
+
+def test_slow_median_or_timeout_cuts_the_window():
+    assert _window_after([0.01] * 20 + [1.0] * 20) < _window_after([0.01] * 40)
+    assert _window_after([0.01] * 20 + [None]) < _window_after([0.01] * 21)
+
+
+def test_attempt_timeout_floor_and_cap():
+    limiter = AimdLimiter(min_rto=2.0)
+    assert limiter.attempt_timeout(0, 3) == 3           # no samples yet → the configured timeout
+    limiter.srtt, limiter.rttvar = 0.01, 0.0
+    assert limiter.attempt_timeout(0, 3) == 2.0
+    assert limiter.attempt_timeout(1, 3) == 3
@@ -0,0 +1,124 @@
+# test_http_fetch.py - HttpCache against StubHttpServer: fresh hits, 304s, replaced bodies, confirm pages,
+# URL source fingerprints
+
+import os
+import time
+
+import pytest
+
+from http_fetch import HttpCache
+from notice_pipeline import UNVERSIONED_TTL_S, source_fingerprint
+from stub_http import StubHttpServer
+
+BODY = b'{"notices": [' + b", ".join(b'{"id": %d}' % i for i in range(2000)) + b"]}"
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = tmp_path / "notices.json"
+    path.write_bytes(BODY)
+    return path
+
+
+def test_fresh_hit_makes_no_request(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache")
+    with StubHttpServer({"/n.json": served}) as web:
+        assert cache.read_bytes(web.url("/n.json")) == BODY
+        assert cache.read_bytes(web.url("/n.json")) == BODY
+        assert web.requests == 1
+    assert (cache.stats.downloaded, cache.stats.hits) == (1, 1)
+
+
+def test_not_modified_reuses_body(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache", fresh_s=0, stale_s=0)
+    with StubHttpServer({"/n.json": served}) as web:
+        cache.read_bytes(web.url("/n.json"))
+        sent = web.bytes_sent
+        for _ in range(3):
+            assert cache.read_bytes(web.url("/n.json")) == BODY
+        assert (web.requests, web.not_modified, web.bytes_sent) == (4, 3, sent)
+    assert (cache.stats.downloaded, cache.stats.revalidated) == (1, 3)
+
+
+def test_changed_body_replaces_old_one(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache", fresh_s=0, stale_s=0)
+    with StubHttpServer({"/n.json": served}) as web:
+        old = cache.fetch(web.url("/n.json"))
+        served.write_bytes(b'{"notices": []}')
+        new = cache.fetch(web.url("/n.json"))
+        assert cache.read_bytes(web.url("/n.json")) == b'{"notices": []}'
+    assert new.digest != old.digest and new.etag != old.etag
+    assert not cache.object_path(old.digest).exists()             # the orphaned body is removed
+    assert cache.stats.downloaded == 2
+
+
+def test_expire_forces_conditional_get(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache")
+    with StubHttpServer({"/n.json": served}) as web:
+        cache.read_bytes(web.url("/n.json"))
+        cache.expire(web.url("/n.json"))
+        assert cache.read_bytes(web.url("/n.json")) == BODY
+        assert (web.requests, web.not_modified) == (2, 1)
+
+
+@pytest.mark.parametrize("confirm", ["cookie", "form"])
+def test_drive_confirm_step(tmp_path, served, confirm):
+    cache = HttpCache(tmp_path / "cache")
+    with StubHttpServer({"/n.json": served}, confirm=confirm) as web:
+        assert cache.read_bytes(web.url("/n.json")) == BODY
+        assert web.confirm_pages == 1
+
+
+def test_iter_bytes_reports_progress(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache")
+    with StubHttpServer({"/n.json": served}) as web:
+        for _ in range(2):                                          # downloading, then from disk
+            progress = []
+            body = b"".join(cache.iter_bytes(web.url("/n.json"), chunk_size=1024,
+                                             on_bytes=lambda done, total: progress.append((done, total))))
+            assert body == BODY
+            assert progress[-1] == (len(BODY), len(BODY))
+            assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+
+def test_least_recently_used_body_is_evicted(tmp_path):
+    files = {}
+    for name in "abc":
+        files[f"/{name}"] = tmp_path / name
+        files[f"/{name}"].write_bytes(name.encode() * 1000)
+    cache = HttpCache(tmp_path / "cache", max_bytes=2500)
+    with StubHttpServer(files) as web:
+        for name in "abc":
+            cache.fetch(web.url(f"/{name}"))
+        assert cache.lookup(web.url("/a")) is None
+        assert cache.lookup(web.url("/b")) is not None and cache.lookup(web.url("/c")) is not None
+        assert cache.read_bytes(web.url("/a")) == b"a" * 1000      # downloaded again
+        assert web.requests == 4
+
+
+def test_fingerprint_uses_cache_revalidation(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache", fresh_s=0, stale_s=0)
+    with StubHttpServer({"/n.json": served}) as web:
+        url = web.url("/n.json")
+        key = source_fingerprint(url, cache)
+        assert source_fingerprint(url, cache) == key
+        assert cache.read_bytes(url) == BODY
+        assert (web.requests, web.not_modified, web.bytes_sent) == (3, 2, len(BODY))
+        served.write_bytes(BODY.replace(b"1", b"2"))                # same size, new validators
+        os.utime(served, ns=(time.time_ns(), time.time_ns() + 10**9))
+        assert source_fingerprint(url, cache) != key
+        assert cache.read_bytes(url) == BODY.replace(b"1", b"2")
+
+
+def test_fingerprint_fresh_entry_makes_no_request(tmp_path, served):
+    cache = HttpCache(tmp_path / "cache")
+    with StubHttpServer({"/n.json": served}) as web:
+        keys = {source_fingerprint(web.url("/n.json"), cache) for _ in range(3)}
+        assert len(keys) == 1 and web.requests == 1
+
+
+def test_fingerprint_unreachable_source_uses_time_bucket(tmp_path, served):
+    with StubHttpServer({"/n.json": served}) as web:
+        url = web.url("/n.json")
+    key = source_fingerprint(url, HttpCache(tmp_path / "cache"))
+    assert key == f"{url}|t{int(time.time() // UNVERSIONED_TTL_S)}"
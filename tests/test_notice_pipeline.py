@@ -0,0 +1,175 @@
+# test_notice_pipeline.py - streaming parser at every chunk boundary, cleaning rules, flattening, iter_sources
+
+import csv
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from notice_generator import generate_notices
+from notice_pipeline import (EXPORT_COLUMNS, IngestStats, csv_bytes, expand_sources, flatten_clean_shard,
+                             flatten_frame, iter_json_array, iter_notices, iter_sources, merge_shards, read_columnar,
+                             root_domain, root_domains, tidy_principal, tidy_principals, write_columnar)
+
+NOTICES = [
+    {"id": 1, "title": 'He said "hi" \\ left', "works": [{"description": "[brackets] {braces}, commas",
+                                                          "infringing_urls": [{"url": "http://a.example/x]"}]}]},
+    {"id": 2, "title": "Ünïcödé ✓ 日本", "date_sent": "2024-03-01T10:00:00.000Z", "works": []},
+    {"id": 3, "title": None, "nested": {"a": [1, 2.5e3, -0.5, True, False, None, {}]}, "works": [{}]},
+]
+DOC = json.dumps({"meta": {"notices": "not this one"}, "notices": NOTICES, "after": [1, 2]}, ensure_ascii=False)
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(DOC)])
+def test_parser_any_chunk_boundary(size):
+    assert list(iter_json_array(chunked(DOC, size))) == NOTICES
+
+
+def test_parser_every_split_point():
+    for i in range(1, len(DOC)):
+        assert list(iter_json_array([DOC[:i], DOC[i:]])) == NOTICES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_parser_multibyte_utf8_across_blocks(tmp_path, chunk_size):
+    path = tmp_path / "n.json"
+    path.write_text(DOC, encoding="utf-8")
+    assert list(iter_notices(path, chunk_size=chunk_size)) == NOTICES
+
+
+@pytest.mark.parametrize("doc, expected", [
+    ('[1, {"a": [2]}]', [1, {"a": [2]}]),           # a bare array
+    ('\ufeff{"notices": [3]}', [3]),                # UTF-8 BOM
+    ('{"notices": []}', []),
+    ('{"other": 1}', []),
+])
+def test_parser_document_shapes(doc, expected):
+    assert list(iter_json_array(chunked(doc, 3))) == expected
+
+
+def test_parser_truncated_document():
+    with pytest.raises(ValueError):
+        list(iter_json_array(['{"notices": [1, 2']))
+
+
+NAMES = ["Sony Music, Inc", "sony music inc.", "  Warner   Bros ", "O'Reilly Media", None, "", "acme inc inc"]
+DOMAINS = ["www.Example.com", "www2.example.com", "cdn.files.example.co.uk", "localhost", None, "", "WWW.a.b.C"]
+
+
+def test_vectorised_cleaning_matches_scalar_rules():
+    names = pd.Series(NAMES * 3)
+    assert tidy_principals(names, as_category=False).tolist() == [tidy_principal(n) for n in names]
+    domains = pd.Series(DOMAINS * 3)
+    assert root_domains(domains, as_category=False).tolist() == [root_domain(d) for d in domains]
+
+
+def test_vectorised_cleaning_on_generated_data():
+    df = flatten_frame(generate_notices(5_000, seed=3))
+    principals = df["principal"].astype(object)
+    assert tidy_principals(principals).astype(object).tolist() == [tidy_principal(n) for n in principals]
+    assert root_domains(df["domain"]).astype(object).tolist() == [root_domain(d) for d in df["domain"]]
+
+
+def test_cleaned_values_share_categories():
+    out = tidy_principals(pd.Series(["Sony Music, Inc", "sony music inc.", None, None]))
+    assert list(out.cat.categories) == ["Sony Music", "Unknown"]
+
+
+def test_psl_root_domains_keep_second_level_registrations_apart():
+    out = root_domains(pd.Series(["www.foo.co.uk", "bar.co.uk", "a.b.example.com"]), as_category=False, psl=True)
+    assert out.tolist() == ["foo.co.uk", "bar.co.uk", "example.com"]
+
+
+def test_flatten_one_row_per_url():
+    df = flatten_frame(NOTICES + [{"title": "no id", "works": [{"infringing_urls": [{"url": "https://B.example/"}]}]}])
+    assert df["notice_id"].dtype == "Int64"               # a missing id must not turn the others into floats
+    assert df["notice_id"].tolist()[0] == 1 and df["notice_id"].isna().tolist() == [False, True]
+    assert df["domain"].tolist() == ["a.example", "b.example"]
+
+
+@pytest.mark.parametrize("shard", [1, 7, 100])
+def test_merged_shards_match_serial_frame(shard):
+    notices = list(generate_notices(600, seed=4))
+    for i in range(0, len(notices), 9):             # pooled values no row uses, whole shards without rows
+        notices[i] = {**notices[i], "works": [{"description": f"no urls {i}"}]}
+    serial = flatten_clean_shard(notices, psl=True)
+    merged = merge_shards([flatten_clean_shard(notices[i:i + shard], psl=True)
+                           for i in range(0, len(notices), shard)])
+    pd.testing.assert_frame_equal(merged, serial)
+
+
+def test_csv_keeps_ids_and_dates_verbatim():
+    notices = [{"id": 7, "date_sent": "2024-03-01 10:00:00+02:00",
+                "works": [{"infringing_urls": [{"url": "http://a.example/"}]}]},
+               {"id": None, "date_sent": "not a date", "works": [{"infringing_urls": [{"url": "http://b.example/"}]}]}]
+    df = flatten_frame(notices).assign(ip_address="192.0.2.1")
+    rows = list(csv.DictReader(io.StringIO(csv_bytes([df]).decode("utf-8"))))
+    assert [r["notice_id"] for r in rows] == ["7", ""]
+    assert [r["date_sent"] for r in rows] == ["2024-03-01 10:00:00+02:00", "not a date"]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_csv_bytes_match_dict_writer(chunk_rows):
+    multi_line = {"id": 9, "title": "two\nlines, \"quoted\"",
+                  "works": [{"description": "a\r\nb", "infringing_urls": [{"url": "http://c.example/"}]}]}
+    df = flatten_frame(NOTICES + [multi_line, NOTICES[0]]).assign(ip_address="192.0.2.1")
+    expected = io.StringIO()
+    writer = csv.DictWriter(expected, fieldnames=EXPORT_COLUMNS)         # what the original script wrote
+    writer.writeheader()
+    writer.writerows(df[list(EXPORT_COLUMNS)].astype(object).where(df.notna(), None).to_dict("records"))
+    assert csv_bytes([df], chunk_rows=chunk_rows) == expected.getvalue().encode("utf-8")
+
+
+@pytest.mark.parametrize("suffix, fmt", [(".parquet", "parquet"), (".arrow", "arrow")])
+def test_columnar_round_trip_with_object_text(tmp_path, suffix, fmt):
+    df = flatten_frame(NOTICES).assign(ip_address="192.0.2.1")
+    df["infringing_url"] = df["infringing_url"].astype(object)      # what pandas < 3 builds
+    write_columnar(df, tmp_path / f"out{suffix}", fmt, row_group_rows=1)
+    back = read_columnar(tmp_path / f"out{suffix}")
+    assert back["infringing_url"].tolist() == df["infringing_url"].tolist()
+    assert back["title"].astype(object).tolist() == df["title"].astype(object).tolist()
+
+
+# -------- several sources ----------------------------------------------------
+
+def fake_read(data: dict):
+    def read(src, on_bytes):
+        for notice in data[src]:
+            if isinstance(notice, Exception):
+                raise notice
+            yield notice
+    return read
+
+
+def test_sources_merge_in_order_and_dedupe():
+    data = {"a": [{"id": 1}, {"id": 2}], "b": [{"id": 2}, {"id": 3}, {"x": 0}, {"x": 0}], "c": [{"id": 4}]}
+    stats = IngestStats()
+    out = list(iter_sources(["a", "b", "c"], read=fake_read(data), stats=stats, seen={4}, buffer=1))
+    assert out == [{"id": 1}, {"id": 2}, {"id": 3}, {"x": 0}, {"x": 0}]     # notices without an id are all kept
+    assert (stats.sources, stats.notices, stats.duplicates) == (3, 5, 2)
+
+
+def test_sources_error_is_raised_in_order():
+    data = {"a": [{"id": 1}], "b": [{"id": 2}, OSError("b is gone")], "c": [{"id": 3}]}
+    got = []
+    with pytest.raises(OSError, match="b is gone"):
+        for notice in iter_sources(["a", "b", "c"], read=fake_read(data)):
+            got.append(notice["id"])
+    assert got == [1, 2]
+
+
+def test_sources_from_files(tmp_path):
+    for i in range(3):
+        (tmp_path / f"part{i}.json").write_text(json.dumps({"notices": [{"id": i}, {"id": 10}]}))
+    (tmp_path / "notes.txt").write_text("skipped")
+    sources = expand_sources(tmp_path)
+    assert [s.rsplit("part", 1)[1] for s in sources] == ["0.json", "1.json", "2.json"]
+    assert expand_sources([str(tmp_path / "part*.json"), sources[0]]) == sources
+    assert [n["id"] for n in iter_sources(sources)] == [0, 10, 1, 2]
+    with pytest.raises(FileNotFoundError):
+        expand_sources(str(tmp_path / "*.csv"))
@@ -0,0 +1,54 @@
+# test_pipeline_job.py - PipelineJob results / errors / attached profiler, StageCache memoisation
+
+import threading
+
+import pytest
+
+from pipeline_job import PipelineJob, StageCache
+from profiler import NULL_PROFILER
+
+
+def test_job_publishes_and_keeps_errors():
+    def target(job):
+        job.stage("work", "Working", total=2)
+        job.advance("work", 2)
+        job.publish("answer", 42)
+        raise RuntimeError("boom")
+
+    job = PipelineJob(target)
+    job._thread.join(5)
+    stages, results, _ = job.snapshot()
+    assert (stages[0].fraction, results) == (1.0, {"answer": 42})
+    assert isinstance(job.error, RuntimeError) and not job.running
+
+
+def test_attach_profiler_times_later_stages():
+    go = threading.Event()
+
+    def target(job):
+        go.wait(5)
+        with job.profiler.stage("dns"):
+            pass
+
+    job = PipelineJob(target)
+    assert job.profiler is NULL_PROFILER
+    prof = job.attach_profiler()
+    assert prof.enabled and job.attach_profiler() is prof
+    go.set()
+    job._thread.join(5)
+    assert list(prof.table().index) == ["dns"]
+
+
+def test_stage_cache_memoises_per_key():
+    cache, calls = StageCache(max_entries=2), []
+    compute = lambda key: lambda: calls.append(key) or key * 10
+    assert [cache.get("s", (k,), compute(k)) for k in (1, 2, 1, 3, 2, 1)] == [10, 20, 10, 30, 20, 10]
+    assert calls == [1, 2, 3, 2, 1]                     # 2 was evicted by 3, then 1 by 2
+    assert cache.get("other", (1,), compute(9)) == 90   # stages do not share keys
+
+
+def test_stage_cache_does_not_keep_failures():
+    cache = StageCache()
+    with pytest.raises(ValueError):
+        cache.get("s", (1,), lambda: int("x"))
+    assert cache.get("s", (1,), lambda: 5) == 5
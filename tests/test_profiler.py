@@ -0,0 +1,37 @@
+# test_profiler.py - tracemalloc shared by the sessions that have profiling on
+
+import gc
+import tracemalloc
+
+from profiler import Profiler, SessionToken
+
+
+def test_tracing_stops_with_the_last_profiling_session():
+    a, b = SessionToken(), SessionToken()
+    Profiler.start_tracing(a)
+    Profiler.start_tracing(b)
+    Profiler.stop_tracing(a)
+    Profiler.stop_tracing(a)                        # every rerun with profiling off says so again
+    assert tracemalloc.is_tracing()
+    Profiler.stop_tracing(b)
+    assert not tracemalloc.is_tracing()
+
+
+def test_a_closed_session_does_not_keep_tracing():
+    a, b = SessionToken(), SessionToken()
+    Profiler.start_tracing(a)
+    del a                                           # its session state is gone
+    gc.collect()
+    Profiler.stop_tracing(b)
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        session = SessionToken()
+        Profiler.start_tracing(session)
+        Profiler.stop_tracing(session)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,50 @@
+# test_public_suffix.py - SuffixTrie: PSL rules (wildcards, exceptions), host clean-up, the bundled list
+
+import pytest
+
+from public_suffix import SuffixTrie, default_trie
+
+RULES = ["jp", "co.jp", "*.kobe.jp", "!city.kobe.jp", "com", "公司.cn", "cn"]
+
+
+@pytest.fixture(scope="module")
+def trie():
+    return SuffixTrie(RULES)
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("example.jp", "example.jp"),
+    ("a.b.example.co.jp", "example.co.jp"),
+    ("shop.example.kobe.jp", "shop.example.kobe.jp"),   # wildcard: *.kobe.jp is a suffix
+    ("www.city.kobe.jp", "city.kobe.jp"),               # exception beats the wildcard
+    ("foo.example.test", "example.test"),               # unlisted TLD is its own suffix
+    ("co.jp", "co.jp"),                                 # a suffix itself comes back as-is
+    ("a.example.公司.cn", "example.公司.cn"),
+    ("a.example.xn--55qx5d.cn", "example.xn--55qx5d.cn"),   # punycode form of the same rule
+])
+def test_rules(trie, host, expected):
+    assert trie.registrable(host) == expected
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("User:Pass@WWW.Example.COM:8080", "example.com"),
+    ("www2.example.com.", "example.com"),
+    ("192.0.2.10:443", "192.0.2.10"),
+    ("[2001:db8::1]:8443", "[2001:db8::1]"),
+    ("localhost", "localhost"),
+])
+def test_host_clean_up(trie, host, expected):
+    assert trie.registrable(host) == expected
+
+
+def test_registrable_many_matches_one_by_one(trie):
+    hosts = ["a.example.co.jp", "b.example.co.jp", "x.kobe.jp", "a.example.co.jp"] * 3
+    assert trie.registrable_many(hosts) == [trie.registrable(h) for h in hosts]
+
+
+def test_bundled_list():
+    psl = default_trie()
+    assert psl is default_trie()
+    assert psl.registrable("files.foo.co.uk") == "foo.co.uk"
+    assert psl.registrable("cdn.bar.com.br") == "bar.com.br"
+    assert psl.registrable("user.github.io") == "user.github.io"     # private section
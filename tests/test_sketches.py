@@ -0,0 +1,111 @@
+# test_sketches.py - Misra-Gries / HyperLogLog bounds and merges, SummaryState merge invariants
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from notice_generator import generate_notices
+from notice_pipeline import flatten_clean_shard
+from sketches import HyperLogLog, MisraGries, hash64
+from summaries import SummaryState
+
+SKETCH = {"capacity": 20, "precision": 8, "day_capacity": 5}
+
+
+def zipf_values(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).zipf(1.3, n) % 500
+
+
+def check_bounds(mg: MisraGries, true: Counter) -> None:
+    assert mg.total == sum(true.values())
+    assert len(mg.counts) <= mg.capacity
+    assert mg.error <= mg.total / (mg.capacity + 1)
+    for value, count in true.items():
+        est = mg.counts.get(value, 0)
+        assert count - mg.error <= est <= count
+        if count > mg.error:
+            assert value in mg.counts
+
+
+def test_misra_gries_bounds_in_batches():
+    values = zipf_values(20_000, seed=1)
+    mg = MisraGries(capacity=20)
+    for batch in np.array_split(values, 37):
+        mg.update(Counter(batch.tolist()))
+    check_bounds(mg, Counter(values.tolist()))
+
+
+@pytest.mark.parametrize("parts", [2, 5, 16])
+def test_misra_gries_bounds_across_merges(parts):
+    values = zipf_values(20_000, seed=parts)
+    sketches = []
+    for part in np.array_split(values, parts):
+        mg = MisraGries(capacity=20)
+        mg.update(Counter(part.tolist()))
+        sketches.append(mg)
+    while len(sketches) > 1:                        # merge as a tree, as shards and saved states do
+        for a, b in zip(sketches[::2], sketches[1::2]):
+            a.merge(b)
+        sketches = sketches[::2]
+    check_bounds(sketches[0], Counter(values.tolist()))
+
+
+def test_misra_gries_exact_under_capacity_and_state_round_trip():
+    mg = MisraGries(capacity=10)
+    mg.update({"a": 3, "b": 1})
+    mg.update({"a": 1, "c": 2})
+    assert (mg.top(2), mg.error) == ([("a", 4), ("c", 2)], 0)
+    again = MisraGries.from_state(mg.to_state())
+    assert (again.counts, again.total, again.error, again.capacity) == (mg.counts, mg.total, mg.error, 10)
+
+
+@pytest.mark.parametrize("n", [50, 5_000, 200_000])
+def test_hll_merge_equals_union(n):
+    values = np.arange(n)
+    whole, left, right = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+    whole.add_hashes(hash64(values))
+    left.add_hashes(hash64(values[: 2 * n // 3]))
+    right.add_hashes(hash64(values[n // 3:]))          # overlapping halves
+    left.merge(right)
+    assert left.estimate() == whole.estimate()
+    assert abs(whole.estimate() - n) <= 4 * 1.04 / 32 * n + 2
+    again = HyperLogLog.from_state(whole.to_state(), 10)
+    assert again.estimate() == whole.estimate()
+
+
+def test_hll_rejects_mixed_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(8).merge(HyperLogLog(10))
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = flatten_clean_shard(generate_notices(6_000, seed=5))
+    return df.assign(ip_address=[f"192.0.2.{code % 50}" for code in df["root_domain"].cat.codes])
+
+
+@pytest.mark.parametrize("sketch", [None, SKETCH])
+def test_summary_merge_of_halves_matches_whole(frame, sketch):
+    whole = SummaryState.from_frame(frame, sketch)
+    half = len(frame) // 2
+    merged = SummaryState.from_frame(frame.iloc[:half], sketch)
+    merged.merge(SummaryState.from_dict(SummaryState.from_frame(frame.iloc[half:], sketch).to_dict()))
+    assert merged.rows == whole.rows == len(frame)
+    assert merged.trend("D").equals(whole.trend("D"))              # rows per day stay exact
+    if sketch is None:
+        for name in ("principals", "root_domains", "recipients"):
+            assert merged.top(name, 10).equals(whole.top(name, 10))
+        assert merged.ip_hosting().equals(whole.ip_hosting())
+        start, end = whole.date_span()
+        assert merged.top_principals(5, start, end).equals(whole.top_principals(5, start, end))
+    else:
+        true = frame["principal_clean"].value_counts()
+        agg = merged.aggregates["principals"].sketch
+        for value, est in merged.top("principals", 5).items():
+            assert true[value] - agg.error <= est <= true[value]
+
+
+def test_summary_merge_rejects_mixed_settings(frame):
+    with pytest.raises(ValueError):
+        SummaryState.from_frame(frame.head(10)).merge(SummaryState.from_frame(frame.head(10), SKETCH))
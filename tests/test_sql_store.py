@@ -0,0 +1,56 @@
+# test_sql_store.py - SqlStore views against SummaryState, the day column, config changes
+
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from notice_generator import generate_notices
+from notice_pipeline import flatten_clean_shard
+from sql_store import STORED_COLUMNS, SqlStore
+from summaries import SummaryState
+
+
+def enriched(notices) -> pd.DataFrame:
+    df = flatten_clean_shard(notices)
+    return df.assign(ip_address=[f"192.0.2.{code % 20}" for code in df["root_domain"].cat.codes])
+
+
+def test_days_are_utc_days_and_undated_rows_are_skipped(tmp_path):
+    url = lambda u: [{"infringing_urls": [{"url": u}]}]
+    df = enriched([{"id": 1, "date_sent": "2024-03-01T23:30:00-05:00", "works": url("http://a.example/")},
+                   {"id": 2, "date_sent": "", "works": url("http://b.example/")},
+                   {"id": 3, "works": url("http://c.example/")},
+                   {"id": 4, "date_sent": "2024-03-05T10:00:00.000Z", "works": url("http://d.example/")}])
+    store = SqlStore(tmp_path / "s.sqlite3")
+    store.load(df[list(STORED_COLUMNS)])
+    summary = SummaryState.from_frame(df)
+    assert store.date_span() == summary.date_span() == (date(2024, 3, 2), date(2024, 3, 5))
+    assert store.trend("D").equals(summary.trend("D"))
+    assert store.trend("D").tolist() == [1, 1]
+    assert store.top_root_domains(5, date(2024, 3, 2), date(2024, 3, 2)).index.tolist() == ["a.example"]
+
+
+def test_views_match_summary_state(tmp_path):
+    df = enriched(generate_notices(3_000, seed=11))
+    store = SqlStore(tmp_path / "s.sqlite3")
+    half = len(df) // 2
+    store.load(df.iloc[:half][list(STORED_COLUMNS)])
+    store.load(df.iloc[half:][list(STORED_COLUMNS)], replace=False)
+    summary = SummaryState.from_frame(df)
+    assert store.rows == len(df)
+    assert store.date_span() == summary.date_span()
+    first, last = summary.date_span()
+    start, end = first + timedelta(days=10), last - timedelta(days=10)
+    for freq in ("D", "M"):
+        assert store.trend(freq, start, end).tolist() == summary.trend(freq, start, end).tolist()
+    assert store.top_principals(5, start, end).tolist() == summary.top_principals(5, start, end).tolist()
+    assert store.ip_hosting(50).sort_index().equals(summary.ip_hosting(50).sort_index())   # all 20 IPs
+
+
+@pytest.mark.parametrize("config", ["other", None])
+def test_other_config_empties_the_store(tmp_path, config):
+    SqlStore(tmp_path / "s.sqlite3", config="one").load(enriched(generate_notices(50, seed=1)), source="src")
+    assert SqlStore(tmp_path / "s.sqlite3", config="one").source == "src"
+    store = SqlStore(tmp_path / "s.sqlite3", config=config)
+    assert (store.rows, store.source, store.date_span()) == (0, None, None)